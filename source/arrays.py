@@ -0,0 +1,289 @@
+""" Array values: literals, indexing, LEN/APPEND/SUM/MIN/MAX and element-wise operators that run as one bulk operation. """
+
+import operator
+import threading
+from array import array
+from itertools import repeat
+from reprlib import recursive_repr
+from strings import Rope, plain
+
+# Storage typecodes: 64-bit ints and doubles. Any other mix of values is kept in a plain list.
+INTEGERS = 'q'
+FLOATS = 'd'
+
+class Array:
+    """
+    A mutable array. Homogeneous ints and floats are stored in an array.array, so a large numeric array takes 8 bytes
+    per element instead of a pointer to a boxed number; anything else (strings, booleans, nested arrays, a mix of
+    types, or ints too large for 64 bits) is stored in a list, and the storage is widened when such a value arrives.
+    Arithmetic and comparison operators apply element-wise, to two arrays of the same length or to an array and a
+    single value, with a C-level map over the storage instead of a loop in the interpreter. Like strings, an array is
+    true when it is not empty.
+    """
+    __slots__ = ('items',)
+
+    def __init__(self, items):
+        self.items = items
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return len(self.items) > 0
+
+    # An array that contains itself, directly or through other arrays, shows as [...] where it recurs, like a list.
+    @recursive_repr("[...]")
+    def __str__(self):
+        return str(list(self.items))
+
+    __repr__ = __str__
+
+    __hash__ = None
+
+    # Returns the element at an index, which must be an integer between 0 and the length minus one.
+    def get(self, index):
+        return self.items[self.position(index)]
+
+    # Replaces the element at an index, widening the storage if the value does not fit it.
+    def set(self, index, value):
+        position = self.position(index)
+        value = plain(value)
+        items = self.items
+        if type(items) is array and not fits(items.typecode, value):
+            items = self.items = list(items)
+        items[position] = value
+        return value
+
+    # Adds a value at the end. An empty array takes the storage that suits its first value.
+    def append(self, value):
+        value = plain(value)
+        items = self.items
+        if not items:
+            self.items = compact([value])
+        elif type(items) is array and not fits(items.typecode, value):
+            self.items = list(items)
+            self.items.append(value)
+        else:
+            items.append(value)
+        return self
+
+    def position(self, index):
+        if type(index) is not int:
+            raise RuntimeError("Array index must be an integer.")
+        if not 0 <= index < len(self.items):
+            raise RuntimeError(f"Array index {index} out of range.")
+        return index
+
+    def __add__(self, other):
+        return elementwise(operator.add, self, other)
+
+    def __radd__(self, other):
+        return elementwise(operator.add, other, self)
+
+    def __sub__(self, other):
+        return elementwise(operator.sub, self, other)
+
+    def __rsub__(self, other):
+        return elementwise(operator.sub, other, self)
+
+    def __mul__(self, other):
+        return elementwise(operator.mul, self, other)
+
+    def __rmul__(self, other):
+        return elementwise(operator.mul, other, self)
+
+    def __truediv__(self, other):
+        return elementwise(operator.truediv, self, other)
+
+    def __rtruediv__(self, other):
+        return elementwise(operator.truediv, other, self)
+
+    def __lt__(self, other):
+        return elementwise(operator.lt, self, other)
+
+    def __le__(self, other):
+        return elementwise(operator.le, self, other)
+
+    def __gt__(self, other):
+        return elementwise(operator.gt, self, other)
+
+    def __ge__(self, other):
+        return elementwise(operator.ge, self, other)
+
+    def __eq__(self, other):
+        return elementwise(operator.eq, self, other)
+
+    def __ne__(self, other):
+        return elementwise(operator.ne, self, other)
+
+    def __neg__(self):
+        items = self.items
+        if type(items) is array:
+            if items.typecode == FLOATS:
+                return Array(array(FLOATS, map(operator.neg, items)))
+            return Array(compact(list(map(operator.neg, items))))
+        with Combining(self):
+            return Array(compact(list(map(operator.neg, items))))
+
+class Combining:
+    """
+    Marks arrays stored in lists, which may hold other arrays, while an element-wise operation goes through their
+    elements, and raises a runtime error when one of them is reached again from inside the operation: that array
+    contains itself, and the operation would otherwise recurse until Python's recursion limit. Each thread has its
+    own marks, since separate runs may share nothing but may run at once.
+    """
+    marks = threading.local()
+
+    def __init__(self, *operands):
+        self.keys = [id(operand) for operand in operands if type(operand) is Array and type(operand.items) is list]
+
+    def __enter__(self):
+        active = getattr(Combining.marks, "active", None)
+        if active is None:
+            active = Combining.marks.active = set()
+        if not active.isdisjoint(self.keys):
+            raise RuntimeError("An array that contains itself cannot be used in an element-wise operation.")
+        active.update(self.keys)
+
+    def __exit__(self, *exception):
+        Combining.marks.active.difference_update(self.keys)
+
+# Checks if a value can be stored in an array.array with the given typecode.
+def fits(typecode, value):
+    if typecode == FLOATS:
+        return type(value) is float
+    return type(value) is int and -2 ** 63 <= value < 2 ** 63
+
+# Returns the most compact storage for a list of values: an array.array when they are all ints that fit 64 bits or
+# all floats, otherwise the list itself with any Rope turned into a str.
+def compact(values):
+    kinds = set(map(type, values))
+    if kinds == {int}:
+        try:
+            return array(INTEGERS, values)
+        except OverflowError:
+            return values
+    if kinds == {float}:
+        return array(FLOATS, values)
+    if Rope in kinds:
+        return list(map(plain, values))
+    return values
+
+# Returns the typecode an operand contributes to an arithmetic result: that of a numeric array's storage, or of a
+# single int or float. None stands for anything else.
+def typecode(value):
+    if type(value) is Array:
+        items = value.items
+        return items.typecode if type(items) is array else None
+    if type(value) is int:
+        return INTEGERS
+    if type(value) is float:
+        return FLOATS
+    return None
+
+ARITHMETIC = (operator.add, operator.sub, operator.mul)
+
+# Applies a binary operator element by element. Either operand may be a single value, which is used with every
+# element of the other. Division checks for zeros first, like the scalar operator.
+def elementwise(function, left, right):
+    if type(left) is Array and type(right) is Array:
+        if len(left.items) != len(right.items):
+            raise RuntimeError(f"Arrays have different lengths ({len(left.items)} and {len(right.items)}).")
+        lefts, rights = left.items, right.items
+    elif type(left) is Array:
+        right = plain(right)
+        lefts, rights = left.items, repeat(right, len(left.items))
+    else:
+        left = plain(left)
+        lefts, rights = repeat(left, len(right.items)), right.items
+
+    if function is operator.truediv and has_zero(right):
+        raise RuntimeError("Division by zero.")
+
+    codes = (typecode(left), typecode(right))
+    if None not in codes:
+        if function is operator.truediv or (function in ARITHMETIC and FLOATS in codes):
+            return Array(array(FLOATS, map(function, lefts, rights)))
+        if function in ARITHMETIC:
+            values = list(map(function, lefts, rights))
+            try:
+                return Array(array(INTEGERS, values))
+            except OverflowError:
+                return Array(values)
+    with Combining(left, right):
+        return Array(list(map(function, lefts, rights)))
+
+# Checks if a divisor is zero or, for an array, has a zero element. Nested arrays are checked when they are divided.
+def has_zero(value):
+    if type(value) is not Array:
+        return value == 0
+    items = value.items
+    if type(items) is array:
+        return 0 in items
+    return any(type(item) is not Array and item == 0 for item in items)
+
+# Evaluates an array literal from the values of its elements.
+def make_array(values):
+    return Array(compact(values))
+
+# Implements a[i]. Only arrays can be indexed.
+def index(value, position):
+    if type(value) is not Array:
+        raise RuntimeError("Only arrays can be indexed.")
+    return value.get(position)
+
+# Implements a[i] = value, which evaluates to the value assigned.
+def assign_index(value, position, element):
+    if type(value) is not Array:
+        raise RuntimeError("Only arrays can be indexed.")
+    return value.set(position, element)
+
+def length(value):
+    if type(value) is Array or type(value) is str or type(value) is Rope:
+        return len(value)
+    raise RuntimeError("LEN needs an array or a string.")
+
+def append(value, element):
+    if type(value) is not Array:
+        raise RuntimeError("APPEND needs an array.")
+    return value.append(element)
+
+# SUM, MIN and MAX hand the whole storage to the builtin, which loops over it in C.
+def total(value):
+    return reduce(sum, "SUM needs an array of numbers.", elements("SUM", value))
+
+def minimum(value):
+    items = elements("MIN", value)
+    if not items:
+        raise RuntimeError("MIN of an empty array.")
+    return reduce(min, "MIN needs an array of numbers or of strings.", items)
+
+def maximum(value):
+    items = elements("MAX", value)
+    if not items:
+        raise RuntimeError("MAX of an empty array.")
+    return reduce(max, "MAX needs an array of numbers or of strings.", items)
+
+# Applies a reduction, turning the TypeError of elements that cannot be added or compared into a runtime error.
+def reduce(function, message, items):
+    try:
+        return function(items)
+    except TypeError:
+        raise RuntimeError(message) from None
+
+def elements(name, value):
+    if type(value) is not Array:
+        raise RuntimeError(f"{name} needs an array.")
+    return value.items
+
+# The built-in functions, by name, with the Python function that implements each and the number of arguments it takes.
+BUILTINS = {
+    "LEN": (length, 1),
+    "APPEND": (append, 2),
+    "SUM": (total, 1),
+    "MIN": (minimum, 1),
+    "MAX": (maximum, 1),
+}
+
+# Built-in functions that change an array in place, which the optimizer must not move expressions across.
+MUTATING = ("APPEND",)
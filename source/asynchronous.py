@@ -0,0 +1,207 @@
+""" An asyncio tree walker, for hosting many scripts in one process that wait on INPUT without blocking a thread. """
+
+import asyncio
+import inspect
+import time
+from expressions import *
+from interpreter import Interpreter
+from arrays import BUILTINS, make_array, index, assign_index
+from scanner import FastScanner
+from parser import Parser
+from optimizer import Optimizer
+
+# Steps between the points where a running script lets other tasks run.
+YIELD_EVERY = 1000
+
+class AsyncInterpreter(Interpreter):
+    """
+    A tree walker whose interpret is a coroutine. INPUT awaits `input(prompt)`, which should return an awaitable (a
+    plain value also works), and `print` may return an awaitable too. Every executed statement and every WHILE
+    iteration is a step; every `yield_every` steps the script yields to the event loop, so busy loops share it.
+    A script that takes more than `max_steps` steps, or runs for more than `time_budget` seconds not counting the time
+    spent waiting for INPUT, stops with a RuntimeError.
+    Statements and expressions that contain no INPUT are run by the synchronous Interpreter code, so only WHILE, IF,
+    PRINT and INPUT pay for coroutines.
+    """
+    def __init__(self, environment=None, yield_every=YIELD_EVERY, max_steps=None, time_budget=None):
+        super().__init__(environment)
+        self.yield_every = yield_every
+        self.max_steps = max_steps
+        self.time_budget = time_budget
+        self.steps = 0
+        self.countdown = yield_every
+        self.elapsed = 0.0
+        self.resumed = None
+        self.inputs = {}
+
+    # Runs a list of statements.
+    async def interpret(self, statements):
+        self.resumed = time.perf_counter()
+        try:
+            await self.block(statements)
+        finally:
+            self.pause()
+
+    async def block(self, statements):
+        for statement in statements:
+            if isinstance(statement, (While, If, Print)) or self.has_input(statement):
+                await self.execute(statement)
+            else:
+                self.step()
+                Interpreter.execute(self, statement)
+                if self.countdown <= 0:
+                    await self.relinquish()
+
+    async def execute(self, statement):
+        self.step()
+        if isinstance(statement, While):
+            while await self.evaluate_async(statement.condition):
+                await self.block(statement.body)
+                self.step()
+                if self.countdown <= 0:
+                    await self.relinquish()
+
+        elif isinstance(statement, If):
+            if await self.evaluate_async(statement.condition):
+                await self.block(statement.then_branch)
+            elif statement.else_branch:
+                await self.block(statement.else_branch)
+
+        elif isinstance(statement, Print):
+            result = self.print(await self.evaluate_async(statement.expression))
+            if inspect.isawaitable(result):
+                await result
+
+        else:
+            await self.evaluate_async(statement)
+
+    # Evaluates an expression, awaiting any INPUT in it. Like Interpreter.evaluate it walks the tree with an explicit
+    # stack, and subexpressions without an INPUT are handed to the synchronous Interpreter.evaluate whole.
+    async def evaluate_async(self, expr):
+        if not self.has_input(expr):
+            return self.evaluate(expr)
+
+        values = []
+        stack = [(expr, False)]
+        while stack:
+            node, operands_ready = stack.pop()
+            if not operands_ready and not self.has_input(node):
+                values.append(self.evaluate(node))
+
+            elif isinstance(node, Grouping):
+                stack.append((node.expression, False))
+
+            elif operands_ready:
+                if isinstance(node, Binary):
+                    right = values.pop()
+                    values.append(self.binary(node.operator, values.pop(), right))
+                elif isinstance(node, Unary):
+                    values.append(self.unary(node.operator, values.pop()))
+                elif isinstance(node, Assign):
+                    self.environment.assign(node.name, values[-1])
+                elif isinstance(node, Index):
+                    position = values.pop()
+                    values.append(index(values.pop(), position))
+                elif isinstance(node, AssignIndex):
+                    element = values.pop()
+                    position = values.pop()
+                    values.append(assign_index(values.pop(), position, element))
+                elif isinstance(node, (ArrayLiteral, Call)):
+                    count = len(children(node))
+                    arguments = values[len(values) - count:]
+                    del values[len(values) - count:]
+                    if isinstance(node, ArrayLiteral):
+                        values.append(make_array(arguments))
+                    else:
+                        values.append(BUILTINS[node.name][0](*arguments))
+                else:
+                    values.append(await self.read(str(values.pop())))
+
+            elif isinstance(node, Binary):
+                stack.append((node, True))
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+
+            elif isinstance(node, Unary):
+                stack.append((node, True))
+                stack.append((node.right, False))
+
+            elif isinstance(node, Assign):
+                stack.append((node, True))
+                stack.append((node.value, False))
+
+            elif isinstance(node, Input):
+                stack.append((node, True))
+                stack.append((node.prompt, False))
+
+            elif isinstance(node, (Index, AssignIndex, ArrayLiteral, Call)):
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(children(node)))
+
+            else:
+                raise RuntimeError(f"Unknown expression type {type(node)}")
+        return values.pop()
+
+    # Asks the transport for the answer to an INPUT. Time spent waiting does not count towards the time budget.
+    async def read(self, prompt):
+        self.pause()
+        try:
+            answer = self.input(prompt)
+            if inspect.isawaitable(answer):
+                answer = await answer
+        finally:
+            self.resumed = time.perf_counter()
+        return answer
+
+    # Returns whether an expression or simple statement contains an INPUT, remembering the answer for every node
+    # below it. The tree is walked with an explicit stack, children before their parent.
+    def has_input(self, node):
+        found = self.inputs.get(node)
+        if found is not None:
+            return found
+        stack = [(node, False)]
+        while stack:
+            current, children_done = stack.pop()
+            if current in self.inputs:
+                continue
+            if children_done:
+                self.inputs[current] = isinstance(current, Input) or any(self.inputs[child] for child in children(current))
+            else:
+                stack.append((current, True))
+                stack.extend((child, False) for child in children(current) if child not in self.inputs)
+        return self.inputs[node]
+
+    # Counts one step and enforces the step budget.
+    def step(self):
+        self.steps += 1
+        self.countdown -= 1
+        if self.max_steps is not None and self.steps > self.max_steps:
+            raise RuntimeError(f"Step budget of {self.max_steps} exceeded.")
+
+    # Checks the time budget and lets the other tasks on the event loop run.
+    async def relinquish(self):
+        self.countdown = self.yield_every
+        self.pause()
+        if self.time_budget is not None and self.elapsed > self.time_budget:
+            raise RuntimeError(f"Time budget of {self.time_budget:g}s exceeded.")
+        await asyncio.sleep(0)
+        self.resumed = time.perf_counter()
+
+    # Adds the time since the script last resumed to its running time.
+    def pause(self):
+        if self.resumed is not None:
+            self.elapsed += time.perf_counter() - self.resumed
+            self.resumed = None
+
+# Parses and optimizes a script once, for running in any number of sessions.
+def compile_script(source):
+    return Optimizer().optimize(Parser(FastScanner(source).scan_tokens()).parse())
+
+# Runs parsed statements as one session: `input` and `print` are the session's transport, and the keyword arguments
+# are passed on to AsyncInterpreter. Returns the interpreter, whose environment holds the final variables.
+async def run_session(statements, input, print, **options):
+    interpreter = AsyncInterpreter(**options)
+    interpreter.input = input
+    interpreter.print = print
+    await interpreter.interpret(statements)
+    return interpreter
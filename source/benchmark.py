@@ -0,0 +1,383 @@
+""" Benchmarks for the Simple interpreter. Run with `python3 source/benchmark.py`. """
+
+import os
+import sys
+import gc
+import time
+import argparse
+import resource
+import subprocess
+import asyncio
+import tempfile
+import tracemalloc
+import scanner
+import strings
+from scanner import Scanner, FastScanner
+from tokens import Token
+from parser import Parser
+from incremental import IncrementalParser
+from expressions import children
+from optimizer import Optimizer
+from inference import TypeInference
+from closures import ClosureInterpreter
+from asynchronous import compile_script, run_session
+
+# A shopping.txt style loop that appends `count` items to one string with +.
+def string_building_source(count):
+    return f"""
+shoppingList = ""
+i = 0
+WHILE (i < {count}) {{
+    shoppingList = shoppingList + ", " + "item"
+    i = i + 1
+}}
+"""
+
+# A generated script of roughly `size` characters, mixing the statement kinds our generated scripts use.
+def generated_source(size):
+    block = """counter = 0
+total = 0
+greeting = "Hello, World"
+WHILE (counter < 10) {
+    counter = counter + 1
+    IF (counter / 2 > 2 AND counter != 7) {
+        total = total + counter * 2 - (3 + 4) / 1.5
+    } ELSE {
+        PRINT greeting + " number " + "one"
+    }
+}
+PRINT total >= 100 OR !(total == 12)
+"""
+    return block * max(1, size // len(block))
+
+# Returns the seconds taken to run a source with the closure backend, excluding scanning and parsing.
+def time_run(source):
+    statements = Parser(Scanner(source).scan_tokens()).parse()
+    interpreter = ClosureInterpreter()
+    start = time.perf_counter()
+    interpreter.interpret(statements)
+    return time.perf_counter() - start
+
+# Prints how the time to build a string with repeated + grows with its length, with plain str concatenation
+# (before) and with ropes (after). Plain concatenation is quadratic, so its time roughly quadruples per row.
+def string_building(sizes=(2000, 4000, 8000, 16000, 32000, 64000, 128000)):
+    print("String building (s = s + \", \" + item)")
+    print(f"{'items':>8}  {'plain str':>10}  {'rope':>10}  {'speedup':>8}")
+    threshold = strings.ROPE_THRESHOLD
+    for size in sizes:
+        source = string_building_source(size)
+        try:
+            strings.ROPE_THRESHOLD = float('inf')
+            before = time_run(source)
+        finally:
+            strings.ROPE_THRESHOLD = threshold
+        after = time_run(source)
+        print(f"{size:>8}  {before:>9.3f}s  {after:>9.3f}s  {before / after:>7.1f}x")
+
+# Prints scanning throughput in MB/s for the reference and the fast scanner over a generated multi-MB source.
+def scanner_throughput(size=8_000_000):
+    source = generated_source(size)
+    megabytes = len(source.encode()) / 1e6
+    print(f"Scanner throughput ({megabytes:.1f} MB source)")
+    for name, scanner in (("reference", Scanner), ("fast", FastScanner)):
+        start = time.perf_counter()
+        tokens = scanner(source).scan_tokens()
+        elapsed = time.perf_counter() - start
+        print(f"{name:>10}  {megabytes / elapsed:7.2f} MB/s  ({len(tokens)} tokens in {elapsed:.2f}s)")
+
+# A generated script of roughly `size` characters that runs without loops: each block assigns a few long string
+# literals, updates a counter and prints it, so the file grows quickly while every statement stays short. The last
+# line printed is the number of blocks.
+def streaming_source(size):
+    text = "streamed line of generated text " * 30
+    block = "".join(f'line = "{text}{i}"\n' for i in range(4))
+    block += "count = count + 1\ntotal = total + count * 2 - LEN(line)\nPRINT count\n"
+    return "count = 0\ntotal = 0\n", block, max(1, size // len(block))
+
+# Writes a generated script of `size_mb` megabytes to a temporary file and runs it with --stream in a child process
+# whose address space is capped at `cap_mb` megabytes, far less than the file itself. Prints the time it took and
+# the child's peak resident memory, and raises an error unless it exited normally after printing every block.
+def streaming_memory(size_mb=300, cap_mb=200):
+    header, block, blocks = streaming_source(size_mb * 1_000_000)
+    simple = os.path.join(os.path.dirname(os.path.abspath(__file__)), "simple.py")
+    cap = cap_mb * 1024 * 1024
+
+    def limit_memory():
+        resource.setrlimit(resource.RLIMIT_AS, (cap, cap))
+
+    print(f"Streaming a {size_mb} MB script under a {cap_mb} MB address-space cap")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "stream.txt")
+        with open(path, "w") as file:
+            file.write(header)
+            for _ in range(blocks):
+                file.write(block)
+        with open(os.path.join(directory, "stderr.txt"), "w+b") as errors:
+            start = time.perf_counter()
+            process = subprocess.Popen([sys.executable, simple, "--stream", path], stdout=subprocess.PIPE,
+                                       stderr=errors, preexec_fn=limit_memory)
+            last = b""
+            for line in process.stdout:
+                last = line
+            _, status, usage = os.wait4(process.pid, 0)
+            elapsed = time.perf_counter() - start
+            returncode = os.waitstatus_to_exitcode(status)
+            errors.seek(0)
+            message = errors.read().decode(errors="replace")[-200:]
+    if returncode != 0:
+        raise RuntimeError(f"simple.py --stream exited with {returncode} after {elapsed:.1f}s: {message}")
+    if last.strip() != str(blocks).encode():
+        raise RuntimeError(f"simple.py --stream stopped after printing {last.strip().decode()!r}, expected {blocks}")
+    print(f"  ok in {elapsed:.1f}s, peak RSS {usage.ru_maxrss / 1024:.1f} MB")
+
+# Prints the memory held by the token list of a generated script, in bytes per token, with tokens that carry a
+# per-instance __dict__ (before) and with the __slots__ tokens the scanners produce (after).
+def token_memory(size=2_000_000):
+    class DictToken(Token):
+        pass
+
+    source = generated_source(size)
+    print(f"Token memory ({len(source.encode()) / 1e6:.1f} MB source)")
+    print(f"{'tokens':>10}  {'count':>8}  {'bytes/token':>11}  {'total':>10}")
+    for name, token in (("__dict__", DictToken), ("__slots__", Token)):
+        scanner.Token = token
+        try:
+            tracemalloc.start()
+            tokens = FastScanner(source).scan_tokens()
+            used = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+        finally:
+            scanner.Token = Token
+        print(f"{name:>10}  {len(tokens):>8}  {used / len(tokens):>11.1f}  {used / 1e6:>8.1f}MB")
+        del tokens
+
+# Prints the memory held by the parsed tree of a generated script, in bytes per AST node, with the size of each kind
+# of node. The token list is dropped before measuring, so what is counted is the nodes and everything they keep alive.
+def ast_memory(size=2_000_000):
+    source = generated_source(size)
+    print(f"AST memory ({len(source.encode()) / 1e6:.1f} MB source)")
+    tracemalloc.start()
+    tokens = FastScanner(source).scan_tokens()
+    statements = Parser(tokens).parse()
+    del tokens
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    counts = {}
+    sizes = {}
+    stack = list(statements)
+    while stack:
+        node = stack.pop()
+        kind = type(node).__name__
+        counts[kind] = counts.get(kind, 0) + 1
+        sizes[kind] = sys.getsizeof(node)
+        stack.extend(children(node))
+    nodes = sum(counts.values())
+    print(f"{'node':>10}  {'count':>8}  {'bytes':>5}")
+    for kind, count in sorted(counts.items(), key=lambda item: -item[1]):
+        print(f"{kind:>10}  {count:>8}  {sizes[kind]:>5}")
+    print(f"{nodes} nodes in {used / 1e6:.1f}MB: {used / nodes:.1f} bytes/node including lists, literals and names")
+
+# A generated script of roughly `size` characters of straight-line code, which takes far longer to parse than to run.
+def straight_line_source(size):
+    block = """a = 1
+b = a * 2 + (a - 3) / 4
+c = "label " + "for " + "b"
+IF (b > a AND !(c == "x")) {
+    a = a + b * (b - 1)
+} ELSE {
+    a = a - 1
+}
+"""
+    return block * max(1, size // len(block))
+
+# Prints the wall time of running a generated script with `simple.py` from scratch (cold, --no-cache) and with its
+# parsed program loaded from the __simplecache__ directory (warm). Each figure is the best of `repeats` runs.
+def startup_time(sizes=(10_000, 100_000, 1_000_000), repeats=3):
+    simple = os.path.join(os.path.dirname(os.path.abspath(__file__)), "simple.py")
+    print("Startup time (cold: scan + parse + optimize, warm: load from cache)")
+    print(f"{'size':>10}  {'cold':>8}  {'warm':>8}  {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            path = os.path.join(directory, f"script{size}.txt")
+            with open(path, "w") as file:
+                file.write(straight_line_source(size))
+
+            def best(*flags):
+                times = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    subprocess.run([sys.executable, simple, *flags, path], stdout=subprocess.DEVNULL, check=True)
+                    times.append(time.perf_counter() - start)
+                return min(times)
+
+            cold = best("--no-cache")
+            subprocess.run([sys.executable, simple, path], stdout=subprocess.DEVNULL, check=True)
+            warm = best()
+            print(f"{size:>10}  {cold:>7.3f}s  {warm:>7.3f}s  {cold / warm:>7.1f}x")
+
+# Prints how long a full scan and parse of generated scripts takes, and how long an IncrementalParser takes to bring
+# them up to date after changing one line in the middle and after inserting a line near the top. The second also
+# renumbers the lines of every statement below the insertion, which is linear in the script but needs no scanning.
+def incremental_parsing(sizes=(100_000, 1_000_000, 4_000_000)):
+    print("Parsing after a one-line edit (full: scan + parse, edit: change a line, insert: add a line near the top)")
+    print(f"{'size':>10}  {'full':>9}  {'edit':>9}  {'insert':>9}  {'scanned':>8}  {'parsed':>6}")
+    for size in sizes:
+        source = straight_line_source(size)
+        start = time.perf_counter()
+        Parser(FastScanner(source).scan_tokens()).parse()
+        full = time.perf_counter() - start
+
+        document = IncrementalParser()
+        document.update(source)
+        middle = source.index("b = a * 2", len(source) // 2)
+        edited = source[:middle] + "b = a * 3" + source[middle + len("b = a * 2"):]
+        start = time.perf_counter()
+        document.update(edited)
+        edit = time.perf_counter() - start
+        scanned, parsed = document.scanned, document.parsed
+
+        top = edited.index("\n", len(edited) // 10) + 1
+        start = time.perf_counter()
+        document.update(edited[:top] + "d = 1\n" + edited[top:])
+        insert = time.perf_counter() - start
+        print(f"{size:>10}  {full * 1000:>7.1f}ms  {edit * 1000:>7.2f}ms  {insert * 1000:>7.1f}ms  {scanned:>8}  {parsed:>6}")
+
+# Prints the wall time and peak resident memory of running generated scripts of `sizes_mb` megabytes, whose string
+# literals hold non-ASCII text, with `simple.py --no-cache` reading each file into a string (read) and with --mmap
+# scanning the bytes of the mapped file (mmap). Each run is a separate child process, whose peak RSS is taken from
+# os.wait4. The output of both is compared.
+def mapped_scanning(sizes_mb=(1, 4)):
+    block = """a = 1
+b = a * 2 + (a - 3) / 4
+c = "étiquette für " + "b → 日本"
+IF (b > a AND !(c == "x")) {
+    a = a + b * (b - 1)
+} ELSE {
+    PRINT "naïve"
+}
+"""
+    simple = os.path.join(os.path.dirname(os.path.abspath(__file__)), "simple.py")
+
+    def measure(*flags):
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, simple, "--no-cache", *flags, path], stdout=subprocess.PIPE)
+        output = process.stdout.read()
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        if process.returncode != 0:
+            raise RuntimeError(f"simple.py {' '.join(flags)} exited with {process.returncode}")
+        return time.perf_counter() - start, usage.ru_maxrss / 1024, output
+
+    print("Running a generated script read into a string (read) and scanned from a memory-mapped file (mmap)")
+    print(f"{'size':>8}  {'read':>8}  {'mmap':>8}  {'read RSS':>10}  {'mmap RSS':>10}  {'saved':>6}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size_mb in sizes_mb:
+            path = os.path.join(directory, f"script{size_mb}.txt")
+            with open(path, "w", encoding="utf-8") as file:
+                for _ in range(size_mb * 1_000_000 // len(block.encode())):
+                    file.write(block)
+            read_time, read_rss, read_output = measure()
+            mmap_time, mmap_rss, mmap_output = measure("--mmap")
+            if mmap_output != read_output:
+                raise RuntimeError("--mmap printed different output")
+            print(f"{size_mb:>6}MB  {read_time:>7.2f}s  {mmap_time:>7.2f}s  {read_rss:>8.1f}MB  {mmap_rss:>8.1f}MB  "
+                  f"{1 - mmap_rss / read_rss:>6.0%}")
+
+# Prints how the time the optimizer and type inference take grows with the size of a generated script. Both passes
+# should be linear in the script, so their time per KB of source should stay about the same from row to row. Raises
+# an error when either grows more than `max_growth` times from the smallest script to the largest.
+def analysis_scaling(sizes=(50_000, 100_000, 200_000, 400_000), max_growth=3):
+    print("Analysis time by script size, in total and per KB of source")
+    print(f"{'size':>10}  {'optimize':>9}  {'per KB':>8}  {'infer':>9}  {'per KB':>8}")
+    per_kb = []
+    for size in sizes:
+        statements = Parser(FastScanner(generated_source(size)).scan_tokens()).parse()
+        gc.collect()
+        start = time.perf_counter()
+        statements = Optimizer().optimize(statements)
+        optimized = time.perf_counter()
+        TypeInference().infer(statements)
+        inferred = time.perf_counter()
+        per_kb.append(((optimized - start) / size * 1000, (inferred - optimized) / size * 1000))
+        print(f"{size:>10}  {optimized - start:>8.3f}s  {per_kb[-1][0] * 1000:>6.2f}ms  "
+              f"{inferred - optimized:>8.3f}s  {per_kb[-1][1] * 1000:>6.2f}ms")
+    for phase, first, last in zip(("optimize", "infer"), per_kb[0], per_kb[-1]):
+        if last > max_growth * first:
+            raise RuntimeError(f"{phase} time per KB grew {last / first:.1f}x from {sizes[0]} to {sizes[-1]} characters")
+
+# Prints the wall time of a script that prints `lines` lines into a pipe, writing every line as it is printed and
+# with the default output buffer.
+def output_buffering(lines=300_000):
+    simple = os.path.join(os.path.dirname(os.path.abspath(__file__)), "simple.py")
+    source = f"i = 0\nWHILE (i < {lines}) {{\n    PRINT i\n    i = i + 1\n}}\n"
+    print(f"Printing {lines} lines to a pipe")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "print.txt")
+        with open(path, "w") as file:
+            file.write(source)
+        for name, flags in (("unbuffered", ["--output-buffer", "0"]), ("buffered", [])):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, simple, "--no-cache", *flags, path], stdout=subprocess.PIPE, check=True)
+            print(f"{name:>12}  {time.perf_counter() - start:6.3f}s")
+
+# Runs `count` shopping-list sessions at once on one event loop, each answering its INPUTs after a short delay, next
+# to one busy loop that is stopped by its time budget. Prints the wall time and the peak memory they took.
+def concurrent_sessions(count=5000, items=3, delay=0.01):
+    shopping = compile_script(string_building_source(items).replace('shoppingList = shoppingList + ", " + "item"',
+                                                                 'shoppingList = shoppingList + ", " + INPUT("Item: ")'))
+    busy = compile_script("i = 0\nWHILE (TRUE) {\n    i = i + 1\n}\n")
+
+    async def session():
+        async def answer(prompt):
+            await asyncio.sleep(delay)
+            return "item"
+        await run_session(shopping, answer, lambda value: None)
+
+    async def main():
+        busy_session = run_session(busy, None, lambda value: None, time_budget=1.0)
+        results = await asyncio.gather(busy_session, *(session() for _ in range(count)), return_exceptions=True)
+        return [result for result in results if isinstance(result, Exception)]
+
+    print(f"{count} concurrent sessions of {items} INPUTs each, next to a busy loop with a 1s time budget")
+    tracemalloc.start()
+    start = time.perf_counter()
+    errors = asyncio.run(main())
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"  {elapsed:.2f}s, {count * items / elapsed:.0f} INPUTs/s, peak {peak / 1e6:.1f} MB, errors: {[str(error) for error in errors]}")
+
+BENCHMARKS = {
+    "strings": string_building,
+    "scanner": scanner_throughput,
+    "tokens": token_memory,
+    "ast": ast_memory,
+    "startup": startup_time,
+    "output": output_buffering,
+    "sessions": concurrent_sessions,
+    "streaming": streaming_memory,
+    "incremental": incremental_parsing,
+    "mmap": mapped_scanning,
+    "analysis": analysis_scaling,
+}
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Run Simple interpreter benchmarks.")
+    arguments.add_argument("benchmarks", nargs="*", metavar="BENCHMARK",
+                           help=f"which benchmarks to run: {', '.join(BENCHMARKS)} (default: strings scanner tokens)")
+    args = arguments.parse_args()
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            arguments.error(f"unknown benchmark '{name}'")
+    failed = False
+    for index, name in enumerate(args.benchmarks or ["strings", "scanner", "tokens"]):
+        if index:
+            print()
+        try:
+            BENCHMARKS[name]()
+        except RuntimeError as error:
+            print(f"{name} failed: {error}", file=sys.stderr)
+            failed = True
+    sys.exit(1 if failed else 0)
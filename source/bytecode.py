@@ -0,0 +1,271 @@
+from array import array
+from expressions import *
+from resolver import Resolver
+from arrays import BUILTINS
+
+# Opcodes. Every instruction is two integers in the code array: the opcode and its argument (0 when unused).
+CONST = 0
+LOAD = 1
+STORE = 2
+DUP = 3
+POP = 4
+ADD = 5
+SUB = 6
+MUL = 7
+DIV = 8
+LESS = 9
+LESS_EQUAL = 10
+GREATER = 11
+GREATER_EQUAL = 12
+EQUAL = 13
+NOT_EQUAL = 14
+AND = 15
+OR = 16
+NEGATE = 17
+NOT = 18
+JUMP = 19
+JUMP_IF_FALSE = 20
+PRINT = 21
+INPUT = 22
+CACHED = 23
+RESET = 24
+STORE_CACHED = 25
+ARRAY = 26
+INDEX = 27
+SET_INDEX = 28
+CALL = 29
+
+OPCODE_NAMES = {
+    CONST: "CONST",
+    LOAD: "LOAD",
+    STORE: "STORE",
+    DUP: "DUP",
+    POP: "POP",
+    ADD: "ADD",
+    SUB: "SUB",
+    MUL: "MUL",
+    DIV: "DIV",
+    LESS: "LESS",
+    LESS_EQUAL: "LESS_EQUAL",
+    GREATER: "GREATER",
+    GREATER_EQUAL: "GREATER_EQUAL",
+    EQUAL: "EQUAL",
+    NOT_EQUAL: "NOT_EQUAL",
+    AND: "AND",
+    OR: "OR",
+    NEGATE: "NEGATE",
+    NOT: "NOT",
+    JUMP: "JUMP",
+    JUMP_IF_FALSE: "JUMP_IF_FALSE",
+    PRINT: "PRINT",
+    INPUT: "INPUT",
+    CACHED: "CACHED",
+    RESET: "RESET",
+    STORE_CACHED: "STORE_CACHED",
+    ARRAY: "ARRAY",
+    INDEX: "INDEX",
+    SET_INDEX: "SET_INDEX",
+    CALL: "CALL",
+}
+
+BINARY_OPCODES = {
+    '+': ADD,
+    '-': SUB,
+    '*': MUL,
+    '/': DIV,
+    '<': LESS,
+    '<=': LESS_EQUAL,
+    '>': GREATER,
+    '>=': GREATER_EQUAL,
+    '==': EQUAL,
+    '!=': NOT_EQUAL,
+    'AND': AND,
+    'OR': OR,
+}
+
+# The built-in functions, numbered for the argument of CALL.
+FUNCTIONS = list(BUILTINS)
+
+UNARY_OPCODES = {
+    '-': NEGATE,
+    '!': NOT,
+}
+
+class Chunk:
+    """
+    A compiled program: a flat instruction array, a constants pool and the variable names indexed by environment slot.
+    """
+    def __init__(self):
+        self.code = array('i')
+        self.constants = []
+        self.names = []
+
+    # Appends an instruction and returns its offset in the code array.
+    def emit(self, opcode, argument=0):
+        offset = len(self.code)
+        self.code.append(opcode)
+        self.code.append(argument)
+        return offset
+
+class Compiler:
+    """
+    Lowers parsed statements into a Chunk for the stack-based VM.
+    WHILE and IF are compiled into conditional and unconditional jumps, so control flow needs no recursion at run time.
+    """
+    def __init__(self, environment):
+        self.environment = environment
+        self.chunk = Chunk()
+        self.constant_indices = {}
+        self.slots = {}
+
+    # Compiles a list of statements and returns the finished chunk. Variable slots are those of the environment.
+    def compile(self, statements):
+        self.slots = Resolver(self.environment).resolve(statements)
+        for statement in statements:
+            self.statement(statement)
+        self.chunk.names = self.environment.names()
+        return self.chunk
+
+    # Emits the code for a single statement. Statements leave the stack as they found it.
+    def statement(self, statement):
+        if isinstance(statement, Print):
+            self.expression(statement.expression)
+            self.chunk.emit(PRINT)
+
+        elif isinstance(statement, Assign):
+            self.expression(statement.value)
+            self.chunk.emit(STORE, self.slots[statement.name])
+
+        elif isinstance(statement, While):
+            start = len(self.chunk.code)
+            self.expression(statement.condition)
+            exit_jump = self.chunk.emit(JUMP_IF_FALSE)
+            for stmt in statement.body:
+                self.statement(stmt)
+            self.chunk.emit(JUMP, start)
+            self.patch(exit_jump)
+
+        elif isinstance(statement, If):
+            self.expression(statement.condition)
+            else_jump = self.chunk.emit(JUMP_IF_FALSE)
+            for stmt in statement.then_branch:
+                self.statement(stmt)
+            if statement.else_branch:
+                end_jump = self.chunk.emit(JUMP)
+                self.patch(else_jump)
+                for stmt in statement.else_branch:
+                    self.statement(stmt)
+                self.patch(end_jump)
+            else:
+                self.patch(else_jump)
+
+        elif isinstance(statement, Reset):
+            for name in statement.names:
+                self.chunk.emit(RESET, self.slots[name])
+
+        else:
+            self.expression(statement)
+            self.chunk.emit(POP)
+
+    # Emits the code for an expression, which leaves exactly one value on the stack.
+    def expression(self, expr):
+        if isinstance(expr, Literal):
+            self.chunk.emit(CONST, self.constant(expr.value))
+
+        elif isinstance(expr, Grouping):
+            self.expression(expr.expression)
+
+        elif isinstance(expr, Unary):
+            operator = expr.operator
+            if operator not in UNARY_OPCODES:
+                raise RuntimeError(f"Unknown unary operator {operator}")
+            self.expression(expr.right)
+            self.chunk.emit(UNARY_OPCODES[operator])
+
+        elif isinstance(expr, Binary):
+            operator = expr.operator
+            if operator not in BINARY_OPCODES:
+                raise RuntimeError(f"Unknown binary operator {operator}")
+            self.expression(expr.left)
+            self.expression(expr.right)
+            self.chunk.emit(BINARY_OPCODES[operator])
+
+        elif isinstance(expr, Variable):
+            self.chunk.emit(LOAD, self.slots[expr.name])
+
+        elif isinstance(expr, Assign):
+            self.expression(expr.value)
+            self.chunk.emit(DUP)
+            self.chunk.emit(STORE, self.slots[expr.name])
+
+        elif isinstance(expr, Input):
+            self.expression(expr.prompt)
+            self.chunk.emit(INPUT)
+
+        elif isinstance(expr, Index):
+            self.expression(expr.array)
+            self.expression(expr.index)
+            self.chunk.emit(INDEX)
+
+        elif isinstance(expr, AssignIndex):
+            self.expression(expr.array)
+            self.expression(expr.index)
+            self.expression(expr.value)
+            self.chunk.emit(SET_INDEX)
+
+        elif isinstance(expr, ArrayLiteral):
+            for element in expr.elements:
+                self.expression(element)
+            self.chunk.emit(ARRAY, len(expr.elements))
+
+        elif isinstance(expr, Call):
+            for argument in expr.arguments:
+                self.expression(argument)
+            self.chunk.emit(CALL, FUNCTIONS.index(expr.name))
+
+        # CACHED is followed by a JUMP past the computation. The VM takes that jump itself when the slot holds a value,
+        # after pushing it, and skips the JUMP while the slot is still empty, so the expression is computed and stored.
+        # STORE_CACHED leaves the value on the stack and does not store arrays, which are recomputed every time.
+        elif isinstance(expr, Temporary):
+            slot = self.slots[expr.name]
+            self.chunk.emit(CACHED, slot)
+            end_jump = self.chunk.emit(JUMP)
+            self.expression(expr.expression)
+            self.chunk.emit(STORE_CACHED, slot)
+            self.patch(end_jump)
+
+        else:
+            raise RuntimeError(f"Unknown expression type {type(expr)}")
+
+    # Points a previously emitted jump at the current end of the code.
+    def patch(self, offset):
+        self.chunk.code[offset + 1] = len(self.chunk.code)
+
+    # Returns the constants pool index for a value, reusing equal constants of the same type.
+    # Floats are keyed by repr so that 0.0 and -0.0 stay distinct.
+    def constant(self, value):
+        key = (type(value), repr(value) if type(value) is float else value)
+        if key not in self.constant_indices:
+            self.constant_indices[key] = len(self.chunk.constants)
+            self.chunk.constants.append(value)
+        return self.constant_indices[key]
+
+# Returns a human-readable listing of a chunk, one instruction per line.
+def disassemble(chunk):
+    lines = []
+    code = chunk.code
+    for offset in range(0, len(code), 2):
+        opcode = code[offset]
+        argument = code[offset + 1]
+        name = OPCODE_NAMES[opcode]
+        if opcode == CONST:
+            lines.append(f"{offset:6}  {name:<14} {argument:4}  ({chunk.constants[argument]!r})")
+        elif opcode in (LOAD, STORE, CACHED, RESET, STORE_CACHED):
+            lines.append(f"{offset:6}  {name:<14} {argument:4}  ({chunk.names[argument]})")
+        elif opcode == CALL:
+            lines.append(f"{offset:6}  {name:<14} {argument:4}  ({FUNCTIONS[argument]})")
+        elif opcode in (JUMP, JUMP_IF_FALSE, ARRAY):
+            lines.append(f"{offset:6}  {name:<14} {argument:4}")
+        else:
+            lines.append(f"{offset:6}  {name}")
+    return "\n".join(lines)
@@ -0,0 +1,70 @@
+""" An on-disk cache of parsed and optimized programs, so that running an unchanged script skips scanning and parsing. """
+
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+from pathlib import Path
+
+# Directory, next to each script, that holds its cache entries.
+CACHE_DIRECTORY = "__simplecache__"
+
+# Bump whenever the AST classes, the scanner, the parser or the optimizer change what a cached program looks like.
+FORMAT_VERSION = 7
+
+MAGIC = b"SIMPLE-AST"
+
+class ProgramCache:
+    """
+    Stores pickled statement lists in a __simplecache__ directory beside the script. An entry is named after the
+    SHA-256 of the source and FORMAT_VERSION, and its header repeats both, so a changed script or a newer interpreter
+    never picks up an old entry. Entries that cannot be read back are treated as missing and rebuilt.
+    """
+    def __init__(self, directory: Path):
+        self.directory = directory
+
+    # Returns the file an entry for this source and variant (e.g. optimized or not) is stored in, and its header. The
+    # source is a string, or the bytes of a memory-mapped file, which are hashed without being copied.
+    def entry(self, source, variant: str):
+        digest = hashlib.sha256(source.encode() if isinstance(source, str) else source).hexdigest()
+        header = MAGIC + f":{FORMAT_VERSION}:{variant}:{digest}".encode()
+        return self.directory / f"{digest[:32]}.v{FORMAT_VERSION}.{variant}.pickle", header
+
+    # Returns the cached value for a source, or None if there is no usable entry.
+    def load(self, source: str, variant: str):
+        path, header = self.entry(source, variant)
+        try:
+            with path.open("rb") as file:
+                if file.readline().rstrip(b"\n") != header:
+                    return None
+                return pickle.load(file)
+        except Exception:
+            return None
+
+    # Stores a value for a source. The entry is written to a temporary file first and renamed into place, so a
+    # concurrent reader never sees half of it. A cache that cannot be written is silently skipped.
+    def store(self, source: str, variant: str, value):
+        path, header = self.entry(source, variant)
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except RecursionError:
+            return
+        try:
+            self.directory.mkdir(exist_ok=True)
+            descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(header + b"\n")
+                file.write(data)
+            os.chmod(temporary, 0o644)
+            os.replace(temporary, path)
+        except OSError:
+            return
+
+    # Deletes every entry in the cache directory.
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+# Returns the cache for scripts in the same directory as `path`.
+def script_cache(path: Path):
+    return ProgramCache(path.parent / CACHE_DIRECTORY)
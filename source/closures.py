@@ -0,0 +1,262 @@
+from expressions import *
+from interpreter import Environment, UNDEFINED
+from resolver import Resolver
+from strings import concat, TEXT_TYPES
+from arrays import Array, BUILTINS, make_array, index, assign_index
+
+class ClosureInterpreter:
+    """
+    Compiles the parsed statements into a tree of pre-bound Python closures and then runs them.
+    Node types and operators are resolved once at compile time, so executing a closure does no isinstance or operator checks.
+    The closures keep no state of their own: they read and write variables through `it.values` and do I/O through
+    `it.print` and `it.input`, so the same compiled program can be run against other state (see program.Program).
+    """
+    def __init__(self, environment=None):
+        self.environment = environment if environment is not None else Environment()
+        self.values = self.environment.values
+        self.slots = {}
+        self.print = print
+        self.input = input
+
+    # Compile and run a list of statements, executing each one in sequence.
+    def interpret(self, statements):
+        self.compile(statements)(self)
+
+    # Compile a list of statements into a single closure that takes the interpreter as its only argument.
+    # Variables are resolved to environment slots first, so the closures index self.values directly.
+    def compile(self, statements):
+        self.slots = Resolver(self.environment).resolve(statements)
+        return self.compile_block(statements)
+
+    # Compile a block of statements, unrolling the common one-statement case.
+    def compile_block(self, statements):
+        compiled = tuple(self.compile_statement(stmt) for stmt in statements)
+        if len(compiled) == 1:
+            return compiled[0]
+
+        def block(it):
+            for stmt in compiled:
+                stmt(it)
+        return block
+
+    # Compile a single statement, handling Print, Assign, While, If and expression statements.
+    def compile_statement(self, statement):
+        if isinstance(statement, Print):
+            expression = self.compile_expression(statement.expression)
+
+            def print_statement(it):
+                it.print(expression(it))
+            return print_statement
+
+        elif isinstance(statement, While):
+            condition = self.compile_expression(statement.condition)
+            body = self.compile_block(statement.body)
+
+            def while_statement(it):
+                while condition(it):
+                    body(it)
+            return while_statement
+
+        elif isinstance(statement, If):
+            condition = self.compile_expression(statement.condition)
+            then_branch = self.compile_block(statement.then_branch)
+            if not statement.else_branch:
+                def if_statement(it):
+                    if condition(it):
+                        then_branch(it)
+                return if_statement
+
+            else_branch = self.compile_block(statement.else_branch)
+
+            def if_else_statement(it):
+                if condition(it):
+                    then_branch(it)
+                else:
+                    else_branch(it)
+            return if_else_statement
+
+        elif isinstance(statement, Reset):
+            slots = tuple(self.slots[name] for name in statement.names)
+
+            def reset(it):
+                for slot in slots:
+                    it.values[slot] = UNDEFINED
+            return reset
+
+        return self.compile_expression(statement)
+
+    # Compile an expression into a closure that returns its value.
+    def compile_expression(self, expr):
+        if isinstance(expr, Literal):
+            value = expr.value
+            return lambda it: value
+
+        elif isinstance(expr, Grouping):
+            return self.compile_expression(expr.expression)
+
+        elif isinstance(expr, Unary):
+            right = self.compile_expression(expr.right)
+            operator = expr.operator
+
+            if operator == '-':
+                return lambda it: -right(it)
+            elif operator == '!':
+                return lambda it: not right(it)
+            raise RuntimeError(f"Unknown unary operator {operator}")
+
+        elif isinstance(expr, Binary):
+            operator = expr.operator
+            factory = BINARY_OPERATORS.get(operator)
+            if isinstance(expr, TypedBinary):
+                factory = TYPED_OPERATORS.get((operator, expr.operands), factory)
+            if factory is None:
+                raise RuntimeError(f"Unknown binary operator {operator}")
+            left = self.compile_expression(expr.left)
+            if isinstance(expr.right, Literal):
+                constant = CONSTANT_OPERATORS.get(operator)
+                if constant is not None:
+                    return constant(left, expr.right.value)
+            return factory(left, self.compile_expression(expr.right))
+
+        elif isinstance(expr, Variable):
+            name = expr.name
+            slot = self.slots[name]
+
+            def variable(it):
+                value = it.values[slot]
+                if value is UNDEFINED:
+                    raise RuntimeError(f"Undefined variable '{name}'.")
+                return value
+            return variable
+
+        elif isinstance(expr, Assign):
+            slot = self.slots[expr.name]
+            value = self.compile_expression(expr.value)
+
+            def assign(it):
+                result = value(it)
+                it.values[slot] = result
+                return result
+            return assign
+
+        elif isinstance(expr, Input):
+            prompt = self.compile_expression(expr.prompt)
+            return lambda it: it.input(str(prompt(it)))
+
+        elif isinstance(expr, Index):
+            array = self.compile_expression(expr.array)
+            position = self.compile_expression(expr.index)
+
+            def index_expression(it):
+                value = array(it)
+                return index(value, position(it))
+            return index_expression
+
+        elif isinstance(expr, AssignIndex):
+            array = self.compile_expression(expr.array)
+            position = self.compile_expression(expr.index)
+            value = self.compile_expression(expr.value)
+
+            def assign_index_expression(it):
+                target = array(it)
+                where = position(it)
+                return assign_index(target, where, value(it))
+            return assign_index_expression
+
+        elif isinstance(expr, ArrayLiteral):
+            elements = tuple(self.compile_expression(element) for element in expr.elements)
+            return lambda it: make_array([element(it) for element in elements])
+
+        elif isinstance(expr, Call):
+            function = BUILTINS[expr.name][0]
+            arguments = tuple(self.compile_expression(argument) for argument in expr.arguments)
+            if len(arguments) == 1:
+                argument = arguments[0]
+                return lambda it: function(argument(it))
+            return lambda it: function(*[argument(it) for argument in arguments])
+
+        # Arrays are mutable, so a temporary holding one could go stale; they are recomputed instead of cached.
+        elif isinstance(expr, Temporary):
+            slot = self.slots[expr.name]
+            expression = self.compile_expression(expr.expression)
+
+            def temporary(it):
+                value = it.values[slot]
+                if value is UNDEFINED:
+                    value = expression(it)
+                    if type(value) is not Array:
+                        it.values[slot] = value
+                return value
+            return temporary
+
+        raise RuntimeError(f"Unknown expression type {type(expr)}")
+
+# Division keeps the tree walker's explicit zero check so the error message stays the same.
+def divide(left, right):
+    def division(it):
+        dividend = left(it)
+        divisor = right(it)
+        if type(divisor) is not Array and divisor == 0:
+            raise RuntimeError("Division by zero.")
+        return dividend / divisor
+    return division
+
+def divide_constant(left, divisor):
+    if divisor == 0:
+        def division(it):
+            left(it)
+            raise RuntimeError("Division by zero.")
+        return division
+    return lambda it: left(it) / divisor
+
+# Strings are concatenated through strings.concat so that building one up in a loop stays linear.
+def add(left, right):
+    def addition(it):
+        value = left(it)
+        if type(value) in TEXT_TYPES:
+            return concat(value, right(it))
+        return value + right(it)
+    return addition
+
+def add_constant(left, value):
+    if type(value) is str:
+        return lambda it: concat(left(it), value)
+    return lambda it: left(it) + value
+
+# Each factory takes the compiled operand closures and returns the closure for the whole Binary node.
+# AND and OR always evaluate both operands, matching Interpreter.evaluate.
+BINARY_OPERATORS = {
+    '+': add,
+    '-': lambda left, right: lambda it: left(it) - right(it),
+    '*': lambda left, right: lambda it: left(it) * right(it),
+    '/': divide,
+    '<': lambda left, right: lambda it: left(it) < right(it),
+    '<=': lambda left, right: lambda it: left(it) <= right(it),
+    '>': lambda left, right: lambda it: left(it) > right(it),
+    '>=': lambda left, right: lambda it: left(it) >= right(it),
+    '==': lambda left, right: lambda it: left(it) == right(it),
+    '!=': lambda left, right: lambda it: left(it) != right(it),
+    'AND': lambda left, right: lambda it: bool(left(it)) & bool(right(it)),
+    'OR': lambda left, right: lambda it: bool(left(it)) | bool(right(it)),
+}
+
+# Variants for operations type inference specialized, which need no string handling or bool() calls.
+TYPED_OPERATORS = {
+    ('+', "number"): lambda left, right: lambda it: left(it) + right(it),
+    ('AND', "boolean"): lambda left, right: lambda it: left(it) & right(it),
+    ('OR', "boolean"): lambda left, right: lambda it: left(it) | right(it),
+}
+
+# Variants used when the right operand is a literal, which saves one closure call per evaluation.
+CONSTANT_OPERATORS = {
+    '+': add_constant,
+    '-': lambda left, value: lambda it: left(it) - value,
+    '*': lambda left, value: lambda it: left(it) * value,
+    '/': divide_constant,
+    '<': lambda left, value: lambda it: left(it) < value,
+    '<=': lambda left, value: lambda it: left(it) <= value,
+    '>': lambda left, value: lambda it: left(it) > value,
+    '>=': lambda left, value: lambda it: left(it) >= value,
+    '==': lambda left, value: lambda it: left(it) == value,
+    '!=': lambda left, value: lambda it: left(it) != value,
+}
@@ -1,48 +1,211 @@
-""" This file defines AST (Abstract Syntax Tree) classes for various expressions in a programming language. """
+""" This file defines AST (Abstract Syntax Tree) classes for various expressions in a programming language.
+Every node records the line it starts on, which the profiler reports. Nodes use __slots__ instead of a per-instance
+__dict__, and operators and variable names are stored as plain interned strings rather than the Tokens they were
+parsed from, so the tree of a multi-MB script stays small. """
 
 class Literal:
-    def __init__(self, value):
+    __slots__ = ('value', 'line')
+
+    def __init__(self, value, line=0):
         self.value = value
+        self.line = line
 
 class Unary:
-    def __init__(self, operator, right):
+    __slots__ = ('operator', 'right', 'line')
+
+    def __init__(self, operator, right, line=0):
         self.operator = operator
         self.right = right
+        self.line = line
 
 class Binary:
-    def __init__(self, left, operator, right):
+    __slots__ = ('left', 'operator', 'right', 'line')
+
+    def __init__(self, left, operator, right, line=0):
         self.left = left
         self.operator = operator
         self.right = right
+        self.line = line
 
 class Grouping:
-    def __init__(self, expression):
+    __slots__ = ('expression', 'line')
+
+    def __init__(self, expression, line=0):
         self.expression = expression
+        self.line = line
 
 class Input:
-    def __init__(self, prompt):
+    __slots__ = ('prompt', 'line')
+
+    def __init__(self, prompt, line=0):
         self.prompt = prompt
+        self.line = line
 
 class If:
-    def __init__(self, condition, then_branch, else_branch=None):
+    __slots__ = ('condition', 'then_branch', 'else_branch', 'line')
+
+    def __init__(self, condition, then_branch, else_branch=None, line=0):
         self.condition = condition
         self.then_branch = then_branch
         self.else_branch = else_branch
+        self.line = line
 
 class Print:
-    def __init__(self, expression):
+    __slots__ = ('expression', 'line')
+
+    def __init__(self, expression, line=0):
         self.expression = expression
-        
+        self.line = line
+
 class Variable:
-    def __init__(self, name):
+    __slots__ = ('name', 'line')
+
+    def __init__(self, name, line=0):
         self.name = name
+        self.line = line
 
 class Assign:
-    def __init__(self, name, value):
+    __slots__ = ('name', 'value', 'line')
+
+    def __init__(self, name, value, line=0):
         self.name = name
         self.value = value
+        self.line = line
 
 class While:
-    def __init__(self, condition, body):
+    __slots__ = ('condition', 'body', 'line')
+
+    def __init__(self, condition, body, line=0):
         self.condition = condition
-        self.body = body
\ No newline at end of file
+        self.body = body
+        self.line = line
+
+class ArrayLiteral:
+    __slots__ = ('elements', 'line')
+
+    def __init__(self, elements, line=0):
+        self.elements = elements
+        self.line = line
+
+class Index:
+    __slots__ = ('array', 'index', 'line')
+
+    def __init__(self, array, index, line=0):
+        self.array = array
+        self.index = index
+        self.line = line
+
+class AssignIndex:
+    __slots__ = ('array', 'index', 'value', 'line')
+
+    def __init__(self, array, index, value, line=0):
+        self.array = array
+        self.index = index
+        self.value = value
+        self.line = line
+
+# A call of one of the built-in functions in arrays.BUILTINS, such as LEN or APPEND.
+class Call:
+    __slots__ = ('name', 'arguments', 'line')
+
+    def __init__(self, name, arguments, line=0):
+        self.name = name
+        self.arguments = arguments
+        self.line = line
+
+# Added by the optimizer: a pure expression whose value is kept in the hidden variable `name`. It is computed the
+# first time the node is evaluated after the Reset that clears it, and that value is reused until the next Reset.
+class Temporary:
+    __slots__ = ('expression', 'name', 'line')
+
+    def __init__(self, expression, name, line=0):
+        self.expression = expression
+        self.name = name
+        self.line = line
+
+# Added by the optimizer: a statement that clears the hidden variables of the Temporary nodes after it.
+class Reset:
+    __slots__ = ('names', 'line')
+
+    def __init__(self, names, line=0):
+        self.names = names
+        self.line = line
+
+# Added by type inference: a Binary whose operands are known to be numbers, strings or booleans (`operands` says
+# which). Evaluating it calls `function`, the operation for exactly those operands, instead of choosing one by operator.
+class TypedBinary(Binary):
+    __slots__ = ('operands', 'function')
+
+    def __init__(self, left, operator, right, operands, function, line=0):
+        super().__init__(left, operator, right, line)
+        self.operands = operands
+        self.function = function
+
+# Added by type inference: the same for a Unary.
+class TypedUnary(Unary):
+    __slots__ = ('operands', 'function')
+
+    def __init__(self, operator, right, operands, function, line=0):
+        super().__init__(operator, right, line)
+        self.operands = operands
+        self.function = function
+
+# Names of the hidden variables that hold Temporary values. No identifier can start with it.
+TEMPORARY_PREFIX = "@"
+
+# Checks if a variable name belongs to a Temporary rather than to the script.
+def is_temporary(name):
+    return name.startswith(TEMPORARY_PREFIX)
+
+# Returns the child nodes of a statement or expression, including the statements of nested blocks.
+def children(node):
+    if isinstance(node, Binary):
+        return [node.left, node.right]
+    elif isinstance(node, Unary):
+        return [node.right]
+    elif isinstance(node, (Grouping, Print, Temporary)):
+        return [node.expression]
+    elif isinstance(node, Assign):
+        return [node.value]
+    elif isinstance(node, Input):
+        return [node.prompt]
+    elif isinstance(node, ArrayLiteral):
+        return list(node.elements)
+    elif isinstance(node, Index):
+        return [node.array, node.index]
+    elif isinstance(node, AssignIndex):
+        return [node.array, node.index, node.value]
+    elif isinstance(node, Call):
+        return list(node.arguments)
+    elif isinstance(node, While):
+        return [node.condition, *node.body]
+    elif isinstance(node, If):
+        return [node.condition, *node.then_branch, *(node.else_branch or [])]
+    return []
+
+# Nesting depth up to which the recursive passes (the optimizer and the closure, bytecode and Python compilers) are
+# used. Deeper programs are left unoptimized and run by the tree walker, whose evaluator does not recurse.
+MAX_NESTING = 100
+
+# Returns how many levels of nodes a list of statements nests, without recursing.
+def depth(statements):
+    deepest = 0
+    stack = [(statement, 1) for statement in statements]
+    while stack:
+        node, level = stack.pop()
+        if level > deepest:
+            deepest = level
+        stack.extend((child, level + 1) for child in children(node))
+    return deepest
+
+# Returns how many WHILE loops a list of statements nests inside one another, without recursing.
+def loop_depth(statements):
+    deepest = 0
+    stack = [(statement, 0) for statement in statements]
+    while stack:
+        node, level = stack.pop()
+        if isinstance(node, While):
+            level += 1
+            deepest = max(deepest, level)
+        stack.extend((child, level) for child in children(node))
+    return deepest
@@ -0,0 +1,210 @@
+""" An incremental front end: after an edit, only the top-level statements around it are scanned and parsed again. """
+
+from bisect import bisect_right
+from itertools import accumulate
+from scanner import FastScanner
+from parser import StreamingParser
+from tokens import Token, TokenType
+from expressions import children
+
+# Characters compared at a time when looking for the part of a script an edit changed.
+BLOCK_SIZE = 4096
+
+class Chunk:
+    """
+    A run of whole lines holding one or more complete top-level statements, with the tokens they were parsed from.
+    A chunk starts at the beginning of a line that no earlier token ends on, so both the scanner and the parser can
+    start afresh there. `length` and `lines` are the characters and newlines of its text. `line` and `token_line`
+    are the lines its nodes and its tokens are numbered from: when lines are added or removed above the chunk, its
+    nodes are renumbered before the statements are returned, and its tokens only if they are parsed again.
+    """
+    __slots__ = ('statements', 'tokens', 'length', 'lines', 'line', 'token_line')
+
+    def __init__(self, statements, tokens, length, lines, line):
+        self.statements = statements
+        self.tokens = tokens
+        self.length = length
+        self.lines = lines
+        self.line = line
+        self.token_line = line
+
+    # Renumbers the chunk's nodes so that it starts on `line`.
+    def move(self, line):
+        shift = line - self.line
+        if shift == 0:
+            return
+        stack = list(self.statements)
+        while stack:
+            node = stack.pop()
+            node.line += shift
+            stack.extend(children(node))
+        self.line = line
+
+    # Renumbers the chunk's tokens so that it starts on `line`.
+    def move_tokens(self, line):
+        shift = line - self.token_line
+        if shift == 0:
+            return
+        for token in self.tokens:
+            token.line += shift
+        self.token_line = line
+
+class IncrementalParser:
+    """
+    Keeps a script's tokens and top-level statements, split into chunks, from one version of the script to the next.
+    update takes the new source and finds the changed part by comparing it with the previous one; edit takes the
+    change directly, as an editor reports it. Either way, the chunks the change touches are scanned again, together
+    with the chunk before them, whose last statement could now continue into the changed text. The new tokens are
+    parsed with the tokens of the following chunks as lookahead. Parsing stops as soon as a statement ends where an
+    unchanged chunk starts; it continues into the following chunks only while statements run past the change, for
+    example after a closing brace was deleted. A change that leaves a string open is scanned up to the chunk where
+    the string closes. Everything else is kept as it was, so the work done depends on the size of the edited
+    statements rather than on the size of the script. `scanned` and `parsed` are the characters scanned and the
+    statements parsed by the last change.
+    """
+    def __init__(self, scanner=FastScanner):
+        self.scanner = scanner
+        self.source = ""
+        self.chunks = []
+        self.last_line = 1
+        self.scanned = 0
+        self.parsed = 0
+
+    # Replaces the script with a new version and returns its statements.
+    def update(self, source):
+        old = self.source
+        start = common_prefix(old, source)
+        end = len(old) - common_suffix(old, source, min(len(old), len(source)) - start)
+        return self.edit(start, end, source[start:len(source) - len(old) + end])
+
+    # Replaces the characters from `start` to `end` with `text` and returns the script's statements. If the new
+    # script has a syntax error, the error is raised and the previous version is kept.
+    def edit(self, start, end, text):
+        old = self.source
+        source = old[:start] + text + old[end:]
+        chunks = self.chunks
+        count = len(chunks)
+        delta = len(text) - (end - start)
+        line_delta = text.count('\n') - old.count('\n', start, end)
+        starts = list(accumulate((chunk.length for chunk in chunks), initial=0))
+        lines = list(accumulate((chunk.lines for chunk in chunks), initial=1))
+
+        first = max(min(bisect_right(starts, start) - 1, count - 1) - 1, 0)
+        following = min(bisect_right(starts, end), count)
+        region_start = starts[first] if chunks else 0
+        region_end = starts[following] + delta if following < count else len(source)
+        while following < count and source.count('"', region_start, region_end) % 2:
+            following += 1
+            region_end = starts[following] + delta if following < count else len(source)
+        line = lines[first] if chunks else 1
+        last_line = self.last_line + line_delta
+
+        tokens = self.scanner(source[region_start:region_end], line).scan_tokens()
+        tokens.pop()
+        scanned = region_end - region_start
+
+        # Every token handed to the parser, and the position in that list at which each following chunk starts.
+        pulled = []
+        offsets = {}
+
+        def stream():
+            for token in tokens:
+                pulled.append(token)
+                yield token
+            for index in range(following, count):
+                chunk = chunks[index]
+                offsets[len(pulled)] = index
+                chunk.move_tokens(lines[index] + line_delta)
+                for token in chunk.tokens:
+                    pulled.append(token)
+                    yield token
+            offsets[len(pulled)] = count
+            yield Token(TokenType.EOF, '', None, last_line)
+
+        parser = StreamingParser(stream())
+        parsed = []
+        begin = 0
+        stop = count
+        for statement in parser.statements():
+            at_end = parser.current_token is None or parser.current_token.type is TokenType.EOF
+            finish = len(pulled) if at_end else len(pulled) - 1
+            parsed.append((statement, begin, finish))
+            begin = finish
+            if finish >= len(tokens) and finish in offsets:
+                stop = offsets[finish]
+                break
+        region_end = starts[stop] + delta if stop < count else len(source)
+
+        # Group the new statements into chunks, starting a new one wherever a statement starts on a later line than
+        # the one the previous statement ends on.
+        groups = []
+        for statement, begin, finish in parsed:
+            if groups and start_line(pulled[begin]) <= pulled[groups[-1][2] - 1].line:
+                groups[-1][0].append(statement)
+                groups[-1][2] = finish
+            else:
+                groups.append([[statement], begin, finish])
+
+        replacement = []
+        position = region_start
+        current_line = line
+        for index, (statements, begin, finish) in enumerate(groups):
+            chunk_start, chunk_line = position, current_line
+            if index + 1 < len(groups):
+                next_line = start_line(pulled[groups[index + 1][1]])
+                while current_line < next_line:
+                    position = source.index('\n', position) + 1
+                    current_line += 1
+            else:
+                position = region_end
+            replacement.append(Chunk(statements, pulled[begin:finish], position - chunk_start,
+                                     source.count('\n', chunk_start, position), chunk_line))
+
+        if not replacement and first > 0:
+            # Only blank text is left in the changed region: it joins the chunk before it.
+            previous = chunks[first - 1]
+            previous.length += region_end - region_start
+            previous.lines += source.count('\n', region_start, region_end)
+        chunks[first:stop] = replacement
+        self.source = source
+        self.last_line = last_line
+        self.scanned = scanned
+        self.parsed = len(parsed)
+        return self.statements()
+
+    # Returns the statements of the whole script, with their line numbers brought up to date.
+    def statements(self):
+        statements = []
+        line = 1
+        for chunk in self.chunks:
+            if chunk.line != line:
+                chunk.move(line)
+            statements.extend(chunk.statements)
+            line += chunk.lines
+        return statements
+
+# Returns the line a token starts on. The token of a string that spans lines carries the line it ends on.
+def start_line(token):
+    if token.type is TokenType.STRING:
+        return token.line - token.lexeme.count('\n')
+    return token.line
+
+# Returns the length of the longest common prefix of two strings, comparing them a block at a time.
+def common_prefix(first, second):
+    limit = min(len(first), len(second))
+    position = 0
+    while position + BLOCK_SIZE <= limit and first[position:position + BLOCK_SIZE] == second[position:position + BLOCK_SIZE]:
+        position += BLOCK_SIZE
+    while position < limit and first[position] == second[position]:
+        position += 1
+    return position
+
+# Returns the length of the longest common suffix of two strings, up to `limit` characters.
+def common_suffix(first, second, limit):
+    length = 0
+    while (length + BLOCK_SIZE <= limit and
+           first[len(first) - length - BLOCK_SIZE:len(first) - length] == second[len(second) - length - BLOCK_SIZE:len(second) - length]):
+        length += BLOCK_SIZE
+    while length < limit and first[len(first) - length - 1] == second[len(second) - length - 1]:
+        length += 1
+    return length
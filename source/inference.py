@@ -0,0 +1,405 @@
+""" Static type inference: a flow analysis that infers the possible types of every variable and expression before a
+script runs, reports operations that can only fail, and specializes operations whose operand types are certain. """
+
+import operator
+from expressions import *
+from strings import concat
+from quickening import checked_divide
+
+# The types a value can have. A type is a frozenset of these names; None stands for a value that could be anything,
+# such as the answer to an INPUT or an array element, and the empty set for an expression that never has a value
+# because evaluating it always fails, such as "abc" - 1 or a variable that is never assigned before it is read.
+INT = 'int'
+FLOAT = 'float'
+BOOL = 'bool'
+STR = 'str'
+ARRAY = 'array'
+NUMBERS = frozenset((INT, FLOAT, BOOL))
+NEVER = frozenset()
+
+# Marks a variable that may not be assigned yet where it is read. It is only ever part of a variable's type, never
+# of an expression's.
+UNASSIGNED = 'unassigned'
+
+# How types are named in error messages.
+DESCRIPTIONS = {INT: "a number", FLOAT: "a number", BOOL: "a boolean", STR: "a string", ARRAY: "an array"}
+
+# The function a TypedBinary calls, by operator and the kind of operands it was specialized for.
+TYPED_BINARY = {
+    ('+', "number"): operator.add,
+    ('-', "number"): operator.sub,
+    ('*', "number"): operator.mul,
+    ('/', "number"): checked_divide,
+    ('<', "number"): operator.lt,
+    ('<=', "number"): operator.le,
+    ('>', "number"): operator.gt,
+    ('>=', "number"): operator.ge,
+    ('==', "number"): operator.eq,
+    ('!=', "number"): operator.ne,
+    ('+', "string"): concat,
+    ('<', "string"): operator.lt,
+    ('<=', "string"): operator.le,
+    ('>', "string"): operator.gt,
+    ('>=', "string"): operator.ge,
+    ('==', "string"): operator.eq,
+    ('!=', "string"): operator.ne,
+    ('AND', "boolean"): operator.and_,
+    ('OR', "boolean"): operator.or_,
+}
+
+# The function a TypedUnary calls, likewise.
+TYPED_UNARY = {
+    ('-', "number"): operator.neg,
+    ('!', "boolean"): operator.not_,
+}
+
+class StaticTypeError(Exception):
+    """
+    Raised before a script runs when type inference found operations that are certain to be evaluated and fail
+    whenever they are. `errors` holds (line, message) pairs in line order.
+    """
+    def __init__(self, errors):
+        super().__init__("\n".join(f"line {line}: {message}" for line, message in errors))
+        self.errors = errors
+
+class TypeInference:
+    """
+    Infers the types of a script's variables and expressions by abstract interpretation: statements are followed in
+    order with a map from each variable to its possible types, the maps of both branches of an IF are joined where
+    they meet, and a WHILE body is followed until the types at the top of the loop stop changing.
+    Operations whose every possible operand type fails (such as "abc" - 1, or indexing something that is never an
+    array) are collected in `errors` when they are certain to be evaluated once the script gets that far, and in
+    `warnings` when they are inside an IF branch or a WHILE body, which may never run. When `specialize` is set,
+    Binary and Unary operations whose operands are certain to be numbers, strings or booleans are replaced by a
+    TypedBinary or TypedUnary.
+    The analysis assumes the script starts with no variables, and it keeps its state between calls to infer, so the
+    statements of a script can be given one at a time. `variables` collects every type each variable is assigned.
+    """
+    def __init__(self, specialize=True):
+        self.specialize = specialize
+        self.types = {}
+        self.errors = []
+        self.warnings = []
+        self.variables = {}
+        self.operations = 0
+        self.specialized = 0
+        self.final = True
+        self.certain = True
+        self.fixpoints = {}
+
+    # Infers the types of a list of statements and returns it with its operations specialized. The analysis
+    # recurses, so top-level statements nested deeper than MAX_NESTING are kept as they are and every variable they
+    # assign is taken to hold anything afterwards.
+    def infer(self, statements):
+        result = []
+        for statement in statements:
+            if depth([statement]) > MAX_NESTING:
+                self.forget(statement)
+                result.append(statement)
+            else:
+                result.append(self.statement(statement))
+            self.fixpoints.clear()
+        self.errors.sort(key=lambda error: error[0])
+        self.warnings = sorted((warning for warning in self.warnings if warning not in self.errors),
+                               key=lambda warning: warning[0])
+        return result
+
+    def forget(self, statement):
+        stack = [statement]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Assign):
+                self.types[node.name] = None
+                self.variables[node.name] = None
+            stack.extend(children(node))
+
+    def block(self, statements):
+        return [self.statement(statement) for statement in statements]
+
+    def statement(self, statement):
+        if isinstance(statement, Print):
+            return Print(self.expression(statement.expression)[0], statement.line)
+
+        elif isinstance(statement, If):
+            condition = self.expression(statement.condition)[0]
+            certain = self.certain
+            self.certain = False
+            before = dict(self.types)
+            then_branch = self.block(statement.then_branch)
+            after_then = self.types
+            self.types = before
+            else_branch = self.block(statement.else_branch) if statement.else_branch else None
+            self.types = join(after_then, self.types)
+            self.certain = certain
+            return If(condition, then_branch, else_branch, statement.line)
+
+        elif isinstance(statement, While):
+            return self.loop(statement)
+
+        elif isinstance(statement, Reset):
+            # A variable missing from the map is unassigned, so dropping the cleared temporaries keeps the map from
+            # growing with every Reset the optimizer added, which would make each later loop slower to follow.
+            for name in statement.names:
+                self.types.pop(name, None)
+            return statement
+
+        return self.expression(statement)[0]
+
+    # Follows a loop's condition and body until the types at the top of the loop are stable, without reporting or
+    # rewriting anything, and then, when this is the final pass, once more with the stable types to produce the
+    # result. The types after the loop are those after its condition, which is where it exits.
+    # The passes over an outer loop's body analyze its inner loops again each time, so every loop's fixpoint is kept
+    # in `fixpoints` with the types it was entered with. A loop entered with the same types again is not followed at
+    # all, and one entered with more types resumes from its previous fixpoint, which is still below the new one. This
+    # keeps the analysis of nested loops from doubling with every level of nesting.
+    def loop(self, loop):
+        incoming = dict(self.types)
+        cached = self.fixpoints.get(loop)
+        if cached is not None and cached[0] == incoming:
+            entry, exit = cached[1], cached[2]
+        else:
+            entry = incoming
+            if cached is not None and join(cached[0], incoming) == incoming:
+                entry = join(incoming, cached[1])
+            final = self.final
+            self.final = False
+            while True:
+                self.types = dict(entry)
+                self.expression(loop.condition)
+                self.block(loop.body)
+                joined = join(entry, self.types)
+                if joined == entry:
+                    break
+                entry = joined
+            self.types = dict(entry)
+            self.expression(loop.condition)
+            exit = self.types
+            self.final = final
+            self.fixpoints[loop] = (incoming, entry, exit)
+        if not self.final:
+            self.types = dict(exit)
+            return loop
+        self.types = dict(entry)
+        condition = self.expression(loop.condition)[0]
+        certain = self.certain
+        self.certain = False
+        body = self.block(loop.body)
+        self.certain = certain
+        self.types = dict(exit)
+        return While(condition, body, loop.line)
+
+    # Returns the rewritten expression and its type.
+    def expression(self, expr):
+        if isinstance(expr, Literal):
+            return expr, type_of(expr.value)
+
+        elif isinstance(expr, Variable):
+            kinds = self.types.get(expr.name, frozenset())
+            return expr, kinds - {UNASSIGNED} if kinds is not None else None
+
+        elif isinstance(expr, Grouping):
+            inner, kinds = self.expression(expr.expression)
+            return Grouping(inner, expr.line), kinds
+
+        elif isinstance(expr, Binary):
+            left, left_kinds = self.expression(expr.left)
+            right, right_kinds = self.expression(expr.right)
+            return self.binary(expr, left, left_kinds, right, right_kinds)
+
+        elif isinstance(expr, Unary):
+            right, kinds = self.expression(expr.right)
+            return self.unary(expr, right, kinds)
+
+        elif isinstance(expr, Assign):
+            value, kinds = self.expression(expr.value)
+            self.assign(expr.name, kinds)
+            return Assign(expr.name, value, expr.line), kinds
+
+        elif isinstance(expr, Input):
+            prompt, kinds = self.expression(expr.prompt)
+            return Input(prompt, expr.line), NEVER if kinds == NEVER else None
+
+        elif isinstance(expr, ArrayLiteral):
+            results = [self.expression(element) for element in expr.elements]
+            kinds = NEVER if any(kinds == NEVER for _, kinds in results) else frozenset([ARRAY])
+            return ArrayLiteral([element for element, _ in results], expr.line), kinds
+
+        elif isinstance(expr, Index):
+            array, array_kinds = self.expression(expr.array)
+            index, index_kinds = self.expression(expr.index)
+            kinds = self.index(array_kinds, index_kinds, None, expr.line)
+            return Index(array, index, expr.line), kinds
+
+        elif isinstance(expr, AssignIndex):
+            array, array_kinds = self.expression(expr.array)
+            index, index_kinds = self.expression(expr.index)
+            value, kinds = self.expression(expr.value)
+            kinds = self.index(array_kinds, index_kinds, kinds, expr.line)
+            return AssignIndex(array, index, value, expr.line), kinds
+
+        elif isinstance(expr, Call):
+            results = [self.expression(argument) for argument in expr.arguments]
+            kinds = self.call(expr, [kinds for _, kinds in results])
+            return Call(expr.name, [argument for argument, _ in results], expr.line), kinds
+
+        elif isinstance(expr, Temporary):
+            inner, kinds = self.expression(expr.expression)
+            return Temporary(inner, expr.name, expr.line), kinds
+
+        return expr, None
+
+    # Returns the rewritten Binary and its type, reporting it when it cannot succeed. An operation whose operand
+    # always fails is never evaluated, so it is neither reported nor specialized.
+    def binary(self, expr, left, left_kinds, right, right_kinds):
+        operator = expr.operator
+        if self.final:
+            self.operations += 1
+        if left_kinds == NEVER or right_kinds == NEVER:
+            return Binary(left, operator, right, expr.line), NEVER
+        if left_kinds is None or right_kinds is None:
+            kinds = frozenset([BOOL]) if operator in ('AND', 'OR') else None
+            return Binary(left, operator, right, expr.line), kinds
+        results = {binary_type(operator, a, b) for a in left_kinds for b in right_kinds}
+        results.discard(None)
+        if not results:
+            self.report(expr.line, f"'{operator}' cannot be applied to {describe(left_kinds)} and {describe(right_kinds)}.")
+            return Binary(left, operator, right, expr.line), NEVER
+
+        operands = None
+        if left_kinds <= NUMBERS and right_kinds <= NUMBERS:
+            operands = "number"
+        elif left_kinds == right_kinds == {STR}:
+            operands = "string"
+        elif left_kinds == right_kinds == {BOOL}:
+            operands = "boolean"
+        function = TYPED_BINARY.get((operator, operands))
+        if self.specialize and function is not None:
+            if self.final:
+                self.specialized += 1
+            return TypedBinary(left, operator, right, operands, function, expr.line), frozenset(results)
+        return Binary(left, operator, right, expr.line), frozenset(results)
+
+    # Returns the rewritten Unary and its type, reporting it when it cannot succeed.
+    def unary(self, expr, right, kinds):
+        operator = expr.operator
+        if self.final:
+            self.operations += 1
+        if kinds == NEVER:
+            return Unary(operator, right, expr.line), NEVER
+        if operator == '!':
+            result = frozenset([BOOL])
+        elif kinds is None:
+            return Unary(operator, right, expr.line), None
+        else:
+            result = frozenset(INT if kind == BOOL else kind for kind in kinds if kind != STR)
+            if not result:
+                self.report(expr.line, f"'{operator}' cannot be applied to {describe(kinds)}.")
+                return Unary(operator, right, expr.line), NEVER
+
+        operands = None
+        if kinds is not None and kinds <= NUMBERS and operator == '-':
+            operands = "number"
+        elif kinds == {BOOL}:
+            operands = "boolean"
+        function = TYPED_UNARY.get((operator, operands))
+        if self.specialize and function is not None:
+            if self.final:
+                self.specialized += 1
+            return TypedUnary(operator, right, operands, function, expr.line), result
+        return Unary(operator, right, expr.line), result
+
+    # Returns the type of a built-in function's result, reporting a first argument it can never accept.
+    def call(self, expr, arguments):
+        if NEVER in arguments:
+            return NEVER
+        kinds = arguments[0]
+        accepted = {ARRAY, STR} if expr.name == "LEN" else {ARRAY}
+        if kinds is not None and kinds.isdisjoint(accepted):
+            needs = "an array or a string" if expr.name == "LEN" else "an array"
+            self.report(expr.line, f"{expr.name} needs {needs}, not {describe(kinds)}.")
+            return NEVER
+        if expr.name == "LEN":
+            return frozenset([INT])
+        if expr.name == "APPEND":
+            return frozenset([ARRAY])
+        return None
+
+    # Returns the type of reading an element, or of assigning a value of type `kinds` to one, reporting indexing
+    # something that is never an array, or with an index that is never an integer.
+    def index(self, array_kinds, index_kinds, kinds, line):
+        if NEVER in (array_kinds, index_kinds, kinds):
+            return NEVER
+        if array_kinds is not None and ARRAY not in array_kinds:
+            self.report(line, f"Only arrays can be indexed, not {describe(array_kinds)}.")
+            return NEVER
+        if index_kinds is not None and INT not in index_kinds:
+            self.report(line, f"Array index must be an integer, not {describe(index_kinds)}.")
+            return NEVER
+        return kinds
+
+    def assign(self, name, kinds):
+        self.types[name] = kinds
+        if self.final:
+            known = self.variables.get(name, frozenset())
+            self.variables[name] = None if kinds is None or known is None else known | kinds
+
+    def report(self, line, message):
+        found = self.errors if self.certain else self.warnings
+        if self.final and (line, message) not in found:
+            found.append((line, message))
+
+# Returns the type of a constant.
+def type_of(value):
+    kind = type(value)
+    if kind is bool:
+        return frozenset([BOOL])
+    if kind is int:
+        return frozenset([INT])
+    if kind is float:
+        return frozenset([FLOAT])
+    if kind is str:
+        return frozenset([STR])
+    return None
+
+# Returns the type of a binary operation on two values of the given types, or None when it always fails.
+# Arrays apply operators element by element, so whether that works depends on their elements.
+def binary_type(operator, left, right):
+    if operator in ('AND', 'OR'):
+        return BOOL
+    if ARRAY in (left, right):
+        return ARRAY
+    if operator in ('==', '!='):
+        return BOOL
+    numbers = left in NUMBERS and right in NUMBERS
+    if operator in ('+', '-', '*'):
+        if numbers:
+            return FLOAT if FLOAT in (left, right) else INT
+        if operator == '+' and left == right == STR:
+            return STR
+        if operator == '*' and STR in (left, right) and {left, right} - {STR} <= {INT, BOOL}:
+            return STR
+        return None
+    if operator == '/':
+        return FLOAT if numbers else None
+    if numbers or left == right == STR:
+        return BOOL
+    return None
+
+# Joins the variable types of two paths that meet: a variable has any type it has on either path, and may be
+# unassigned if either path leaves it unassigned.
+def join(types, other):
+    joined = {}
+    for name in types.keys() | other.keys():
+        first = types.get(name, frozenset([UNASSIGNED]))
+        second = other.get(name, frozenset([UNASSIGNED]))
+        joined[name] = None if first is None or second is None else first | second
+    return joined
+
+# Describes a type for an error message, such as "a string" or "a number or a boolean".
+def describe(kinds):
+    descriptions = []
+    for kind in sorted(kinds):
+        description = DESCRIPTIONS.get(kind)
+        if description is not None and description not in descriptions:
+            descriptions.append(description)
+    return " or ".join(descriptions)
@@ -1,11 +1,18 @@
 from expressions import *
+from strings import concat
+from arrays import Array, BUILTINS, make_array, index, assign_index
 
 class Interpreter:
     """
     Executes the parsed statements by evaluating expressions and managing the environment for variable storage and retrieval.
+    PRINT and INPUT go through the `print` and `input` attributes, which default to the builtins; every backend has
+    them, so Simple can replace them with a streams.OutputWriter and InputReader.
     """
-    def __init__(self):
-        self.environment = Environment()
+    def __init__(self, environment=None):
+        self.environment = environment if environment is not None else Environment()
+        self.print = print
+        self.input = input
+        self.nesting = 0
     
     # Interpret a list of statements, executing each one in sequence.
     def interpret(self, statements):
@@ -16,11 +23,11 @@ class Interpreter:
     def execute(self, statement):
         if isinstance(statement, Print):
             value = self.evaluate(statement.expression)
-            print(value)
+            self.print(value)
 
         elif isinstance(statement, Assign):
             value = self.evaluate(statement.value)
-            self.environment.assign(statement.name.lexeme, value)
+            self.environment.assign(statement.name, value)
             return value
 
         elif isinstance(statement, While):
@@ -35,89 +42,242 @@ class Interpreter:
             elif statement.else_branch:
                 for stmt in statement.else_branch:
                     self.execute(stmt)
+
+        elif isinstance(statement, Reset):
+            for name in statement.names:
+                self.environment.values[self.environment.slot(name)] = UNDEFINED
         
         else:
             self.evaluate(statement)
     
     # Evaluate an expression, handling different types of expressions like Literal, Unary, Binary, Grouping, Variable, Assign, and Input.
+    # Evaluation recurses, which is fastest, until expressions are nested MAX_NESTING deep; anything deeper, such as a
+    # generated chain of 10,000 additions, is evaluated by evaluate_iteratively so it never hits the recursion limit.
     def evaluate(self, expr):
         if isinstance(expr, Literal):
             return expr.value
 
-        elif isinstance(expr, Grouping):
-            return self.evaluate(expr.expression)
-
-        elif isinstance(expr, Unary):
-            right = self.evaluate(expr.right)
-            operator = expr.operator.lexeme
-
-            if operator == '-':
-                return -right
-            elif operator == '!':
-                return not right
-            raise RuntimeError(f"Unknown unary operator {operator}")
-
-        elif isinstance(expr, Binary):
-            left = self.evaluate(expr.left)
-            right = self.evaluate(expr.right)
-            operator = expr.operator.lexeme
-
-            if operator == '+':
-                return left + right
-            elif operator == '-':
-                return left - right
-            elif operator == '*':
-                return left * right
-            elif operator == '/':
-                if right == 0:
-                    raise RuntimeError("Division by zero.")
-                return left / right
-            elif operator == '<':
-                return left < right
-            elif operator == '<=':
-                return left <= right
-            elif operator == '>':
-                return left > right
-            elif operator == '>=':
-                return left >= right
-            elif operator == '==':
-                return left == right
-            elif operator == '!=':
-                return left != right
-            elif operator == 'AND':
-                return bool(left) and bool(right)
-            elif operator == 'OR':
-                return bool(left) or bool(right)
-            else:
-                raise RuntimeError(f"Unknown binary operator {operator}")
         elif isinstance(expr, Variable):
-            return self.environment.get(expr.name.lexeme)
+            return self.environment.get(expr.name)
 
-        elif isinstance(expr, Assign):
-            value = self.evaluate(expr.value)
-            self.environment.assign(expr.name.lexeme, value)
-            return value
-        
-        elif isinstance(expr, Input):
-            return self.evaluate_input(expr)
-        else:
-            raise RuntimeError(f"Unknown expression type {type(expr)}")
+        if self.nesting >= MAX_NESTING:
+            return self.evaluate_iteratively(expr)
+        self.nesting += 1
+        try:
+            # Operations type inference specialized call the function for their operand types directly.
+            if type(expr) is TypedBinary:
+                return expr.function(self.evaluate(expr.left), self.evaluate(expr.right))
+
+            elif type(expr) is TypedUnary:
+                return expr.function(self.evaluate(expr.right))
+
+            elif isinstance(expr, Grouping):
+                return self.evaluate(expr.expression)
+
+            elif isinstance(expr, Unary):
+                right = self.evaluate(expr.right)
+                return self.unary(expr.operator, right)
+
+            elif isinstance(expr, Binary):
+                left = self.evaluate(expr.left)
+                right = self.evaluate(expr.right)
+                return self.binary(expr.operator, left, right)
+
+            elif isinstance(expr, Assign):
+                value = self.evaluate(expr.value)
+                self.environment.assign(expr.name, value)
+                return value
+
+            elif isinstance(expr, Input):
+                prompt = self.evaluate(expr.prompt)
+                return self.input(str(prompt))
+
+            elif isinstance(expr, Index):
+                array = self.evaluate(expr.array)
+                return index(array, self.evaluate(expr.index))
+
+            elif isinstance(expr, AssignIndex):
+                array = self.evaluate(expr.array)
+                position = self.evaluate(expr.index)
+                return assign_index(array, position, self.evaluate(expr.value))
+
+            elif isinstance(expr, ArrayLiteral):
+                return make_array([self.evaluate(element) for element in expr.elements])
+
+            elif isinstance(expr, Call):
+                return BUILTINS[expr.name][0](*[self.evaluate(argument) for argument in expr.arguments])
+
+            elif isinstance(expr, Temporary):
+                slot = self.environment.slot(expr.name)
+                value = self.environment.values[slot]
+                # Arrays are mutable, so a temporary holding one could go stale; they are recomputed instead of cached.
+                if value is UNDEFINED:
+                    value = self.evaluate(expr.expression)
+                    if type(value) is not Array:
+                        self.environment.values[slot] = value
+                return value
+            else:
+                raise RuntimeError(f"Unknown expression type {type(expr)}")
+        finally:
+            self.nesting -= 1
+
+    # Evaluate an expression with an explicit stack of pending nodes instead of recursion, in the same order as evaluate.
+    def evaluate_iteratively(self, expr):
+        values = []
+        stack = [(expr, False)]
+        while stack:
+            node, operands_ready = stack.pop()
+            if isinstance(node, Literal):
+                values.append(node.value)
+
+            elif isinstance(node, Variable):
+                values.append(self.environment.get(node.name))
+
+            elif isinstance(node, Grouping):
+                stack.append((node.expression, False))
+
+            elif operands_ready:
+                if type(node) is TypedBinary:
+                    right = values.pop()
+                    values.append(node.function(values.pop(), right))
+                elif type(node) is TypedUnary:
+                    values.append(node.function(values.pop()))
+                elif isinstance(node, Binary):
+                    right = values.pop()
+                    values.append(self.binary(node.operator, values.pop(), right))
+                elif isinstance(node, Unary):
+                    values.append(self.unary(node.operator, values.pop()))
+                elif isinstance(node, Assign):
+                    self.environment.assign(node.name, values[-1])
+                elif isinstance(node, Temporary):
+                    if type(values[-1]) is not Array:
+                        self.environment.assign(node.name, values[-1])
+                elif isinstance(node, Index):
+                    position = values.pop()
+                    values.append(index(values.pop(), position))
+                elif isinstance(node, AssignIndex):
+                    element = values.pop()
+                    position = values.pop()
+                    values.append(assign_index(values.pop(), position, element))
+                elif isinstance(node, (ArrayLiteral, Call)):
+                    count = len(children(node))
+                    arguments = values[len(values) - count:]
+                    del values[len(values) - count:]
+                    if isinstance(node, ArrayLiteral):
+                        values.append(make_array(arguments))
+                    else:
+                        values.append(BUILTINS[node.name][0](*arguments))
+                else:
+                    values.append(self.input(str(values.pop())))
+
+            elif isinstance(node, Binary):
+                stack.append((node, True))
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+
+            elif isinstance(node, Unary):
+                stack.append((node, True))
+                stack.append((node.right, False))
+
+            elif isinstance(node, Assign):
+                stack.append((node, True))
+                stack.append((node.value, False))
+
+            elif isinstance(node, Input):
+                stack.append((node, True))
+                stack.append((node.prompt, False))
+
+            elif isinstance(node, (Index, AssignIndex, ArrayLiteral, Call)):
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(children(node)))
+
+            elif isinstance(node, Temporary):
+                value = self.environment.values[self.environment.slot(node.name)]
+                if value is UNDEFINED:
+                    stack.append((node, True))
+                    stack.append((node.expression, False))
+                else:
+                    values.append(value)
+
+            else:
+                raise RuntimeError(f"Unknown expression type {type(node)}")
+        return values.pop()
     
-    def evaluate_input(self, expr):
-        prompt = self.evaluate(expr.prompt)
-        return input(str(prompt))
+    # Apply a unary operator to an already evaluated operand.
+    def unary(self, operator, right):
+        if operator == '-':
+            return -right
+        elif operator == '!':
+            return not right
+        raise RuntimeError(f"Unknown unary operator {operator}")
+
+    # Apply a binary operator to already evaluated operands.
+    def binary(self, operator, left, right):
+        if operator == '+':
+            return concat(left, right)
+        elif operator == '-':
+            return left - right
+        elif operator == '*':
+            return left * right
+        elif operator == '/':
+            if type(right) is not Array and right == 0:
+                raise RuntimeError("Division by zero.")
+            return left / right
+        elif operator == '<':
+            return left < right
+        elif operator == '<=':
+            return left <= right
+        elif operator == '>':
+            return left > right
+        elif operator == '>=':
+            return left >= right
+        elif operator == '==':
+            return left == right
+        elif operator == '!=':
+            return left != right
+        elif operator == 'AND':
+            return bool(left) and bool(right)
+        elif operator == 'OR':
+            return bool(left) or bool(right)
+        else:
+            raise RuntimeError(f"Unknown binary operator {operator}")
+
+# Marks a storage slot whose variable has not been assigned yet.
+UNDEFINED = object()
 
 class Environment:
     """
-    Manages variable storage and retrieval, allowing for variable assignment and lookup.
+    Manages variable storage and retrieval. Values live in a flat list indexed by slot, which the compiled backends
+    read and write directly; get and assign look the slot up by name and serve the tree walker, debugging and state dumps.
     """
     def __init__(self):
-        self.values = {}
+        self.slots = {}
+        self.values = []
+
+    # Returns the slot for a variable name, allocating an empty one the first time the name is seen.
+    def slot(self, name):
+        slot = self.slots.get(name)
+        if slot is None:
+            slot = self.slots[name] = len(self.values)
+            self.values.append(UNDEFINED)
+        return slot
+
+    # Returns the variable names, indexed by slot.
+    def names(self):
+        return list(self.slots)
 
     def get(self, name):
-        if name in self.values:
-            return self.values[name]
+        slot = self.slots.get(name)
+        if slot is not None:
+            value = self.values[slot]
+            if value is not UNDEFINED:
+                return value
         raise RuntimeError(f"Undefined variable '{name}'.")
 
     def assign(self, name, value):
-        self.values[name] = value
\ No newline at end of file
+        self.values[self.slot(name)] = value
+
+    # Returns the assigned variables as a name -> value dict, leaving out the optimizer's hidden temporaries.
+    def snapshot(self):
+        return {name: self.values[slot] for name, slot in self.slots.items()
+                if self.values[slot] is not UNDEFINED and not is_temporary(name)}
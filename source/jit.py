@@ -0,0 +1,329 @@
+""" A tree walker that compiles hot WHILE loops into Python functions specialized for the variable types it saw. """
+
+from expressions import *
+from interpreter import Interpreter
+from resolver import Resolver
+from transpiler import Transpiler, runtime_namespace, MAX_LOOP_NESTING
+
+# Iterations of a WHILE loop, counted over all of its runs, after which it is compiled.
+JIT_THRESHOLD = 1000
+
+# Deoptimizations after which a loop is left to the tree walker for good.
+MAX_DEOPTIMIZATIONS = 3
+
+# The variable types a trace specializes for. Strings, arrays and anything else get the generic code.
+SPECIALIZED_TYPES = (int, float, bool)
+
+class Trace:
+    """
+    The state of one WHILE loop: how many iterations the tree walker has run since the loop was last (de)compiled,
+    the compiled function and the types it was specialized for, and how often its guards failed.
+    """
+    __slots__ = ('index', 'loop', 'iterations', 'function', 'types', 'deoptimizations', 'abandoned')
+
+    def __init__(self, index, loop):
+        self.index = index
+        self.loop = loop
+        self.iterations = 0
+        self.function = None
+        self.types = {}
+        self.deoptimizations = 0
+        self.abandoned = False
+
+class TracingInterpreter(Interpreter):
+    """
+    A tree walker that counts the iterations of every WHILE loop. Once a loop has run `threshold` of them, the types
+    of the int, float and boolean variables it uses are recorded and the loop is compiled by a TraceCompiler into a
+    Python function specialized for them. The function checks those types on entry and, for variables whose new type
+    cannot be known in advance, at the end of every iteration; when a check fails it stores the variables back and
+    returns at that iteration boundary, and the loop carries on in Interpreter.execute as if it had never been
+    compiled. The loop is traced again later, and after MAX_DEOPTIMIZATIONS failed guards it is left uncompiled.
+    When `log` is a file, every compilation and deoptimization is reported to it.
+    """
+    def __init__(self, environment=None, threshold=JIT_THRESHOLD, log=None):
+        super().__init__(environment)
+        self.threshold = threshold
+        self.log = log
+        self.traces = {}
+
+    def execute(self, statement):
+        if isinstance(statement, While):
+            self.loop(statement)
+        else:
+            return super().execute(statement)
+
+    # Runs a WHILE loop with its compiled function when there is one, and otherwise with the tree walker until the
+    # loop gets hot.
+    def loop(self, loop):
+        trace = self.traces.get(loop)
+        if trace is None:
+            trace = self.traces[loop] = Trace(len(self.traces), loop)
+        if trace.function is not None and self.run_trace(trace):
+            return
+
+        while self.evaluate(loop.condition):
+            for stmt in loop.body:
+                self.execute(stmt)
+            if trace.function is None and not trace.abandoned:
+                trace.iterations += 1
+                if trace.iterations >= self.threshold:
+                    self.compile(trace)
+                    if trace.function is not None and self.run_trace(trace):
+                        return
+
+    # Runs the rest of a loop with its compiled function. Returns False when a guard failed, after which the tree
+    # walker continues the loop from the iteration the function stopped at.
+    def run_trace(self, trace):
+        failed = trace.function(self.environment.values, self.print, self.input)
+        if failed is None:
+            return True
+        self.deoptimize(trace, failed)
+        return False
+
+    # Records the types of the loop's variables and compiles it for them.
+    def compile(self, trace):
+        loop = trace.loop
+        if depth([loop]) > MAX_NESTING or loop_depth([loop]) > MAX_LOOP_NESTING:
+            trace.abandoned = True
+            self.report(f"not compiling the WHILE loop at line {loop.line}: it is nested too deeply.")
+            return
+        types = {}
+        for name in variable_names(loop):
+            slot = self.environment.slots.get(name)
+            value = self.environment.values[slot] if slot is not None else None
+            if type(value) in SPECIALIZED_TYPES:
+                types[name] = type(value)
+        compiler = TraceCompiler(self.environment)
+        try:
+            trace.function = compiler.compile(loop, types)
+        except SyntaxError as error:
+            # CPython cannot compile every valid loop, such as one with more than 20 statically nested blocks.
+            trace.abandoned = True
+            self.report(f"not compiling the WHILE loop at line {loop.line}: {error.msg}.")
+            return
+        trace.types = compiler.specialized
+        description = ", ".join(f"{name}: {kind.__name__}" for name, kind in trace.types.items()) or "no variables"
+        self.report(f"compiled the WHILE loop at line {loop.line} after {trace.iterations} iterations, "
+                    f"specialized for {description}.")
+
+    # Drops a loop's compiled function after one of its guards failed on the variable `name`.
+    def deoptimize(self, trace, name):
+        value = self.environment.values[self.environment.slots[name]]
+        expected = trace.types[name].__name__
+        trace.function = None
+        trace.iterations = 0
+        trace.deoptimizations += 1
+        self.report(f"deoptimized the WHILE loop at line {trace.loop.line}: "
+                    f"'{name}' holds a {type(value).__name__} value, not {expected}.")
+        if trace.deoptimizations >= MAX_DEOPTIMIZATIONS:
+            trace.abandoned = True
+            self.report(f"leaving the WHILE loop at line {trace.loop.line} to the tree walker "
+                        f"after {trace.deoptimizations} deoptimizations.")
+
+    def report(self, message):
+        if self.log is not None:
+            print(f"JIT: {message}", file=self.log)
+
+class TraceCompiler(Transpiler):
+    """
+    Compiles one WHILE loop into a Python function `trace(_values, _print, _input)`, assuming the variables in
+    `types` have those types whenever an iteration starts. The types of all expressions are inferred from them
+    as the code is generated: + on two numbers needs no string handling, and AND, OR and ! on booleans need no bool()
+    calls. Variables whose type at the end of the body is known to be different are not specialized; those whose
+    type is unknown there, such as one assigned an INPUT, are checked at the end of every iteration. The function
+    returns None when the loop finishes, or the name of the variable whose check failed.
+    """
+    def __init__(self, environment):
+        super().__init__(environment)
+        self.types = {}
+        self.specialized = {}
+        self.probing = False
+        self.fixpoints = {}
+
+    # Returns the compiled function for a loop and stores the types it was specialized for in self.specialized.
+    def compile(self, loop, types):
+        self.slots = Resolver(self.environment).resolve([loop])
+        self.probing = True
+        while True:
+            self.lines = []
+            self.types = dict(types)
+            self.expression(loop.condition)
+            self.block(loop.body, 0)
+            changed = [name for name, kind in types.items() if self.types.get(name) not in (None, kind)]
+            if not changed:
+                break
+            for name in changed:
+                del types[name]
+        self.probing = False
+        guarded = [name for name in types if self.types.get(name) is None]
+        self.specialized = types
+
+        body = []
+        self.lines = body
+        self.types = dict(types)
+        self.emit(f"while {self.expression(loop.condition)}:", 2)
+        self.block(loop.body, 3)
+        for name in guarded:
+            self.emit(f"if type({self.variable(name)}) is not {types[name].__name__}: return {name!r}", 3)
+
+        self.lines = ["def trace(_values, _print, _input):"]
+        for name, kind in types.items():
+            self.emit(f"if type(_values[{self.slots[name]}]) is not {kind.__name__}: return {name!r}", 1)
+        for name, python_name in self.names.items():
+            slot = self.slots[name]
+            if is_temporary(name):
+                self.emit(f"{python_name} = _values[{slot}]", 1)
+            else:
+                self.emit(f"if _values[{slot}] is not _UNDEFINED: {python_name} = _values[{slot}]", 1)
+        self.emit("try:", 1)
+        self.lines.extend(body)
+        self.emit("except UnboundLocalError as error:", 1)
+        self.emit("raise RuntimeError(f\"Undefined variable '{_undefined(error, _names)}'.\") from None", 2)
+        self.emit("finally:", 1)
+        self.emit("_export(_values, locals(), _slots)", 2)
+
+        namespace = runtime_namespace(self)
+        exec(compile("\n".join(self.lines) + "\n", f"<trace of line {loop.line}>", "exec"), namespace)
+        return namespace["trace"]
+
+    # Emits a statement, keeping track of the variable types it leaves behind. The types after an IF are those both
+    # branches agree on, and the types inside a WHILE are found by running over its body until they stop changing.
+    # Those runs, and the ones compile makes over the whole loop, only look for types (`probing`), and each inner
+    # loop's result is kept in `fixpoints` with the types it was entered with. An inner loop entered with the same
+    # types again is neither run over again nor, while probing, emitted, so the work does not double with every
+    # level of nesting.
+    def statement(self, statement, depth):
+        if isinstance(statement, Assign):
+            source, kind = self.typed(statement.value)
+            self.emit(f"{self.variable(statement.name)} = {source}", depth)
+            self.set_type(statement.name, kind)
+
+        elif isinstance(statement, If):
+            self.emit(f"if {self.expression(statement.condition)}:", depth)
+            before = dict(self.types)
+            self.block(statement.then_branch, depth + 1)
+            after_then = self.types
+            self.types = dict(before)
+            if statement.else_branch:
+                self.emit("else:", depth)
+                self.block(statement.else_branch, depth + 1)
+            self.types = merge(after_then, self.types)
+
+        elif isinstance(statement, While):
+            incoming = dict(self.types)
+            cached = self.fixpoints.get(statement)
+            if cached is None or cached[0] != incoming:
+                lines, probing = self.lines, self.probing
+                self.probing = True
+                entry = incoming
+                while True:
+                    self.lines = []
+                    self.types = dict(entry)
+                    self.expression(statement.condition)
+                    self.block(statement.body, 0)
+                    merged = merge(entry, self.types)
+                    if merged == entry:
+                        break
+                    entry = merged
+                self.types = dict(entry)
+                self.expression(statement.condition)
+                cached = self.fixpoints[statement] = (incoming, entry, self.types)
+                self.lines, self.probing = lines, probing
+            if self.probing:
+                self.types = dict(cached[2])
+                return
+            self.types = dict(cached[1])
+            self.emit(f"while {self.expression(statement.condition)}:", depth)
+            after_condition = dict(self.types)
+            self.block(statement.body, depth + 1)
+            self.types = after_condition
+
+        elif isinstance(statement, Reset):
+            super().statement(statement, depth)
+            for name in statement.names:
+                self.set_type(name, None)
+
+        else:
+            super().statement(statement, depth)
+
+    def expression(self, expr):
+        return self.typed(expr)[0]
+
+    # Returns the Python source for an expression and the type of its value: int, float or bool, or None when
+    # that is not known.
+    def typed(self, expr):
+        if isinstance(expr, Literal):
+            kind = type(expr.value)
+            return repr(expr.value), kind if kind in SPECIALIZED_TYPES else None
+
+        elif isinstance(expr, Variable):
+            return self.variable(expr.name), self.types.get(expr.name)
+
+        elif isinstance(expr, Grouping):
+            return self.typed(expr.expression)
+
+        elif isinstance(expr, Unary):
+            right, kind = self.typed(expr.right)
+            operator = expr.operator
+            if operator == '!':
+                return f"(not {right})", bool
+            if operator == '-' and kind is not None:
+                return f"(-{right})", float if kind is float else int
+            return self.unary(operator, right), None
+
+        elif isinstance(expr, Binary):
+            left, left_kind = self.typed(expr.left)
+            right, right_kind = self.typed(expr.right)
+            return self.specialize(expr.operator, left, left_kind, right, right_kind, expr.right)
+
+        elif isinstance(expr, Assign):
+            source, kind = self.typed(expr.value)
+            self.set_type(expr.name, kind)
+            return f"({self.variable(expr.name)} := {source})", kind
+
+        elif isinstance(expr, Temporary):
+            source, kind = self.typed(expr.expression)
+            return self.temporary(expr.name, source), kind
+
+        elif isinstance(expr, Call) and expr.name == "LEN":
+            return super().expression(expr), int
+
+        return super().expression(expr), None
+
+    # Returns the source and type of a binary operation on operands of the given types.
+    def specialize(self, operator, left, left_kind, right, right_kind, right_expr):
+        numbers = left_kind is not None and right_kind is not None
+        if operator in ('+', '-', '*') and numbers:
+            return f"({left} {operator} {right})", float if float in (left_kind, right_kind) else int
+        if operator == '/' and numbers:
+            return self.binary(operator, left, right, right_expr), float
+        if operator in ('<', '<=', '>', '>=', '==', '!=') and numbers:
+            return f"({left} {operator} {right})", bool
+        if operator in ('AND', 'OR'):
+            symbol = '&' if operator == 'AND' else '|'
+            if left_kind is bool and right_kind is bool:
+                return f"({left} {symbol} {right})", bool
+            return self.binary(operator, left, right, right_expr), bool
+        return self.binary(operator, left, right, right_expr), None
+
+    def set_type(self, name, kind):
+        if kind is None:
+            self.types.pop(name, None)
+        else:
+            self.types[name] = kind
+
+# Returns the variable types two paths through the code agree on.
+def merge(types, other):
+    return {name: kind for name, kind in types.items() if other.get(name) is kind}
+
+# Returns the names of the variables a loop reads or assigns in the order they first appear, leaving out the
+# optimizer's temporaries.
+def variable_names(loop):
+    names = {}
+    stack = [loop]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (Variable, Assign)):
+            names[node.name] = True
+        stack.extend(reversed(children(node)))
+    return list(names)
@@ -0,0 +1,374 @@
+from expressions import *
+from interpreter import Interpreter
+from strings import plain
+from arrays import MUTATING
+
+# Folded strings longer than this stay unfolded, so something like "ab" * 1000000 does not bloat the program.
+MAX_FOLDED_LENGTH = 4096
+
+# Smallest repeated expression, in AST nodes, worth sharing within a run of statements. Checking and filling the
+# Temporary costs about as much as evaluating something like `i * 3` again.
+MIN_COMMON_NODES = 5
+
+class Optimizer:
+    """
+    Rewrites parsed statements before execution: folds constant subexpressions, drops IF branches and WHILE loops
+    whose condition is constant, and applies algebraic identities that cannot change a result.
+    Anything that would raise an error when evaluated is left in place, so errors still happen at run time.
+    Then it shares work between evaluations of pure expressions (no INPUT, no assignment): those in a WHILE that
+    use no variable the loop assigns, and those repeated in a run of simple statements that do not assign their
+    variables, become Temporary nodes. A Temporary is computed where the expression is first evaluated, so errors,
+    INPUT and PRINT keep their order and a loop that never runs computes nothing.
+    """
+    def __init__(self):
+        self.removed = 0
+        self.hoisted = 0
+        self.reused = 0
+        self.temporaries = 0
+        self.reference = Interpreter()
+        self.signatures = {}
+        self.descriptions = {}
+
+    # Optimizes a list of statements and returns the new list. The number of AST nodes removed is added to
+    # self.removed, and the number of loop-invariant and common subexpressions turned into Temporary nodes to
+    # self.hoisted and self.reused. Top-level statements nested deeper than MAX_NESTING are kept as they are, since
+    # optimizing recurses into them.
+    def optimize(self, statements):
+        optimized = []
+        run = []
+        for statement in statements:
+            if depth([statement]) > MAX_NESTING:
+                optimized.extend(self.share(run))
+                optimized.append(statement)
+                run = []
+            else:
+                folded = self.statement(statement)
+                self.removed += count_nodes([statement]) - count_nodes(folded)
+                run.extend(folded)
+        optimized.extend(self.share(run))
+        self.signatures.clear()
+        self.descriptions.clear()
+        return optimized
+
+    # Optimizes a block of statements, splicing in branches of constant IFs and dropping dead statements.
+    def block(self, statements):
+        optimized = []
+        for statement in statements:
+            optimized.extend(self.statement(statement))
+        return optimized
+
+    # Optimizes a single statement and returns the list of statements that replace it.
+    def statement(self, statement):
+        if isinstance(statement, Print):
+            return [Print(self.expression(statement.expression), statement.line)]
+
+        elif isinstance(statement, While):
+            condition = self.expression(statement.condition)
+            if isinstance(condition, Literal) and not condition.value:
+                return []
+            return [While(condition, self.block(statement.body), statement.line)]
+
+        elif isinstance(statement, If):
+            condition = self.expression(statement.condition)
+            if isinstance(condition, Literal):
+                if condition.value:
+                    return self.block(statement.then_branch)
+                return self.block(statement.else_branch or [])
+            else_branch = self.block(statement.else_branch) if statement.else_branch else None
+            return [If(condition, self.block(statement.then_branch), else_branch, statement.line)]
+
+        expression = self.expression(statement)
+        if isinstance(expression, Literal):
+            return []
+        return [expression]
+
+    # Optimizes an expression bottom-up and returns the replacement node.
+    def expression(self, expr):
+        if isinstance(expr, Grouping):
+            return self.expression(expr.expression)
+
+        elif isinstance(expr, Unary):
+            right = self.expression(expr.right)
+            return self.fold(Unary(expr.operator, right, expr.line), right)
+
+        elif isinstance(expr, Binary):
+            left = self.expression(expr.left)
+            right = self.expression(expr.right)
+            simplified = self.simplify(left, expr.operator, right)
+            if simplified is not None:
+                return simplified
+            return self.fold(Binary(left, expr.operator, right, expr.line), left, right)
+
+        elif isinstance(expr, Assign):
+            return Assign(expr.name, self.expression(expr.value), expr.line)
+
+        elif isinstance(expr, Input):
+            return Input(self.expression(expr.prompt), expr.line)
+
+        elif isinstance(expr, Index):
+            return Index(self.expression(expr.array), self.expression(expr.index), expr.line)
+
+        elif isinstance(expr, AssignIndex):
+            array = self.expression(expr.array)
+            return AssignIndex(array, self.expression(expr.index), self.expression(expr.value), expr.line)
+
+        elif isinstance(expr, ArrayLiteral):
+            return ArrayLiteral([self.expression(element) for element in expr.elements], expr.line)
+
+        elif isinstance(expr, Call):
+            return Call(expr.name, [self.expression(argument) for argument in expr.arguments], expr.line)
+
+        return expr
+
+    # Replaces an operation whose operands are all literals with its value, unless evaluating it fails.
+    def fold(self, expr, *operands):
+        if not all(isinstance(operand, Literal) for operand in operands):
+            return expr
+        try:
+            value = plain(self.reference.evaluate(expr))
+        except Exception:
+            return expr
+        if isinstance(value, str) and len(value) > MAX_FOLDED_LENGTH:
+            return expr
+        return Literal(value, expr.line)
+
+    # Applies x * 1, 1 * x and x - 0 when x is known to be a number. For booleans and strings these identities
+    # do not hold (TRUE * 1 is 1), so operands of unknown type are left alone.
+    def simplify(self, left, operator, right):
+        if operator == '*' and is_integer_literal(right, 1) and is_numeric(left):
+            return left
+        if operator == '*' and is_integer_literal(left, 1) and is_numeric(right):
+            return right
+        if operator == '-' and is_integer_literal(right, 0) and is_numeric(left):
+            return left
+        return None
+
+    # Returns a block with the invariant expressions of its WHILE loops and the common subexpressions of its runs of
+    # simple statements replaced by Temporary nodes, each group preceded by the Reset that clears them.
+    def share(self, statements):
+        shared = []
+        run = []
+        for statement in statements:
+            if isinstance(statement, (While, If)):
+                shared.extend(self.eliminate(run))
+                run = []
+                if isinstance(statement, While):
+                    shared.extend(self.hoist(statement))
+                else:
+                    else_branch = self.share(statement.else_branch) if statement.else_branch else None
+                    shared.append(If(statement.condition, self.share(statement.then_branch), else_branch, statement.line))
+            else:
+                run.append(statement)
+        shared.extend(self.eliminate(run))
+        return shared
+
+    # Loop-invariant code motion: replaces the largest pure expressions in a WHILE that use no variable assigned
+    # anywhere in it by Temporary nodes, reset just before the loop so they are computed once per run of the loop.
+    # A loop that changes an array in place hoists nothing, since any variable may refer to that array.
+    def hoist(self, loop):
+        assigned = assigned_names([loop])
+        if any(mutates(node) for node in nodes([loop])) or not any(self.is_shareable(node, assigned) for node in nodes([loop])):
+            return [While(loop.condition, self.share(loop.body), loop.line)]
+        temporaries = {}
+
+        def key(node):
+            return self.signature(node)[0] if self.is_shareable(node, assigned) else None
+
+        condition = self.replace(loop.condition, key, temporaries)
+        body = self.share([self.rewrite(statement, key, temporaries) for statement in loop.body])
+        hoisted = [Reset([temporary.name for temporary in temporaries.values()], loop.line)] if temporaries else []
+        self.hoisted += len(temporaries)
+        return [*hoisted, While(condition, body, loop.line)]
+
+    # Common subexpression elimination over a run of simple statements: pure expressions that appear more than once
+    # with the same values of their variables are computed once. Every assignment starts a new version of its
+    # variable, and only occurrences that read the same versions share a Temporary. Variables assigned inside an
+    # expression statement are not shared within it, since their version changes part-way through. A statement that
+    # changes an array in place shares nothing and starts a new version of every variable.
+    def eliminate(self, run):
+        versions = {}
+        keys = {}
+        counts = {}
+        epoch = 0
+        for statement in run:
+            candidates = []
+            unstable = set()
+            mutated = False
+            stack = [statement]
+            while stack:
+                node = stack.pop()
+                if isinstance(node, Assign) and node is not statement:
+                    unstable.add(node.name)
+                mutated = mutated or mutates(node)
+                if self.is_shareable(node, (), MIN_COMMON_NODES):
+                    candidates.append(node)
+                if not isinstance(node, Temporary):
+                    stack.extend(children(node))
+            if mutated:
+                epoch += 1
+                continue
+            for node in candidates:
+                signature, names, _ = self.signature(node)
+                if names.isdisjoint(unstable):
+                    versioned = tuple(sorted((name, versions.get(name, 0)) for name in names))
+                    key = keys[node] = (signature, epoch, versioned)
+                    counts[key] = counts.get(key, 0) + 1
+            if isinstance(statement, Assign):
+                unstable.add(statement.name)
+            for name in unstable:
+                versions[name] = versions.get(name, 0) + 1
+
+        if all(count == 1 for count in counts.values()):
+            return run
+
+        def key(node):
+            found = keys.get(node)
+            return found if found is not None and counts[found] > 1 else None
+
+        temporaries = {}
+        rewritten = [self.rewrite(statement, key, temporaries) for statement in run]
+        self.reused += len(temporaries)
+        return [Reset([temporary.name for temporary in temporaries.values()], run[0].line), *rewritten]
+
+    # Rebuilds a statement with its expressions passed through replace, recursing into nested blocks.
+    def rewrite(self, statement, key, temporaries):
+        if isinstance(statement, Print):
+            return Print(self.replace(statement.expression, key, temporaries), statement.line)
+        elif isinstance(statement, While):
+            body = [self.rewrite(stmt, key, temporaries) for stmt in statement.body]
+            return While(self.replace(statement.condition, key, temporaries), body, statement.line)
+        elif isinstance(statement, If):
+            then_branch = [self.rewrite(stmt, key, temporaries) for stmt in statement.then_branch]
+            else_branch = None
+            if statement.else_branch:
+                else_branch = [self.rewrite(stmt, key, temporaries) for stmt in statement.else_branch]
+            return If(self.replace(statement.condition, key, temporaries), then_branch, else_branch, statement.line)
+        elif isinstance(statement, Reset):
+            return statement
+        return self.replace(statement, key, temporaries)
+
+    # Rebuilds an expression top-down, turning the outermost nodes for which `key` returns a key into Temporary
+    # nodes. Nodes with equal keys share one Temporary, kept in `temporaries`.
+    def replace(self, expr, key, temporaries):
+        found = key(expr)
+        if found is not None:
+            temporary = temporaries.get(found)
+            if temporary is None:
+                self.temporaries += 1
+                name = f"{TEMPORARY_PREFIX}{self.temporaries}"
+                temporary = temporaries[found] = Temporary(expr, name, expr.line)
+            return temporary
+        elif isinstance(expr, Unary):
+            return Unary(expr.operator, self.replace(expr.right, key, temporaries), expr.line)
+        elif isinstance(expr, Binary):
+            left = self.replace(expr.left, key, temporaries)
+            return Binary(left, expr.operator, self.replace(expr.right, key, temporaries), expr.line)
+        elif isinstance(expr, Assign):
+            return Assign(expr.name, self.replace(expr.value, key, temporaries), expr.line)
+        elif isinstance(expr, Input):
+            return Input(self.replace(expr.prompt, key, temporaries), expr.line)
+        elif isinstance(expr, Index):
+            array = self.replace(expr.array, key, temporaries)
+            return Index(array, self.replace(expr.index, key, temporaries), expr.line)
+        elif isinstance(expr, AssignIndex):
+            array = self.replace(expr.array, key, temporaries)
+            index = self.replace(expr.index, key, temporaries)
+            return AssignIndex(array, index, self.replace(expr.value, key, temporaries), expr.line)
+        elif isinstance(expr, ArrayLiteral):
+            return ArrayLiteral([self.replace(element, key, temporaries) for element in expr.elements], expr.line)
+        elif isinstance(expr, Call):
+            return Call(expr.name, [self.replace(argument, key, temporaries) for argument in expr.arguments], expr.line)
+        return expr
+
+    # Checks if an expression is worth sharing and safe to: an operation of at least `size` nodes, free of INPUT and
+    # assignments, that reads at least one variable and none of the `assigned` ones. Temporary nodes count as
+    # variables nothing assigns.
+    def is_shareable(self, expr, assigned, size=1):
+        if not isinstance(expr, (Binary, Unary)):
+            return False
+        key, names, nodes = self.signature(expr)
+        return key is not None and bool(names) and nodes >= size and names.isdisjoint(assigned)
+
+    # Returns a key that is equal for expressions that always compute the same value from the same variables, the
+    # names of the variables they read and their number of nodes. The key is None when the expression contains INPUT
+    # or an assignment. Keys are small integers, one per distinct expression, so comparing them is cheap.
+    def signature(self, expr):
+        known = self.signatures.get(expr)
+        if known is not None:
+            return known
+        if isinstance(expr, Literal):
+            known = (self.intern(("literal", type(expr.value), repr(expr.value))), frozenset(), 1)
+        elif isinstance(expr, Variable):
+            known = (self.intern(("variable", expr.name)), frozenset([expr.name]), 1)
+        elif isinstance(expr, Temporary):
+            known = (self.intern(("variable", expr.name)), frozenset([expr.name]), 1)
+        elif isinstance(expr, Grouping):
+            known = self.signature(expr.expression)
+        elif isinstance(expr, Unary):
+            right, names, nodes = self.signature(expr.right)
+            key = None if right is None else self.intern(("unary", expr.operator, right))
+            known = key, names, nodes + 1
+        elif isinstance(expr, Binary):
+            left, left_names, left_nodes = self.signature(expr.left)
+            right, right_names, right_nodes = self.signature(expr.right)
+            key = None if left is None or right is None else self.intern(("binary", expr.operator, left, right))
+            known = key, left_names | right_names, left_nodes + right_nodes + 1
+        else:
+            known = (None, frozenset(), 1)
+        self.signatures[expr] = known
+        return known
+
+    # Returns the integer key for an expression described by its kind, operator and the keys of its operands.
+    def intern(self, description):
+        key = self.descriptions.get(description)
+        if key is None:
+            key = self.descriptions[description] = len(self.descriptions)
+        return key
+
+# Returns the names of the variables assigned anywhere in a list of statements, including nested blocks.
+def assigned_names(statements):
+    return {node.name for node in nodes(statements) if isinstance(node, Assign)}
+
+# Yields every node of a list of statements, including nested blocks, without going inside Temporary nodes.
+def nodes(statements):
+    stack = list(statements)
+    while stack:
+        node = stack.pop()
+        yield node
+        if not isinstance(node, Temporary):
+            stack.extend(children(node))
+
+# Checks if a node changes an array in place.
+def mutates(node):
+    return isinstance(node, AssignIndex) or (isinstance(node, Call) and node.name in MUTATING)
+
+# Checks if an expression is an integer literal (not a boolean) with the given value.
+def is_integer_literal(expr, value):
+    return isinstance(expr, Literal) and type(expr.value) is int and expr.value == value
+
+# Checks if an expression always produces an int or float, or an array of numbers, whenever it evaluates without an
+# error. Multiplying such an array by 1 only copies it, and the expressions here already make a new array.
+def is_numeric(expr):
+    if isinstance(expr, Literal):
+        return type(expr.value) in (int, float)
+    if isinstance(expr, Grouping):
+        return is_numeric(expr.expression)
+    if isinstance(expr, Unary):
+        return expr.operator == '-'
+    if isinstance(expr, Binary):
+        operator = expr.operator
+        if operator in ('-', '/'):
+            return True
+        if operator in ('+', '*'):
+            return is_numeric(expr.left) and is_numeric(expr.right)
+    return False
+
+# Counts the AST nodes in a list of statements, including nested blocks.
+def count_nodes(statements):
+    total = 0
+    stack = list(statements)
+    while stack:
+        node = stack.pop()
+        total += 1
+        stack.extend(children(node))
+    return total
@@ -1,9 +1,81 @@
+from sys import intern
 from expressions import *
 from tokens import Token, TokenType
 
 class ParseError(Exception):
     pass
 
+# Kinds of entries on the expression parser's operator stack.
+UNARY = "unary"
+BINARY = "binary"
+GROUP = "group"
+INPUT = "input"
+ARRAY = "array"
+INDEX = "index"
+CALL = "call"
+
+# Entries that hold an opening bracket until its closing one is reached, with the token that closes each and the
+# message of the error when it is missing.
+CLOSINGS = {
+    GROUP: (TokenType.RIGHT_PAREN, "Expect ')' after expression."),
+    INPUT: (TokenType.RIGHT_PAREN, "Expect ')' after input prompt."),
+    CALL: (TokenType.RIGHT_PAREN, "Expect ')' after arguments."),
+    ARRAY: (TokenType.RIGHT_BRACKET, "Expect ']' after array elements."),
+    INDEX: (TokenType.RIGHT_BRACKET, "Expect ']' after index."),
+}
+
+# Names of the built-in functions in arrays.BUILTINS, with how many arguments each takes. They are not keywords: a
+# name is only a call when it is followed by '(', so scripts can still use them as variables.
+FUNCTIONS = {
+    "LEN": 1,
+    "APPEND": 2,
+    "SUM": 1,
+    "MIN": 1,
+    "MAX": 1,
+}
+
+# Binding power of each binary operator; a higher number binds tighter. Prefix operators bind tighter than all of them.
+ASSIGNMENT_PRECEDENCE = 1
+BINARY_PRECEDENCE = {
+    TokenType.EQUAL: ASSIGNMENT_PRECEDENCE,
+    TokenType.OR: 2,
+    TokenType.AND: 3,
+    TokenType.EQUAL_EQUAL: 4, TokenType.BANG_EQUAL: 4,
+    TokenType.GREATER: 5, TokenType.GREATER_EQUAL: 5, TokenType.LESS: 5, TokenType.LESS_EQUAL: 5,
+    TokenType.PLUS: 6, TokenType.MINUS: 6,
+    TokenType.STAR: 7, TokenType.SLASH: 7,
+}
+PREFIX_PRECEDENCE = 8
+UNARY_OPERATORS = (TokenType.MINUS, TokenType.BANG)
+
+# Tokens that are a Literal by themselves, with the value of those whose token carries no literal.
+LITERALS = {TokenType.INTEGER: None, TokenType.FLOAT: None, TokenType.STRING: None, TokenType.TRUE: True, TokenType.FALSE: False}
+VALUE_LITERALS = (TokenType.INTEGER, TokenType.FLOAT, TokenType.STRING)
+
+# Applies an operator from the expression parser's stack to the operands on top of the operand stack.
+def reduce(operands, entry):
+    kind, token, precedence = entry
+    if kind is UNARY:
+        right = operands.pop()
+        operands.append(Unary(intern(token.lexeme), right, token.line))
+    elif precedence == ASSIGNMENT_PRECEDENCE:
+        value = operands.pop()
+        target = operands.pop()
+        if isinstance(target, Index):
+            operands.append(AssignIndex(target.array, target.index, value, target.line))
+        elif isinstance(target, Variable):
+            operands.append(Assign(target.name, value, target.line))
+        else:
+            raise ParseError("Invalid assignment target.")
+    else:
+        right = operands.pop()
+        left = operands.pop()
+        operands.append(Binary(left, intern(token.lexeme), right, left.line))
+
+# Returns the message for a call of a built-in function with the wrong number of arguments.
+def arity_error(name, arity):
+    return f"{name} takes {arity} argument{'' if arity == 1 else 's'}."
+
 class Parser:
     """
     A simple parser that converts a list of tokens into an Abstract Syntax Tree (AST).
@@ -15,23 +87,26 @@ class Parser:
     
     # Parses the entire input and returns a list of statements.
     def parse(self):
-        statements = []
+        return list(self.statements())
+
+    # Parses the input one top-level statement at a time, yielding each as soon as it is complete.
+    def statements(self):
         while not self.is_at_end():
             if self.check(TokenType.NEWLINE):
                 self.advance()
                 continue
-            statements.append(self.statement())
+            yield self.statement()
             if self.match(TokenType.NEWLINE):
                 continue
             if self.check(TokenType.EOF):
                 break
-        return statements
     
     # Parses a single statement, which can be a print statement, while loop, if statement, or an expression.
     def statement(self):
         if self.match(TokenType.PRINT):
+            line = self.previous().line
             expr = self.expression()
-            return Print(expr)
+            return Print(expr, line)
         elif self.match(TokenType.WHILE):
             return self.while_statement()
         elif self.match(TokenType.IF):
@@ -40,11 +115,13 @@ class Parser:
 
     # Parses a print statement, which outputs the value of an expression.
     def print_statement(self):
+        line = self.previous().line
         value = self.expression()
-        return Print(value)
+        return Print(value, line)
     
     # Parses a while statement, which executes a block of code as long as a condition is true.
     def while_statement(self):
+        line = self.previous().line
         self.consume(TokenType.LEFT_PAREN, "Expect '(' after 'while'.")
         condition = self.expression()
         self.consume(TokenType.RIGHT_PAREN, "Expect ')' after condition.")
@@ -57,10 +134,11 @@ class Parser:
         
         self.consume(TokenType.RIGHT_BRACE, "Expect '}' after while body.")
         
-        return While(condition, body)
+        return While(condition, body, line)
 
     # Parses an if statement, which executes a block of code if a condition is true, and optionally another block if the condition is false.
     def if_statement(self):
+        line = self.previous().line
         self.consume(TokenType.LEFT_PAREN, "Expect '(' after 'if'.")
         condition = self.expression()
         self.consume(TokenType.RIGHT_PAREN, "Expect ')' after condition.")
@@ -81,84 +159,113 @@ class Parser:
                 else_branch.append(self.statement())
             self.consume(TokenType.RIGHT_BRACE, "Expect '}' after else body.")
         
-        return If(condition, then_branch, else_branch)
+        return If(condition, then_branch, else_branch, line)
     
     # Parses an expression statement, which is an expression followed by a newline.
     def expression_statement(self):
         expr = self.expression()
         return expr
     
+    # Parses an expression with a single loop instead of one method per precedence level. Operands go on one stack
+    # and pending operators and openings (parentheses, INPUT(, function calls, array literals and indexing) on
+    # another; an operator is applied as soon as a weaker one follows it. Nothing recurses, so chains and nesting of
+    # any length parse without hitting the recursion limit, and the result is the same tree the grammar describes:
+    # indexing binds tightest, then unary operators, binary operators are left-associative and assignment is
+    # right-associative with the lowest precedence. `starts` holds, for every open array literal or call, the height
+    # of the operand stack where its elements begin.
     def expression(self):
-        return self.assignment()
-    
-    # Parses an assignment expression, which can assign a value to a variable.
-    def assignment(self):
-        expr = self.logic_or()
-
-        if self.match(TokenType.EQUAL):
-            equals = self.previous()
-            value = self.assignment()
-
-            if isinstance(expr, Variable):
-                name = expr.name
-                return Assign(name, value)
-
-            raise ParseError("Invalid assignment target.")
-
-        return expr
+        operands = []
+        pending = []
+        starts = []
+        while True:
+            # An operand, after any prefix operators and openings.
+            token = self.peek()
+            kind = token.type if token is not None else None
+            if kind in UNARY_OPERATORS:
+                self.advance()
+                pending.append((UNARY, token, PREFIX_PRECEDENCE))
+                continue
+            if kind is TokenType.LEFT_PAREN:
+                self.advance()
+                pending.append((GROUP, token, 0))
+                continue
+            if kind is TokenType.INPUT:
+                self.advance()
+                self.consume(TokenType.LEFT_PAREN, "Expect '(' after 'INPUT'")
+                pending.append((INPUT, token, 0))
+                continue
+            if kind is TokenType.LEFT_BRACKET:
+                self.advance()
+                if self.match(TokenType.RIGHT_BRACKET):
+                    operands.append(ArrayLiteral([], token.line))
+                else:
+                    pending.append((ARRAY, token, 0))
+                    starts.append(len(operands))
+                    continue
+            elif kind in LITERALS:
+                self.advance()
+                operands.append(Literal(token.literal if kind in VALUE_LITERALS else LITERALS[kind], token.line))
+            elif kind is TokenType.IDENTIFIER:
+                self.advance()
+                if token.lexeme in FUNCTIONS and self.match(TokenType.LEFT_PAREN):
+                    if self.check(TokenType.RIGHT_PAREN):
+                        raise ParseError(arity_error(token.lexeme, FUNCTIONS[token.lexeme]))
+                    pending.append((CALL, token, 0))
+                    starts.append(len(operands))
+                    continue
+                operands.append(Variable(intern(token.lexeme), token.line))
+            else:
+                raise ParseError("Expect expression.")
 
-    # Parses an expression with addition and multiplication operations.
-    def addition(self):
-        expr = self.multiplication()
-        while self.match(TokenType.PLUS, TokenType.MINUS):
-            operator = self.previous()
-            right = self.multiplication()
-            expr = Binary(expr, operator, right)
-        return expr
-    
-    # Parses an expression with multiplication and division operations.
-    def multiplication(self):
-        expr = self.unary()
+            # Binary operators, indexing, commas and closing brackets, until the expression needs another operand or ends.
+            while True:
+                token = self.peek()
+                kind = token.type if token is not None else None
+                precedence = BINARY_PRECEDENCE.get(kind)
+                if precedence is not None:
+                    self.advance()
+                    while pending and (pending[-1][2] > precedence or
+                                       (pending[-1][2] == precedence and precedence != ASSIGNMENT_PRECEDENCE)):
+                        reduce(operands, pending.pop())
+                    pending.append((BINARY, token, precedence))
+                    break
+                if kind is TokenType.LEFT_BRACKET:
+                    self.advance()
+                    pending.append((INDEX, token, 0))
+                    break
 
-        while self.match(TokenType.STAR, TokenType.SLASH):
-            operator = self.previous()
-            right = self.unary()
-            expr = Binary(expr, operator, right)
+                while pending and pending[-1][0] not in CLOSINGS:
+                    reduce(operands, pending.pop())
+                if not pending:
+                    return operands.pop()
+                opening, token, _ = pending[-1]
+                if kind is TokenType.COMMA and opening in (ARRAY, CALL):
+                    self.advance()
+                    break
+                pending.pop()
+                closing, message = CLOSINGS[opening]
+                self.consume(closing, message)
+                if opening is GROUP:
+                    operands.append(Grouping(operands.pop(), token.line))
+                elif opening is INPUT:
+                    operands.append(Input(operands.pop(), token.line))
+                elif opening is INDEX:
+                    position = operands.pop()
+                    array = operands.pop()
+                    operands.append(Index(array, position, array.line))
+                else:
+                    start = starts.pop()
+                    elements = operands[start:]
+                    del operands[start:]
+                    if opening is ARRAY:
+                        operands.append(ArrayLiteral(elements, token.line))
+                    else:
+                        name = intern(token.lexeme)
+                        arity = FUNCTIONS[name]
+                        if len(elements) != arity:
+                            raise ParseError(arity_error(name, arity))
+                        operands.append(Call(name, elements, token.line))
 
-        return expr
-    
-    # Parses unary expressions, which can be negation or logical NOT.
-    def unary(self):
-        if self.match(TokenType.MINUS, TokenType.BANG):
-            operator = self.previous()
-            right = self.unary()
-            return Unary(operator, right)
-        return self.primary()
-
-    # Parses primary expressions, which can be literals, variables, groupings, or input statements.
-    def primary(self):
-        if self.match(TokenType.INTEGER, TokenType.FLOAT):
-            return Literal(self.previous().literal)
-        if self.match(TokenType.TRUE):
-            return Literal(True)
-        if self.match(TokenType.STRING):
-            return Literal(self.previous().literal)
-        if self.match(TokenType.FALSE):
-            return Literal(False)
-        if self.match(TokenType.IDENTIFIER):
-            return Variable(self.previous())
-        if self.match(TokenType.LEFT_PAREN):
-            expr = self.expression()
-            self.consume(TokenType.RIGHT_PAREN, "Expect ')' after expression.")
-            return Grouping(expr)
-        if self.match(TokenType.INPUT):
-            self.consume(TokenType.LEFT_PAREN, "Expect '(' after 'INPUT'")
-            prompt = self.expression()
-            self.consume(TokenType.RIGHT_PAREN, "Expect ')' after input prompt.")
-            return Input(prompt)
-        
-        raise ParseError("Expect expression.")
-    
     # Matches the current token against the provided types and advances if it matches.
     def match(self, *types):
         if self.check(*types):
@@ -198,38 +305,28 @@ class Parser:
     def previous(self):
         return self.tokens[self.current - 1]
     
-    # Parses logical expressions with OR and AND operations.
-    def logic_or(self):
-        expr = self.logic_and()
-        while self.match(TokenType.OR):
-            operator = self.previous()
-            right = self.logic_and()
-            expr = Binary(expr, operator, right)
-        return expr
-    
-    # Parses logical expressions with AND operations.
-    def logic_and(self):
-        expr = self.equality()
-        while self.match(TokenType.AND):
-            operator = self.previous()
-            right = self.equality()
-            expr = Binary(expr, operator, right)
-        return expr
+class StreamingParser(Parser):
+    """
+    A parser that pulls tokens from an iterator, such as scanner.stream_tokens, instead of indexing a list.
+    It only keeps the current and previous tokens, so memory does not grow with the length of the input.
+    """
+    def __init__(self, tokens):
+        super().__init__([])
+        self.stream = iter(tokens)
+        self.current_token = next(self.stream, None)
+        self.previous_token = None
 
-    # Parses equality expressions with == and != operators.
-    def equality(self):
-        expr = self.comparison()
-        while self.match(TokenType.EQUAL_EQUAL, TokenType.BANG_EQUAL):
-            operator = self.previous()
-            right = self.comparison()
-            expr = Binary(expr, operator, right)
-        return expr
+    def is_at_end(self):
+        return self.current_token is None
 
-    # Parses comparison expressions with >, >=, <, and <= operators.
-    def comparison(self):
-        expr = self.addition()
-        while self.match(TokenType.GREATER, TokenType.GREATER_EQUAL, TokenType.LESS, TokenType.LESS_EQUAL):
-            operator = self.previous()
-            right = self.addition()
-            expr = Binary(expr, operator, right)
-        return expr
\ No newline at end of file
+    def peek(self):
+        return self.current_token
+
+    def advance(self):
+        if self.current_token is not None:
+            self.previous_token = self.current_token
+            self.current_token = next(self.stream, None)
+        return self.previous_token
+
+    def previous(self):
+        return self.previous_token
@@ -0,0 +1,124 @@
+""" A profiling tree walker, used by --profile, that times every statement and counts loop iterations and branches. """
+
+import sys
+import time
+from expressions import *
+from interpreter import Interpreter
+
+class LineStats:
+    """
+    What the profiler measured for one source line: how many statements on it ran, the time from their start to
+    their end (cumulative, counted once when a line is nested in itself) and that time minus the time of the
+    statements nested in them (self).
+    """
+    __slots__ = ('count', 'cumulative', 'own')
+
+    def __init__(self):
+        self.count = 0
+        self.cumulative = 0.0
+        self.own = 0.0
+
+class ProfilingInterpreter(Interpreter):
+    """
+    A tree walker that records, per source line, execution counts with cumulative and self time, plus the number of
+    iterations of every WHILE and how often every IF took each branch. Profiling lives entirely in this subclass, so
+    the other backends are unaffected when --profile is not given.
+    """
+    def __init__(self, environment=None):
+        super().__init__(environment)
+        self.lines = {}
+        self.loops = {}
+        self.branches = {}
+        self.stacks = {}
+        self.active = []
+        self.nested = [0.0]
+
+    def execute(self, statement):
+        line = statement.line
+        stats = self.lines.get(line)
+        if stats is None:
+            stats = self.lines[line] = LineStats()
+        recursive = line in self.active
+        self.active.append(line)
+        self.nested.append(0.0)
+        start = time.perf_counter()
+        try:
+            if isinstance(statement, While):
+                self.execute_while(statement)
+            elif isinstance(statement, If):
+                self.execute_if(statement)
+            else:
+                super().execute(statement)
+        finally:
+            elapsed = time.perf_counter() - start
+            own = elapsed - self.nested.pop()
+            self.nested[-1] += elapsed
+            stats.count += 1
+            stats.own += own
+            if not recursive:
+                stats.cumulative += elapsed
+            stack = tuple(self.active)
+            self.stacks[stack] = self.stacks.get(stack, 0.0) + own
+            self.active.pop()
+
+    # Runs a WHILE like Interpreter.execute does, counting its iterations.
+    def execute_while(self, statement):
+        counts = self.loops.get(statement)
+        if counts is None:
+            counts = self.loops[statement] = [0, 0]
+        counts[0] += 1
+        while self.evaluate(statement.condition):
+            counts[1] += 1
+            for stmt in statement.body:
+                self.execute(stmt)
+
+    # Runs an IF like Interpreter.execute does, counting how often the then branch was taken and how often not.
+    def execute_if(self, statement):
+        counts = self.branches.get(statement)
+        if counts is None:
+            counts = self.branches[statement] = [0, 0]
+        if self.evaluate(statement.condition):
+            counts[0] += 1
+            for stmt in statement.then_branch:
+                self.execute(stmt)
+        else:
+            counts[1] += 1
+            for stmt in statement.else_branch or []:
+                self.execute(stmt)
+
+    # Prints the lines sorted by self time, then the WHILE and IF counters. `source` is used to show each line's text.
+    def report(self, source="", file=sys.stderr, limit=20):
+        text = source.split('\n')
+        total = sum(stats.own for stats in self.lines.values()) or 1.0
+
+        def code(line):
+            return text[line - 1].strip()[:48] if 0 < line <= len(text) else ""
+
+        print(f"{'line':>6}  {'count':>10}  {'cumulative':>11}  {'self':>10}  {'self %':>6}  source", file=file)
+        hottest = sorted(self.lines.items(), key=lambda item: item[1].own, reverse=True)
+        for line, stats in hottest[:limit]:
+            print(f"{line:>6}  {stats.count:>10}  {stats.cumulative:>10.4f}s  {stats.own:>9.4f}s  "
+                  f"{100 * stats.own / total:>5.1f}%  {code(line)}", file=file)
+
+        if self.loops:
+            print(f"\n{'line':>6}  {'runs':>10}  {'iterations':>11}  WHILE", file=file)
+            for statement, (runs, iterations) in sorted(self.loops.items(), key=lambda item: -item[1][1]):
+                print(f"{statement.line:>6}  {runs:>10}  {iterations:>11}  {code(statement.line)}", file=file)
+
+        if self.branches:
+            print(f"\n{'line':>6}  {'taken':>10}  {'not taken':>11}  IF", file=file)
+            for statement, (taken, skipped) in sorted(self.branches.items(), key=lambda item: -sum(item[1])):
+                print(f"{statement.line:>6}  {taken:>10}  {skipped:>11}  {code(statement.line)}", file=file)
+
+    # Writes the self time of every stack of nested statements in the collapsed format read by flamegraph.pl and
+    # speedscope: one "frame;frame;frame microseconds" line per stack, with a frame per line number and its text.
+    def write_collapsed(self, path, source=""):
+        text = source.split('\n')
+
+        def frame(line):
+            code = text[line - 1].strip() if 0 < line <= len(text) else ""
+            return f"line {line}: {code}".replace(';', ',')
+
+        with open(path, "w") as file:
+            for stack, seconds in self.stacks.items():
+                file.write(f"{';'.join(frame(line) for line in stack)} {round(seconds * 1e6)}\n")
@@ -0,0 +1,120 @@
+""" An embedding API: compile a Simple script once and run it many times with different variables, input and output. """
+
+from scanner import FastScanner
+from parser import Parser
+from optimizer import Optimizer
+from closures import ClosureInterpreter
+from interpreter import Interpreter, Environment, UNDEFINED
+from resolver import Resolver
+from expressions import depth, is_temporary, MAX_NESTING
+from strings import plain
+
+class Result:
+    """
+    The outcome of one Program.run: the final variable values by name, everything the script printed (including
+    INPUT prompts) as one string, and the error that stopped it, or None if it ran to completion. The error is a
+    RuntimeError (a RecursionError for expressions nested too deeply) or, for an operator applied to values it does
+    not support, such as "a" - 1, a TypeError.
+    """
+    __slots__ = ('values', 'output', 'error')
+
+    def __init__(self, values, output, error=None):
+        self.values = values
+        self.output = output
+        self.error = error
+
+    def __repr__(self):
+        return f"Result(values={self.values!r}, output={self.output!r}, error={self.error!r})"
+
+class Execution:
+    """
+    The state of one run of a Program, passed to its compiled closures as `it`: the variable slots, the remaining
+    INPUT answers and the output written so far.
+    """
+    __slots__ = ('values', 'answers', 'output', 'sink')
+
+    def __init__(self, values, answers, sink):
+        self.values = values
+        self.answers = answers
+        self.output = []
+        self.sink = sink
+
+    def write(self, text):
+        self.output.append(text)
+        if self.sink is not None:
+            self.sink.write(text)
+
+    def print(self, value):
+        self.write(f"{value}\n")
+
+    def input(self, prompt):
+        self.write(prompt)
+        answer = next(self.answers, UNDEFINED)
+        if answer is UNDEFINED:
+            raise RuntimeError("No more input.")
+        return str(answer)
+
+# Returns a function that runs statements with the tree walker against an Execution, for programs nested too deeply
+# for the closure compiler. Every variable must already have a slot in `slots`, so the walker never adds one.
+def walk(statements, slots):
+    def run(it):
+        environment = Environment()
+        environment.slots = slots
+        environment.values = it.values
+        walker = Interpreter(environment)
+        walker.print = it.print
+        walker.input = it.input
+        walker.interpret(statements)
+    return run
+
+class Program:
+    """
+    A script scanned, parsed, optimized and compiled to closures once. A Program is immutable and keeps no state
+    between runs, so one instance can be run any number of times, from any number of threads at once.
+    The constructor raises SyntaxError for invalid tokens and parser.ParseError for invalid grammar.
+    """
+    __slots__ = ('code', 'slots')
+
+    def __init__(self, source: str, optimize: bool = True):
+        statements = Parser(FastScanner(source).scan_tokens()).parse()
+        if optimize:
+            statements = Optimizer().optimize(statements)
+        environment = Environment()
+        if depth(statements) > MAX_NESTING:
+            code = walk(statements, Resolver(environment).resolve(statements))
+        else:
+            code = ClosureInterpreter(environment).compile(statements)
+        object.__setattr__(self, 'code', code)
+        object.__setattr__(self, 'slots', dict(environment.slots))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Program is immutable")
+
+    # Returns the names of the variables the script uses.
+    def names(self):
+        return [name for name in self.slots if not is_temporary(name)]
+
+    # Runs the program. `bindings` gives variables their initial values, `inputs` supplies the answers to INPUT in
+    # order, and anything the script prints is also written to `output`, if given, as it happens.
+    # A RuntimeError or TypeError in the script ends the run and is returned in Result.error rather than raised, with
+    # the output and values up to that point.
+    def run(self, bindings=None, inputs=(), output=None) -> Result:
+        values = [UNDEFINED] * len(self.slots)
+        extra = {}
+        for name, value in (bindings or {}).items():
+            slot = self.slots.get(name)
+            if slot is None:
+                extra[name] = value
+            else:
+                values[slot] = value
+
+        execution = Execution(values, iter(inputs), output)
+        error = None
+        try:
+            self.code(execution)
+        except (RuntimeError, TypeError) as e:
+            error = e
+
+        final = {name: plain(values[slot]) for name, slot in self.slots.items()
+                 if values[slot] is not UNDEFINED and not is_temporary(name)}
+        return Result({**extra, **final}, ''.join(execution.output), error)
@@ -0,0 +1,177 @@
+import operator
+import sys
+from expressions import *
+from interpreter import Interpreter, UNDEFINED
+from strings import Rope, concat
+from arrays import Array
+
+# Number of evaluations a site is observed for before it is specialized.
+WARMUP = 8
+
+# Guard failures after which a site gives up on specializing and stays generic.
+MAX_MISSES = 64
+
+def checked_divide(left, right):
+    if right == 0:
+        raise RuntimeError("Division by zero.")
+    return left / right
+
+NUMBER_PAIRS = [(int, int), (int, float), (float, int), (float, float)]
+TEXT_PAIRS = [(str, str), (str, Rope), (Rope, str), (Rope, Rope)]
+
+# Fast paths, keyed by operator and the operand types they are valid for.
+BINARY_SPECIALIZATIONS = {}
+for left_type, right_type in NUMBER_PAIRS:
+    for symbol, function in (('+', operator.add), ('-', operator.sub), ('*', operator.mul), ('/', checked_divide),
+                             ('<', operator.lt), ('<=', operator.le), ('>', operator.gt), ('>=', operator.ge),
+                             ('==', operator.eq), ('!=', operator.ne)):
+        BINARY_SPECIALIZATIONS[symbol, left_type, right_type] = function
+for left_type, right_type in TEXT_PAIRS:
+    BINARY_SPECIALIZATIONS['+', left_type, right_type] = concat
+    for symbol, function in (('<', operator.lt), ('<=', operator.le), ('>', operator.gt), ('>=', operator.ge),
+                             ('==', operator.eq), ('!=', operator.ne)):
+        BINARY_SPECIALIZATIONS[symbol, left_type, right_type] = function
+for symbol, function in (('==', operator.eq), ('!=', operator.ne), ('AND', operator.and_), ('OR', operator.or_)):
+    BINARY_SPECIALIZATIONS[symbol, bool, bool] = function
+
+UNARY_SPECIALIZATIONS = {
+    ('-', int): operator.neg,
+    ('-', float): operator.neg,
+    ('!', bool): operator.not_,
+}
+
+class Site:
+    """
+    The inline cache of one Binary or Unary node: the operand types seen while warming up, the specialized
+    operation once the site is monomorphic, and how often its type guard hit or missed.
+    """
+    __slots__ = ('index', 'operator', 'left_type', 'right_type', 'operation', 'seen', 'stable', 'warmup', 'hits',
+                 'misses', 'generic')
+
+    def __init__(self, index, operator):
+        self.index = index
+        self.operator = operator
+        self.left_type = None
+        self.right_type = None
+        self.operation = None
+        self.seen = None
+        self.stable = True
+        self.warmup = WARMUP
+        self.hits = 0
+        self.misses = 0
+        self.generic = False
+
+    # Records the operand types of a generic evaluation and specializes the site once it has warmed up.
+    def observe(self, types, specializations):
+        if self.generic:
+            return
+        if self.operation is not None:
+            self.misses += 1
+            if self.misses >= MAX_MISSES:
+                self.despecialize()
+            return
+        if self.seen is None:
+            self.seen = types
+        elif self.seen != types:
+            self.stable = False
+        self.warmup -= 1
+        if self.warmup == 0:
+            operation = specializations.get((self.operator, *types)) if self.stable else None
+            if operation is None:
+                self.generic = True
+                return
+            self.operation = operation
+            self.left_type = types[0]
+            self.right_type = types[-1]
+
+    # Stops using the fast path, for sites whose operand types keep changing.
+    def despecialize(self):
+        self.generic = True
+        self.operation = None
+        self.left_type = None
+        self.right_type = None
+
+    # Describes the fast path this site uses, for the statistics report.
+    def specialization(self):
+        if self.operation is None:
+            return "generic"
+        if self.left_type is self.right_type:
+            return f"{self.left_type.__name__}"
+        return f"{self.left_type.__name__},{self.right_type.__name__}"
+
+class QuickeningInterpreter(Interpreter):
+    """
+    A tree walker that specializes Binary and Unary nodes at run time. Each site starts out generic and records the
+    operand types it sees; after WARMUP evaluations with the same types it switches to a fast path guarded by a type
+    check, and any value that fails the guard is handled by the generic Interpreter.binary/unary code.
+    """
+    def __init__(self, environment=None):
+        super().__init__(environment)
+        self.sites = {}
+
+    # Binary and Unary nodes go through their inline cache, except those type inference already specialized, whose
+    # operand types are certain and need no guard. Literals and variables, the most common operands,
+    # are handled here as well so that evaluating them does not cost an extra call into Interpreter.evaluate, and so
+    # are groupings, assignments and the optimizer's temporaries, whose operands would otherwise be evaluated by
+    # Interpreter.evaluate without the inline caches.
+    def evaluate(self, expr):
+        kind = type(expr)
+        if kind is Literal:
+            return expr.value
+
+        elif kind is Variable:
+            return self.environment.get(expr.name)
+
+        elif kind is TypedBinary:
+            return expr.function(self.evaluate(expr.left), self.evaluate(expr.right))
+
+        elif kind is TypedUnary:
+            return expr.function(self.evaluate(expr.right))
+
+        elif kind is Binary:
+            left = self.evaluate(expr.left)
+            right = self.evaluate(expr.right)
+            site = self.sites.get(expr)
+            if site is None:
+                site = self.sites[expr] = Site(len(self.sites), expr.operator)
+            if type(left) is site.left_type and type(right) is site.right_type:
+                site.hits += 1
+                return site.operation(left, right)
+            site.observe((type(left), type(right)), BINARY_SPECIALIZATIONS)
+            return self.binary(site.operator, left, right)
+
+        elif kind is Unary:
+            right = self.evaluate(expr.right)
+            site = self.sites.get(expr)
+            if site is None:
+                site = self.sites[expr] = Site(len(self.sites), expr.operator)
+            if type(right) is site.right_type:
+                site.hits += 1
+                return site.operation(right)
+            site.observe((type(right),), UNARY_SPECIALIZATIONS)
+            return self.unary(site.operator, right)
+
+        elif kind is Grouping:
+            return self.evaluate(expr.expression)
+
+        elif kind is Assign:
+            value = self.evaluate(expr.value)
+            self.environment.assign(expr.name, value)
+            return value
+
+        elif kind is Temporary:
+            slot = self.environment.slot(expr.name)
+            value = self.environment.values[slot]
+            if value is UNDEFINED:
+                value = self.evaluate(expr.expression)
+                if type(value) is not Array:
+                    self.environment.values[slot] = value
+            return value
+
+        return super().evaluate(expr)
+
+    # Prints one line per site with its specialization and guard hit/miss counters.
+    def report(self, file=sys.stderr):
+        print(f"{'site':>5}  {'operator':<8}  {'specialized for':<16}  {'hits':>10}  {'misses':>8}", file=file)
+        for site in self.sites.values():
+            print(f"{site.index:>5}  {site.operator:<8}  {site.specialization():<16}  {site.hits:>10}  {site.misses:>8}", file=file)
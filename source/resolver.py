@@ -0,0 +1,24 @@
+from expressions import *
+
+class Resolver:
+    """
+    Maps every distinct identifier in a program to an integer storage slot in the environment before it runs,
+    so the compiled backends can read and write variables by index instead of looking names up.
+    """
+    def __init__(self, environment):
+        self.environment = environment
+
+    # Allocates a slot for every variable read or assigned in the statements and returns the name -> slot mapping.
+    def resolve(self, statements):
+        stack = list(reversed(statements))
+        while stack:
+            node = stack.pop()
+            if isinstance(node, (Variable, Assign)):
+                self.environment.slot(node.name)
+            elif isinstance(node, Temporary):
+                self.environment.slot(node.name)
+            elif isinstance(node, Reset):
+                for name in node.names:
+                    self.environment.slot(name)
+            stack.extend(reversed(children(node)))
+        return self.environment.slots
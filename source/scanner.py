@@ -1,16 +1,33 @@
+import re
+import os
+import mmap
+import contextlib
+from sys import intern
 from tokens import Token, TokenType
 
+KEYWORDS = {
+    "TRUE": (TokenType.TRUE, True),
+    "FALSE": (TokenType.FALSE, False),
+    "AND": (TokenType.AND, None),
+    "OR": (TokenType.OR, None),
+    "PRINT": (TokenType.PRINT, None),
+    "WHILE": (TokenType.WHILE, None),
+    "IF": (TokenType.IF, None),
+    "ELSE": (TokenType.ELSE, None),
+    "INPUT": (TokenType.INPUT, None),
+}
+
 class Scanner:
     """
     A simple scanner that tokenizes a source code string.
     It recognizes various token types such as operators, literals, identifiers, and control flow keywords.
     """
-    def __init__(self, source: str):
+    def __init__(self, source: str, line: int = 1):
         self.source = source
         self.tokens = []
         self.start = 0
         self.current = 0
-        self.line = 1
+        self.line = line
     
     # Checks if the scanner has reached the end of the source code.
     def is_at_end(self):
@@ -63,6 +80,12 @@ class Scanner:
             self.add_token(TokenType.LEFT_BRACE)
         elif char == '}':
             self.add_token(TokenType.RIGHT_BRACE)
+        elif char == '[':
+            self.add_token(TokenType.LEFT_BRACKET)
+        elif char == ']':
+            self.add_token(TokenType.RIGHT_BRACKET)
+        elif char == ',':
+            self.add_token(TokenType.COMMA)
         elif char == '"':
             self.string()
         elif char.isdigit():
@@ -135,24 +158,11 @@ class Scanner:
     
     # Parses identifiers and keywords from the source code.
     def identifier(self):
-        
-        keywords = {
-            "TRUE": (TokenType.TRUE, True),
-            "FALSE": (TokenType.FALSE, False),
-            "AND": (TokenType.AND, None),
-            "OR": (TokenType.OR, None),
-            "PRINT": (TokenType.PRINT, None),
-            "WHILE": (TokenType.WHILE, None),
-            "IF": (TokenType.IF, None),
-            "ELSE": (TokenType.ELSE, None),
-            "INPUT": (TokenType.INPUT, None)
-        }
-        
         while self.peek().isalnum():
             self.advance()
 
         text = self.source[self.start:self.current]
-        result = keywords.get(text)
+        result = KEYWORDS.get(text)
         
 
         if result:
@@ -167,4 +177,267 @@ class Scanner:
             self.start = self.current
             self.scan_token()
         self.tokens.append(Token(TokenType.EOF, '', None, self.line))
-        return self.tokens
\ No newline at end of file
+        return self.tokens
+
+class BytesScanner(Scanner):
+    """
+    A scanner over the raw bytes of a UTF-8 script, such as a memory-mapped file, that never decodes the whole source.
+    It matches the master pattern against the buffer as FastScanner does and produces the same tokens, line numbers
+    and errors; only the lexemes of the tokens it produces are decoded, and identifier names are decoded once each.
+    Wherever the pattern does not apply, the rest of the line (the rest of the file for an unterminated string) is
+    decoded and a single token is scanned from it with Scanner.scan_token. As when the file is read as text, lines
+    may end in LF, CRLF or a lone CR, and line ends inside a string literal become LF.
+    """
+    def scan_tokens(self):
+        self.tokens.extend(self.generate_tokens())
+        return self.tokens
+
+    # Yields the tokens, ending with EOF, as they are scanned, so that a StreamingParser can consume them without a
+    # list of all of them being built.
+    def generate_tokens(self):
+        source = self.source
+        end = len(source)
+        position = 0
+        line = self.line
+        names = {}
+
+        while position < end:
+            for found in BYTES_TOKEN_PATTERN.finditer(source, position):
+                if found.start() != position:
+                    break
+                kind = found.lastindex
+                text = found.group(kind)
+                following = found.end()
+
+                if kind == 5:
+                    token_type, lexeme = BYTES_OPERATORS[text]
+                    yield Token(token_type, lexeme, None, line)
+                elif kind == 3:
+                    if following < end and source[following] >= 0x80:
+                        position = found.start(kind)
+                        break
+                    keyword = BYTES_KEYWORDS.get(text)
+                    if keyword:
+                        yield Token(keyword[0], keyword[1], keyword[2], line)
+                    else:
+                        name = names.get(text)
+                        if name is None:
+                            name = names[text] = intern(text.decode('ascii'))
+                        yield Token(TokenType.IDENTIFIER, name, name, line)
+                elif kind == 1:
+                    line += line_ends(text)
+                elif kind == 2:
+                    if following < end and (source[following] >= 0x80 or
+                                            (source[following] == DOT and following + 1 < end and
+                                             source[following + 1] >= 0x80)):
+                        position = found.start(kind)
+                        break
+                    lexeme = text.decode('ascii')
+                    if DOT in text:
+                        yield Token(TokenType.FLOAT, lexeme, float(text), line)
+                    else:
+                        yield Token(TokenType.INTEGER, lexeme, int(text), line)
+                else:
+                    lexeme = text.decode('utf-8')
+                    if '\r' in lexeme:
+                        lexeme = lexeme.replace('\r\n', '\n').replace('\r', '\n')
+                    line += lexeme.count('\n')
+                    yield Token(TokenType.STRING, lexeme, lexeme[1:-1], line)
+                position = following
+
+            while position < end and source[position] in b' \t':
+                position += 1
+            if position < end:
+                position, line, tokens = self.scan_one(position, line)
+                yield from tokens
+
+        self.current = position
+        self.line = line
+        yield Token(TokenType.EOF, '', None, line)
+
+    # Decodes the text from a position to the end of its line, or to the end of the source for a string that is not
+    # closed there, and scans a single token from it with the reference scanner. Returns the position and line
+    # after the token and the tokens it produced. An unclosed string always raises a SyntaxError, so its line ends
+    # are translated only for the line number in the message.
+    def scan_one(self, position, line):
+        source = self.source
+        stop = len(source)
+        if source[position] != QUOTE:
+            newline = LINE_END.search(source, position)
+            if newline:
+                stop = newline.start()
+        text = str(source[position:stop], 'utf-8')
+        if source[position] == QUOTE:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        scanner = Scanner(text, line)
+        scanner.scan_token()
+        return position + len(text[:scanner.current].encode()), scanner.line, scanner.tokens
+
+# Yields the tokens of a source given as an iterable of lines, such as an open file. The lines are scanned in chunks
+# of roughly chunk_size characters that never end inside a string literal, so only one chunk is in memory at a time.
+def stream_tokens(lines, scanner=None, chunk_size=1 << 16):
+    scanner = scanner or FastScanner
+    chunk = []
+    size = 0
+    quotes = 0
+    line = 1
+    for text in lines:
+        chunk.append(text)
+        size += len(text)
+        quotes += text.count('"')
+        if size >= chunk_size and quotes % 2 == 0:
+            chunk_scanner = scanner(''.join(chunk), line)
+            tokens = chunk_scanner.scan_tokens()
+            tokens.pop()
+            yield from tokens
+            line = chunk_scanner.line
+            chunk = []
+            size = 0
+            quotes = 0
+    yield from scanner(''.join(chunk), line).scan_tokens()
+
+# Returns the number of lines a run of blank bytes ends: one for each \n, \r\n or lone \r.
+def line_ends(text):
+    return text.count(b'\n') + text.count(b'\r') - text.count(b'\r\n')
+
+# Maps a file into memory read-only and yields a memoryview of its bytes, for BytesScanner. Pages are read in by the
+# operating system as the scanner reaches them and can be dropped again under memory pressure, since they are backed
+# by the file. An empty file, which cannot be mapped, gives an empty view.
+@contextlib.contextmanager
+def map_file(path):
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            yield memoryview(b"")
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping, memoryview(mapping) as view:
+            yield view
+
+# Leading blanks, then one group per token class: 1 newlines, 2 number, 3 identifier, 4 string, 5 operator.
+# Only ASCII is matched here; anything else is left to the reference scanner.
+TOKEN_PATTERN = re.compile(r"""
+    [ \t\r]*
+    (?:
+        (\n[ \t\r\n]*)
+      | ([0-9]+(?:\.[0-9]+)?)
+      | ([A-Za-z][A-Za-z0-9]*)
+      | ("[^"]*")
+      | ([=!<>]=|[-+*/(){}\[\],=!<>])
+    )
+""", re.VERBOSE)
+
+OPERATORS = {
+    '+': TokenType.PLUS,
+    '-': TokenType.MINUS,
+    '*': TokenType.STAR,
+    '/': TokenType.SLASH,
+    '(': TokenType.LEFT_PAREN,
+    ')': TokenType.RIGHT_PAREN,
+    '{': TokenType.LEFT_BRACE,
+    '}': TokenType.RIGHT_BRACE,
+    '[': TokenType.LEFT_BRACKET,
+    ']': TokenType.RIGHT_BRACKET,
+    ',': TokenType.COMMA,
+    '=': TokenType.EQUAL,
+    '!': TokenType.BANG,
+    '<': TokenType.LESS,
+    '>': TokenType.GREATER,
+    '==': TokenType.EQUAL_EQUAL,
+    '!=': TokenType.BANG_EQUAL,
+    '<=': TokenType.LESS_EQUAL,
+    '>=': TokenType.GREATER_EQUAL,
+}
+
+class FastScanner(Scanner):
+    """
+    A scanner that recognizes whole tokens at once with a compiled master pattern instead of one character at a time.
+    It produces exactly the same tokens, line numbers and errors as Scanner: wherever the pattern does not apply
+    (non-ASCII letters or digits, unterminated strings, unexpected characters) it hands a single token to Scanner.scan_token.
+    Identifier, keyword and operator lexemes are interned, so every occurrence of a name shares one string.
+    """
+    def scan_tokens(self):
+        source = self.source
+        end = len(source)
+        position = 0
+        line = self.line
+
+        while position < end:
+            position, line = self.scan_run(position, line)
+            if position < end:
+                position, line = self.scan_one(position, line)
+
+        self.current = position
+        self.line = line
+        self.tokens.append(Token(TokenType.EOF, '', None, line))
+        return self.tokens
+
+    # Scans tokens with the master pattern from a position until it reaches text the pattern cannot handle,
+    # and returns the position and line where it stopped.
+    def scan_run(self, position, line):
+        source = self.source
+        end = len(source)
+        append = self.tokens.append
+
+        for found in TOKEN_PATTERN.finditer(source, position):
+            if found.start() != position:
+                break
+            kind = found.lastindex
+            text = found.group(kind)
+            following = found.end()
+
+            if kind == 5:
+                append(Token(OPERATORS[text], intern(text), None, line))
+            elif kind == 3:
+                if following < end and not source[following].isascii():
+                    return found.start(kind), line
+                keyword = KEYWORDS.get(text)
+                if keyword:
+                    append(Token(keyword[0], intern(text), keyword[1], line))
+                else:
+                    text = intern(text)
+                    append(Token(TokenType.IDENTIFIER, text, text, line))
+            elif kind == 1:
+                line += text.count('\n')
+            elif kind == 2:
+                if following < end and (not source[following].isascii() or
+                                        (source[following] == '.' and following + 1 < end and not source[following + 1].isascii())):
+                    return found.start(kind), line
+                if '.' in text:
+                    append(Token(TokenType.FLOAT, text, float(text), line))
+                else:
+                    append(Token(TokenType.INTEGER, text, int(text), line))
+            else:
+                line += text.count('\n')
+                append(Token(TokenType.STRING, text, text[1:-1], line))
+            position = following
+
+        while position < end and source[position] in ' \t\r':
+            position += 1
+        return position, line
+
+    # Scans a single token at a position with the reference scanner and returns the position and line after it.
+    def scan_one(self, position, line):
+        self.start = self.current = position
+        self.line = line
+        self.scan_token()
+        return self.current, self.line
+
+# The master pattern for BytesScanner. A file read as text has its line ends translated to \n, so here \r\n and a
+# lone \r end a line too, and only spaces and tabs are blanks.
+BYTES_TOKEN_PATTERN = re.compile(rb"""
+    [ \t]*
+    (?:
+        ((?:\r\n?|\n)[ \t\r\n]*)
+      | ([0-9]+(?:\.[0-9]+)?)
+      | ([A-Za-z][A-Za-z0-9]*)
+      | ("[^"]*")
+      | ([=!<>]=|[-+*/(){}\[\],=!<>])
+    )
+""", re.VERBOSE)
+
+# Lookup tables for BytesScanner, keyed by the matched bytes. The lexemes are interned strings.
+BYTES_OPERATORS = {text.encode(): (token_type, intern(text)) for text, token_type in OPERATORS.items()}
+BYTES_KEYWORDS = {text.encode(): (token_type, intern(text), literal)
+                  for text, (token_type, literal) in KEYWORDS.items()}
+LINE_END = re.compile(rb"[\r\n]")
+DOT = ord('.')
+QUOTE = ord('"')
@@ -1,41 +1,448 @@
+import gc
+import io
+import os
 import sys
+import time
+import signal
+import contextlib
+import multiprocessing
+import argparse
 from pathlib import Path
-from scanner import Scanner
+from scanner import Scanner, FastScanner, BytesScanner, stream_tokens, map_file
 from tokens import TokenType, Token
-from parser import Parser
-from interpreter import Interpreter
+from parser import Parser, StreamingParser, ParseError
+from interpreter import Interpreter, Environment
+from expressions import depth, loop_depth, is_temporary, MAX_NESTING
+from closures import ClosureInterpreter
+from vm import VM
+from bytecode import Compiler, disassemble
+from transpiler import Transpiler, PythonInterpreter, MAX_LOOP_NESTING
+from optimizer import Optimizer
+from inference import TypeInference, StaticTypeError
+from incremental import IncrementalParser
+from quickening import QuickeningInterpreter
+from jit import TracingInterpreter, JIT_THRESHOLD
+from profiler import ProfilingInterpreter
+from cache import script_cache
+from streams import OutputWriter, InputReader, OUTPUT_BUFFER_SIZE
+
+class ScriptTimeout(Exception):
+    pass
+
+class BatchResult:
+    """
+    The outcome of one script in a batch run: its status (ok, syntax error, type error, runtime error or timeout), the error
+    message, everything it printed and how long it took.
+    """
+    def __init__(self, path, status, message, output, seconds):
+        self.path = path
+        self.status = status
+        self.message = message
+        self.output = output
+        self.seconds = seconds
 
 class Simple:
     
     had_error = False
 
-    # rins the Simple interpreter with the provided source code.    
-    def run(source: str):
+    # Execution backends selectable with --backend. The tree walker is kept as the reference implementation.
+    backends = {
+        "closure": ClosureInterpreter,
+        "tree": Interpreter,
+        "vm": VM,
+        "python": PythonInterpreter,
+        "quicken": QuickeningInterpreter,
+        "jit": TracingInterpreter,
+    }
+
+    # Scanners selectable with --scanner. Both produce the same tokens.
+    scanners = {
+        "fast": FastScanner,
+        "reference": Scanner,
+    }
+
+    # Settings, changed from the command line.
+    backend = "closure"
+    scanner = "fast"
+    optimize = True
+    optimizer_report = False
+    type_check = True
+    type_report = False
+    site_stats = False
+    jit_threshold = JIT_THRESHOLD
+    jit_log = False
+    profile = False
+    profile_output = None
+    stream = False
+    mmap = False
+    cache = True
+    output_buffer = OUTPUT_BUFFER_SIZE
+    input_file = None
+    prompts = True
+    watch_interval = 0.25
+
+    # Scans and parses the provided source code and runs the optimizer and type inference over the result (see
+    # analyze). The source is a string, or the bytes of a memory-mapped file (see run_file). When the path of the
+    # script is given and the cache is enabled, a cached program for the same source is used instead, and a freshly
+    # parsed one is stored for the next run.
+    # The garbage collector is paused while the tree is built, since full collections would otherwise repeatedly
+    # traverse all of it while it is being created. With `freeze`, for a script that is run once, everything is then
+    # moved to the permanent generation so that the collector skips the tree while it is compiled and run; the REPL
+    # and --watch parse again and again, and would never collect anything their earlier runs left behind.
+    def parse(source: str, path: Path = None, freeze: bool = False):
+        gc.disable()
         try:
-            scanner = Scanner(source)
-            tokens = scanner.scan_tokens()
-            
-            parser = Parser(tokens)
+            statements = Simple.build(source, path)
+        finally:
+            gc.enable()
+        if freeze:
+            gc.freeze()
+        return statements
+
+    def build(source: str, path: Path = None):
+        cache = script_cache(path) if path is not None and Simple.cache else None
+        variant = "optimized" if Simple.optimize else "plain"
+        cached = cache.load(source, variant) if cache else None
+        if cached is not None:
+            statements, counts, types = cached
+        else:
+            if isinstance(source, str):
+                scanner = Simple.scanners[Simple.scanner](source)
+                tokens = scanner.scan_tokens()
+                parser = Parser(tokens)
+            else:
+                # Bytes are scanned as the parser asks for tokens, so no list of all the tokens is built.
+                parser = StreamingParser(BytesScanner(source).generate_tokens())
             statements = parser.parse()
+
+            statements, counts, types = Simple.analyze(statements)
+            if cache:
+                cache.store(source, variant, (statements, counts, types))
+        return Simple.checked(statements, counts, types)
+
+    # Runs the optimizer over parsed statements unless it is disabled, and then type inference, which specializes the
+    # operations whose operand types are certain (when optimizing) and finds those that can only fail. Returns the
+    # statements with what the optimizer did and what type inference found.
+    def analyze(statements):
+        counts = (0, 0, 0)
+        if Simple.optimize:
+            optimizer = Optimizer()
+            statements = optimizer.optimize(statements)
+            counts = (optimizer.removed, optimizer.hoisted, optimizer.reused)
+        inference = TypeInference(specialize=Simple.optimize)
+        statements = inference.infer(statements)
+        types = (inference.errors, inference.warnings, inference.variables, inference.specialized, inference.operations)
+        return statements, counts, types
+
+    # Prints the reports asked for and returns the statements, or raises a StaticTypeError for the type errors found
+    # unless type checking is disabled. Operations that can only fail but may never run are printed as warnings.
+    def checked(statements, counts, types):
+        if Simple.optimize and Simple.optimizer_report:
+            Simple.optimizer_summary(*counts)
+        errors, warnings, variables, specialized, operations = types
+        if Simple.type_report:
+            Simple.type_summary(variables, specialized, operations)
+        if Simple.type_check:
+            Simple.type_warnings(warnings)
+            if errors:
+                raise StaticTypeError(errors)
+        return statements
+
+    # Prints what the optimizer did, for --optimizer-report.
+    def optimizer_summary(removed, hoisted, reused):
+        print(f"Optimizer removed {removed} nodes, hoisted {hoisted} loop-invariant expressions "
+              f"and reused {reused} common subexpressions.", file=sys.stderr)
+
+    # Prints the inferred type of every variable and how many operations were specialized, for --type-report.
+    def type_summary(variables, specialized, operations):
+        print(f"Type inference specialized {specialized} of {operations} operations.", file=sys.stderr)
+        for name, kinds in variables.items():
+            if not is_temporary(name):
+                print(f"  {name}: {'any' if kinds is None else ' or '.join(sorted(kinds)) or 'none'}", file=sys.stderr)
+
+    # Prints the operations type inference found that can only fail, in code that may never run, to stderr.
+    def type_warnings(warnings):
+        for line, message in warnings:
+            print(f"Type warning on line {line}: {message}", file=sys.stderr)
+
+    # Prints the errors type inference found.
+    def type_errors(error):
+        for line, message in error.errors:
+            print(f"Type error on line {line}: {message}")
+        Simple.had_error = True
+
+    # Returns an instance of the selected backend whose PRINT and INPUT go through a buffered writer and a reader
+    # configured from the settings, together with the writer, which must be flushed when the program ends, and the
+    # reader, which must be closed then so the --input file is not left open.
+    # With --profile the profiling tree walker is used whatever the backend.
+    def interpreter():
+        interpreter = ProfilingInterpreter() if Simple.profile else Simple.create_backend()
+        writer = OutputWriter(buffer_size=Simple.output_buffer)
+        file = Path(Simple.input_file).open() if Simple.input_file is not None else None
+        reader = InputReader(writer, file, Simple.prompts)
+        interpreter.print = writer.print
+        interpreter.input = reader.input
+        return interpreter, writer, reader
+
+    # Returns a new instance of the selected backend, with the JIT settings applied to the jit backend.
+    def create_backend():
+        interpreter = Simple.backends[Simple.backend]()
+        if isinstance(interpreter, TracingInterpreter):
+            interpreter.threshold = Simple.jit_threshold
+            interpreter.log = sys.stderr if Simple.jit_log else None
+        return interpreter
+
+    # Returns the interpreter to run statements with. The compiled backends and the quickening interpreter recurse
+    # once per level of nesting, so statements nested deeper than MAX_NESTING are run by a tree walker that shares
+    # the interpreter's variables and streams instead. So are, with the python backend, loops nested deeper than
+    # Python can compile.
+    def walker_if_deep(interpreter, statements):
+        if type(interpreter) in (Interpreter, ProfilingInterpreter, TracingInterpreter):
+            return interpreter
+        deep = depth(statements) > MAX_NESTING
+        if type(interpreter) is PythonInterpreter:
+            deep = deep or loop_depth(statements) > MAX_LOOP_NESTING
+        if not deep:
+            return interpreter
+        walker = Interpreter(interpreter.environment)
+        walker.print = interpreter.print
+        walker.input = interpreter.input
+        return walker
+
+    # Prints the statistics a finished run was asked for to stderr: the profile, or the quickening site table.
+    def report(interpreter, source: str):
+        if Simple.profile:
+            if not isinstance(source, str):
+                # The bytes of a mapped file, decoded with their line ends translated as read_text would.
+                source = str(source, "utf-8").replace("\r\n", "\n").replace("\r", "\n")
+            interpreter.report(source)
+            if Simple.profile_output is not None:
+                interpreter.write_collapsed(Simple.profile_output, source)
+        elif Simple.site_stats and hasattr(interpreter, "report"):
+            interpreter.report()
+
+    # rins the Simple interpreter with the provided source code. When an IncrementalParser is given, the source is
+    # parsed with it instead of from scratch. `freeze` is passed on to parse.
+    def run(source: str, path: Path = None, document: IncrementalParser = None, freeze: bool = False):
+        try:
+            statements = Simple.parse(source, path, freeze) if document is None else Simple.reparse(document, source)
             
-            interpreter = Interpreter()
-            interpreter.interpret(statements)
+            interpreter, writer, reader = Simple.interpreter()
+            try:
+                Simple.walker_if_deep(interpreter, statements).interpret(statements)
+            finally:
+                writer.flush()
+                reader.close()
+                Simple.report(interpreter, source)
             
         except SyntaxError as e:
             print(f"Syntax error: {e}")
             Simple.had_error = True
+        except StaticTypeError as e:
+            Simple.type_errors(e)
         except RuntimeError as e:
             print(f"Runtime error: {e}")
             Simple.had_error = True
     
-    # Runs a Simple script from a file. If an error occurs, it exits with code 65.
+    # Brings an IncrementalParser up to date with a new version of the source, reports to stderr how much of it was
+    # scanned and parsed again, and analyzes the statements like build.
+    def reparse(document: IncrementalParser, source: str):
+        start = time.perf_counter()
+        statements = document.update(source)
+        print(f"Scanned {document.scanned} of {len(source)} characters and parsed {document.parsed} of "
+              f"{len(statements)} statements in {(time.perf_counter() - start) * 1000:.1f} ms.", file=sys.stderr)
+        return Simple.checked(*Simple.analyze(statements))
+
+    # Runs a Simple script from a file, and again every time the file changes, until interrupted. The file is parsed
+    # with an IncrementalParser, so after an edit only the statements around the change are scanned and parsed again.
+    # Errors are reported and the file is watched for the next change.
+    def watch(path: Path):
+        document = IncrementalParser(Simple.scanners[Simple.scanner])
+        modified = None
+        try:
+            while True:
+                try:
+                    stamp = path.stat().st_mtime_ns
+                except FileNotFoundError:
+                    # Some editors save by replacing the file, which is briefly missing.
+                    stamp = modified
+                if stamp != modified:
+                    modified = stamp
+                    try:
+                        Simple.run(path.read_text(), path, document)
+                    except ParseError as e:
+                        print(f"Syntax error: {e}")
+                    except Exception as e:
+                        print(f"Error: {e}")
+                    sys.stdout.flush()
+                time.sleep(Simple.watch_interval)
+        except KeyboardInterrupt:
+            pass
+
+    # Prints the bytecode the VM backend would run for the provided source code, without running it.
+    def dump_bytecode(source: str):
+        try:
+            statements = Simple.parse(source)
+            print(disassemble(Compiler(Environment()).compile(statements)))
+        except SyntaxError as e:
+            print(f"Syntax error: {e}")
+            Simple.had_error = True
+        except StaticTypeError as e:
+            Simple.type_errors(e)
+
+    # Prints the Python source the python backend would compile for the provided source code, without running it.
+    def dump_python(source: str):
+        try:
+            statements = Simple.parse(source)
+            print(Transpiler(Environment()).transpile(statements), end="")
+        except SyntaxError as e:
+            print(f"Syntax error: {e}")
+            Simple.had_error = True
+        except StaticTypeError as e:
+            Simple.type_errors(e)
+
+    # Runs a Simple script from a file while it is being read. Each top-level statement is executed as soon as it has
+    # been parsed, so memory use depends on the largest statement rather than on the size of the file. Type inference
+    # follows the statements as they arrive, so a type error stops the script before the statement that has it.
+    def run_stream(path: Path):
+        try:
+            with path.open() as file:
+                parser = StreamingParser(stream_tokens(file, Simple.scanners[Simple.scanner]))
+                interpreter, writer, reader = Simple.interpreter()
+                optimizer = Optimizer()
+                inference = TypeInference(specialize=Simple.optimize)
+                warned = 0
+                try:
+                    for statement in parser.statements():
+                        statements = [statement]
+                        if Simple.optimize:
+                            statements = optimizer.optimize(statements)
+                        statements = inference.infer(statements)
+                        if Simple.type_check:
+                            Simple.type_warnings(inference.warnings[warned:])
+                            warned = len(inference.warnings)
+                            if inference.errors:
+                                raise StaticTypeError(inference.errors)
+                        Simple.walker_if_deep(interpreter, statements).interpret(statements)
+                finally:
+                    writer.flush()
+                    reader.close()
+                    if Simple.optimize and Simple.optimizer_report:
+                        Simple.optimizer_summary(optimizer.removed, optimizer.hoisted, optimizer.reused)
+                    if Simple.type_report:
+                        Simple.type_summary(inference.variables, inference.specialized, inference.operations)
+                    Simple.report(interpreter, "")
+
+        except SyntaxError as e:
+            print(f"Syntax error: {e}")
+            Simple.had_error = True
+        except StaticTypeError as e:
+            Simple.type_errors(e)
+        except RuntimeError as e:
+            print(f"Runtime error: {e}")
+            Simple.had_error = True
+
+    # Runs a Simple script from a file. If an error occurs, it exits with code 65. With --mmap the file is mapped into
+    # memory and its bytes are scanned directly, so neither a decoded copy of it nor its token list is ever held.
     def run_file(filename: str):
         path = Path(filename).absolute()
-        source = path.read_text()
-        Simple.run(source)
+        if Simple.stream:
+            Simple.run_stream(path)
+        elif Simple.mmap:
+            with map_file(path) as source:
+                Simple.run(source, path, freeze=True)
+        else:
+            source = path.read_text()
+            Simple.run(source, path, freeze=True)
         if Simple.had_error:
             sys.exit(65)
 
+    # Settings copied into batch worker processes.
+    def settings():
+        return {name: getattr(Simple, name) for name in ("backend", "scanner", "optimize", "type_check", "cache", "jit_threshold")}
+
+    def configure(settings):
+        for name, value in settings.items():
+            setattr(Simple, name, value)
+
+    # Runs one script for the batch runner with its output captured and no input available, stopping it after
+    # `timeout` seconds, and returns a BatchResult.
+    def run_captured(filename: str, timeout: float):
+        def expire(signum, frame):
+            raise ScriptTimeout()
+
+        output = io.StringIO()
+        status, message = "ok", ""
+        start = time.perf_counter()
+        previous = signal.signal(signal.SIGALRM, expire)
+        try:
+            path = Path(filename).absolute()
+            source = path.read_text()
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+                sys.stdin = io.StringIO()
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+                try:
+                    statements = Simple.parse(source, path, freeze=True)
+                    interpreter = Simple.create_backend()
+                    Simple.walker_if_deep(interpreter, statements).interpret(statements)
+                finally:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+        except ScriptTimeout:
+            status, message = "timeout", f"Stopped after {timeout:g}s."
+        except (SyntaxError, ParseError) as e:
+            status, message = "syntax error", str(e)
+        except StaticTypeError as e:
+            status, message = "type error", "; ".join(f"line {line}: {text}" for line, text in e.errors)
+        except EOFError:
+            status, message = "runtime error", "No input available."
+        except RecursionError:
+            status, message = "runtime error", "Maximum recursion depth exceeded."
+        except Exception as e:
+            status, message = "runtime error", str(e) if isinstance(e, RuntimeError) else f"{type(e).__name__}: {e}"
+        finally:
+            signal.signal(signal.SIGALRM, previous)
+            gc.unfreeze()
+        return BatchResult(filename, status, message, output.getvalue(), time.perf_counter() - start)
+
+    # Runs many scripts, and every .txt file under any directory given, in a pool of `jobs` worker processes
+    # (one per core by default). Prints one status line per script and a throughput summary, and exits with code 65
+    # if any script did not finish successfully. Captured output is written to `output_directory` when given.
+    def run_batch(paths, jobs=None, timeout=10.0, output_directory=None):
+        files = []
+        for name in paths:
+            path = Path(name)
+            if path.is_dir():
+                files.extend(str(file) for file in sorted(path.rglob("*.txt")))
+            else:
+                files.append(name)
+        if not files:
+            print("No scripts to run.", file=sys.stderr)
+            sys.exit(65)
+        root = os.path.commonpath([str(Path(file).absolute().parent) for file in files])
+
+        counts = {"ok": 0, "syntax error": 0, "type error": 0, "runtime error": 0, "timeout": 0}
+        jobs = jobs or os.cpu_count() or 1
+        start = time.perf_counter()
+        with multiprocessing.Pool(jobs, initializer=Simple.configure, initargs=(Simple.settings(),)) as pool:
+            tasks = ((file, timeout) for file in files)
+            for result in pool.imap_unordered(Simple.run_batch_task, tasks, chunksize=4 if len(files) > 16 * jobs else 1):
+                counts[result.status] += 1
+                line = f"{result.status:<14} {result.seconds:8.3f}s  {result.path}"
+                print(f"{line}  {result.message}" if result.message else line)
+                if output_directory is not None:
+                    target = Path(output_directory) / Path(result.path).absolute().relative_to(root)
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    target.with_name(target.name + ".out").write_text(result.output)
+        elapsed = time.perf_counter() - start
+
+        print(f"{len(files)} scripts in {elapsed:.2f}s with {jobs} workers ({len(files) / elapsed:.1f} scripts/s): "
+              + ", ".join(f"{status}: {count}" for status, count in counts.items()))
+        if counts["ok"] != len(files):
+            sys.exit(65)
+
+    def run_batch_task(task):
+        return Simple.run_captured(*task)
+
     # A simple Read-Eval-Print Loop (REPL) for the Simple interpreter.   
     def repl():
         print("Simple REPL. type 'exit' to quit.")
@@ -56,7 +463,103 @@ class Simple:
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        Simple.run_file(sys.argv[1])
+    arguments = argparse.ArgumentParser(description="Run a Simple script, or start the REPL when no file is given.")
+    arguments.add_argument("file", nargs="*", help="the script to run, or with --batch the scripts and directories")
+    arguments.add_argument("--backend", choices=Simple.backends, default="closure",
+                           help="execution engine: compiled closures (default), the reference tree walker, "
+                                "the bytecode VM, transpiled Python, a type-specializing tree walker or a tree walker "
+                                "that compiles hot WHILE loops")
+    arguments.add_argument("--disassemble", action="store_true",
+                           help="print the VM bytecode for the file instead of running it")
+    arguments.add_argument("--dump-python", action="store_true",
+                           help="print the Python source generated by the python backend instead of running it")
+    arguments.add_argument("--no-optimize", dest="optimize", action="store_false",
+                           help="skip constant folding, dead-branch elimination and expression sharing")
+    arguments.add_argument("--optimizer-report", action="store_true",
+                           help="print how many AST nodes the optimizer removed and how many expressions it shared to stderr")
+    arguments.add_argument("--no-type-check", dest="type_check", action="store_false",
+                           help="run scripts even when type inference finds operations that can only fail")
+    arguments.add_argument("--type-report", action="store_true",
+                           help="print the inferred type of every variable and how many operations were specialized to stderr")
+    arguments.add_argument("--site-stats", action="store_true",
+                           help="with --backend quicken, print per-site specialization and guard hit/miss counts to stderr")
+    arguments.add_argument("--jit-threshold", type=int, default=JIT_THRESHOLD, metavar="N",
+                           help=f"with --backend jit, compile a WHILE loop after N iterations (default: {JIT_THRESHOLD})")
+    arguments.add_argument("--jit-log", action="store_true",
+                           help="with --backend jit, report every loop compiled and deoptimized to stderr")
+    arguments.add_argument("--scanner", choices=Simple.scanners, default="fast",
+                           help="tokenizer: whole-token pattern matching (default) or the reference character-by-character scanner")
+    arguments.add_argument("--stream", action="store_true",
+                           help="run each top-level statement as soon as it is parsed instead of parsing the whole file first")
+    arguments.add_argument("--mmap", action="store_true",
+                           help="map the file into memory and scan its bytes instead of reading it into a string first")
+    arguments.add_argument("--watch", action="store_true",
+                           help="run the file again whenever it changes, scanning and parsing only the edited statements")
+    arguments.add_argument("--no-cache", dest="cache", action="store_false",
+                           help="always scan and parse the file instead of using the __simplecache__ directory beside it")
+    arguments.add_argument("--clear-cache", action="store_true",
+                           help="delete the __simplecache__ directory beside the file (or the current directory) first")
+    arguments.add_argument("--batch", action="store_true",
+                           help="run every given script, and every .txt file in the given directories, in parallel")
+    arguments.add_argument("--jobs", type=int, default=None,
+                           help="with --batch, the number of worker processes (default: one per core)")
+    arguments.add_argument("--timeout", type=float, default=10.0,
+                           help="with --batch, the seconds each script may run before it is stopped (default: 10)")
+    arguments.add_argument("--batch-output", metavar="DIRECTORY",
+                           help="with --batch, write each script's captured output to DIRECTORY/<script>.out")
+    arguments.add_argument("--output-buffer", type=int, default=OUTPUT_BUFFER_SIZE, metavar="SIZE",
+                           help=f"characters of output collected before writing it out (default: {OUTPUT_BUFFER_SIZE}, 0 writes every line)")
+    arguments.add_argument("--input", dest="input_file", metavar="FILE",
+                           help="read the answers to INPUT from FILE instead of stdin")
+    arguments.add_argument("--no-prompts", dest="prompts", action="store_false",
+                           help="do not print INPUT prompts")
+    arguments.add_argument("--profile", action="store_true",
+                           help="run with the profiling tree walker and print per-line counts and times, WHILE "
+                                "iterations and IF branch counts to stderr")
+    arguments.add_argument("--profile-output", metavar="FILE",
+                           help="with --profile, also write collapsed stacks for flamegraph.pl or speedscope to FILE")
+    args = arguments.parse_args()
+    if len(args.file) > 1 and not args.batch:
+        arguments.error("more than one file given; use --batch to run several scripts")
+    if args.watch and (args.batch or args.stream or not args.file):
+        arguments.error("--watch needs one file and cannot be combined with --batch or --stream")
+    file = args.file[0] if args.file else None
+    Simple.backend = args.backend
+    Simple.scanner = args.scanner
+    Simple.optimize = args.optimize
+    Simple.optimizer_report = args.optimizer_report
+    Simple.type_check = args.type_check
+    Simple.type_report = args.type_report
+    Simple.site_stats = args.site_stats
+    Simple.jit_threshold = args.jit_threshold
+    Simple.jit_log = args.jit_log
+    Simple.profile = args.profile
+    Simple.profile_output = args.profile_output
+    Simple.stream = args.stream
+    Simple.mmap = args.mmap
+    Simple.cache = args.cache
+    Simple.output_buffer = args.output_buffer
+    Simple.input_file = args.input_file
+    Simple.prompts = args.prompts
+
+    if args.clear_cache:
+        script_cache(Path(file or "script").absolute()).clear()
+        if not file:
+            sys.exit(0)
+
+    if args.batch:
+        Simple.run_batch(args.file, args.jobs, args.timeout, args.batch_output)
+    elif args.disassemble and file:
+        Simple.dump_bytecode(Path(file).read_text())
+        if Simple.had_error:
+            sys.exit(65)
+    elif args.dump_python and file:
+        Simple.dump_python(Path(file).read_text())
+        if Simple.had_error:
+            sys.exit(65)
+    elif args.watch:
+        Simple.watch(Path(file).absolute())
+    elif file:
+        Simple.run_file(file)
     else:
-        Simple.repl()
\ No newline at end of file
+        Simple.repl()
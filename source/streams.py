@@ -0,0 +1,73 @@
+""" Buffered output and pre-read input for PRINT and INPUT, used instead of the builtin print() and input(). """
+
+import sys
+
+# Bytes of output collected before it is written out, by default.
+OUTPUT_BUFFER_SIZE = 1 << 16
+
+class OutputWriter:
+    """
+    Collects printed lines and writes them to a file in bulk: when `buffer_size` characters have built up, before a
+    prompt is shown and when flush is called at exit. A buffer_size of 0 writes every line as soon as it is printed.
+    """
+    def __init__(self, file=None, buffer_size=OUTPUT_BUFFER_SIZE):
+        self.file = file if file is not None else sys.stdout
+        self.buffer_size = buffer_size
+        self.parts = []
+        self.size = 0
+
+    # Prints a value the way the builtin print() does, followed by a newline.
+    def print(self, value):
+        self.write(f"{value}\n")
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    # Writes out everything collected so far.
+    def flush(self):
+        if self.parts:
+            self.file.write(''.join(self.parts))
+            self.parts = []
+            self.size = 0
+        self.file.flush()
+
+class InputReader:
+    """
+    Answers INPUT from a file, or from stdin. Input that is not an interactive terminal is read in full on first use
+    and handed out line by line; a terminal is read one line at a time. Prompts go through the OutputWriter, which is
+    flushed first so the prompt appears before the program waits, and are skipped entirely when `prompts` is False.
+    Running out of input raises EOFError, like the builtin input().
+    """
+    def __init__(self, writer, file=None, prompts=True):
+        self.writer = writer
+        self.file = file if file is not None else sys.stdin
+        self.prompts = prompts
+        self.lines = None
+        self.position = 0
+
+    def input(self, prompt):
+        if self.prompts:
+            self.writer.write(prompt)
+            self.writer.flush()
+        if self.lines is None:
+            if self.file.isatty():
+                line = self.file.readline()
+                if not line:
+                    raise EOFError("EOF when reading a line")
+                return line[:-1] if line.endswith('\n') else line
+            self.lines = self.file.read().split('\n')
+            if self.lines[-1] == '':
+                self.lines.pop()
+        if self.position >= len(self.lines):
+            raise EOFError("EOF when reading a line")
+        line = self.lines[self.position]
+        self.position += 1
+        return line
+
+    # Closes the file answers are read from, unless it is stdin.
+    def close(self):
+        if self.file is not sys.stdin:
+            self.file.close()
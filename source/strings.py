@@ -0,0 +1,111 @@
+""" String values that make repeated concatenation with + amortized linear instead of quadratic. """
+
+# Concatenations that produce a string shorter than this stay plain Python strings.
+ROPE_THRESHOLD = 256
+
+class Rope:
+    """
+    An immutable string built from pieces, produced by + once a string grows past ROPE_THRESHOLD.
+    Appending to the newest rope over a piece list extends that list in place, so `s = s + ", " + item` in a loop is
+    amortized O(1) per step; older ropes over the same list only see their own prefix of it. A rope is joined into a
+    plain str, once, when it is printed, compared or passed to INPUT.
+    """
+    __slots__ = ('parts', 'count', 'length', 'text')
+
+    def __init__(self, parts, count, length):
+        self.parts = parts
+        self.count = count
+        self.length = length
+        self.text = None
+
+    # Returns a rope for this string followed by `other`, which must be a str or a Rope.
+    def append(self, other):
+        if type(other) is Rope:
+            other = str(other)
+        elif type(other) is not str:
+            return str(self) + other
+        parts = self.parts
+        if len(parts) != self.count:
+            parts = parts[:self.count]
+        parts.append(other)
+        return Rope(parts, self.count + 1, self.length + len(other))
+
+    def __str__(self):
+        if self.text is None:
+            parts = self.parts
+            self.text = ''.join(parts if len(parts) == self.count else parts[:self.count])
+        return self.text
+
+    def __repr__(self):
+        return repr(str(self))
+
+    def __len__(self):
+        return self.length
+
+    def __bool__(self):
+        return self.length > 0
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __add__(self, other):
+        return self.append(other)
+
+    def __radd__(self, other):
+        return concat(other, str(self))
+
+    # Every other operation behaves exactly like it does on the joined string, including the errors it raises.
+    def __eq__(self, other):
+        return str(self) == plain(other)
+
+    def __ne__(self, other):
+        return str(self) != plain(other)
+
+    def __lt__(self, other):
+        return str(self) < plain(other)
+
+    def __le__(self, other):
+        return str(self) <= plain(other)
+
+    def __gt__(self, other):
+        return str(self) > plain(other)
+
+    def __ge__(self, other):
+        return str(self) >= plain(other)
+
+    def __mul__(self, other):
+        return str(self) * plain(other)
+
+    def __rmul__(self, other):
+        return other * str(self)
+
+    def __sub__(self, other):
+        return str(self) - plain(other)
+
+    def __rsub__(self, other):
+        return other - str(self)
+
+    def __truediv__(self, other):
+        return str(self) / plain(other)
+
+    def __rtruediv__(self, other):
+        return other / str(self)
+
+    def __neg__(self):
+        return -str(self)
+
+# Returns a value with any Rope turned into a plain str.
+def plain(value):
+    return str(value) if type(value) is Rope else value
+
+# Implements Simple's + operator. Strings that grow past ROPE_THRESHOLD become ropes; everything else is Python's +.
+def concat(left, right):
+    if type(left) is Rope:
+        return left.append(right)
+    if type(left) is str and type(right) in TEXT_TYPES:
+        length = len(left) + len(right)
+        if length >= ROPE_THRESHOLD:
+            return Rope([left, str(right)], 2, length)
+    return left + right
+
+TEXT_TYPES = (str, Rope)
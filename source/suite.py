@@ -0,0 +1,275 @@
+""" A benchmark suite that times scanning, parsing, analyzing and interpreting separately over generated workloads.
+Run with `python3 source/suite.py [--json results.json] [--baseline baseline.json]`. """
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+from scanner import FastScanner
+from parser import Parser
+from optimizer import count_nodes
+from streams import OutputWriter
+from benchmark import generated_source
+from simple import Simple
+
+class Workload:
+    """
+    A generated script together with the answers its INPUTs get and the number of loop iterations it runs, which is
+    what the interpreter's operations per second are counted in.
+    """
+    def __init__(self, source, inputs=(), iterations=1):
+        self.source = source
+        self.inputs = list(inputs)
+        self.iterations = iterations
+
+# Long chains of arithmetic, with parentheses nested `depth` levels deep, evaluated in a loop.
+def deep_arithmetic(scale, seed):
+    rng = random.Random(seed)
+    depth = 40
+    lines = ["x = 3", "i = 0", f"WHILE (i < {2000 * scale}) {{"]
+    for row in range(5):
+        expression = "x"
+        for _ in range(depth):
+            operator = rng.choice("+-*")
+            expression = f"({expression} {operator} {rng.randint(1, 9)})"
+        lines.append(f"    r{row} = {expression} / {rng.randint(1, 9)}")
+    lines += ["    i = i + 1", "}", "PRINT r0"]
+    return Workload("\n".join(lines) + "\n", iterations=2000 * scale)
+
+# A WHILE loop that counts up with a little arithmetic in its body.
+def while_counter(scale, seed):
+    count = 100_000 * scale
+    source = f"""total = 0
+i = 0
+WHILE (i < {count}) {{
+    total = total + i * 2 - 1
+    i = i + 1
+}}
+PRINT total
+"""
+    return Workload(source, iterations=count)
+
+# shopping.txt with its INPUT answered by a script: `count` items, then an empty line to stop.
+def string_building(scale, seed):
+    rng = random.Random(seed)
+    count = 20_000 * scale
+    items = [rng.choice(["milk", "eggs", "bread", "apples", "coffee"]) + str(index) for index in range(count)]
+    source = """isRunning = TRUE
+shoppingList = ""
+
+WHILE (isRunning == TRUE) {
+    item = INPUT("Add an item: ")
+    IF (item == "") {
+        isRunning = FALSE
+    } ELSE {
+        shoppingList = shoppingList + ", " + item
+    }
+}
+
+PRINT shoppingList
+"""
+    return Workload(source, [*items, ""], iterations=count + 1)
+
+# IF statements nested `depth` deep inside a loop, half of them taken on each iteration.
+def nested_ifs(scale, seed):
+    rng = random.Random(seed)
+    depth = 30
+    count = 5_000 * scale
+    lines = ["hits = 0", "i = 0", f"WHILE (i < {count}) {{", "    i = i + 1"]
+    for level in range(depth):
+        indent = "    " * (level + 1)
+        lines.append(f"{indent}IF (i - i / {rng.randint(2, 5)} * 0 >= {level}) {{")
+        lines.append(f"{indent}    hits = hits + 1")
+    for level in reversed(range(depth)):
+        lines.append("    " * (level + 1) + "} ELSE {")
+        lines.append("    " * (level + 2) + "hits = hits - 1")
+        lines.append("    " * (level + 1) + "}")
+    lines += ["}", "PRINT hits"]
+    return Workload("\n".join(lines) + "\n", iterations=count)
+
+# WHILE loops nested `depth` deep that each run once, around an innermost loop that counts up and turns a variable
+# from an integer into a float. Type inference follows every loop until its variable types are stable, so this
+# mostly tests how the analysis scales with nesting.
+def nested_loops(scale, seed):
+    depth = 16
+    count = 20_000 * scale
+    lines = ["x = 0"]
+    for level in range(depth):
+        indent = "    " * level
+        lines += [f"{indent}i{level} = 0", f"{indent}WHILE (i{level} < 1) {{", f"{indent}    i{level} = i{level} + 1"]
+    indent = "    " * depth
+    lines += [f"{indent}j = 0", f"{indent}WHILE (j < {count}) {{", f"{indent}    x = x + 0.5", f"{indent}    j = j + 1",
+              f"{indent}}}"]
+    for level in reversed(range(depth)):
+        lines.append("    " * level + "}")
+    lines.append("PRINT x")
+    return Workload("\n".join(lines) + "\n", iterations=count + depth)
+
+# An array filled by APPEND in a loop, then run through element-wise arithmetic, comparisons and reductions. The
+# operations are counted per element, since each element-wise operation touches every element in one bulk step.
+def array_bulk(scale, seed):
+    size = 10_000 * scale
+    rounds = 100
+    source = f"""values = []
+i = 0
+WHILE (i < {size}) {{
+    APPEND(values, i)
+    i = i + 1
+}}
+total = 0
+j = 0
+WHILE (j < {rounds}) {{
+    scaled = values * 2 + j
+    total = total + SUM(scaled) - MAX(scaled) + MIN(values - j)
+    flags = scaled > {size}
+    j = j + 1
+}}
+PRINT total
+"""
+    return Workload(source, iterations=size + rounds * size)
+
+# A multi-megabyte script made of many short loops, mostly a test of the scanner and the parser.
+def large_source(scale, seed):
+    source = generated_source(2_000_000 * scale)
+    return Workload(source, iterations=source.count("WHILE") * 10)
+
+WORKLOADS = {
+    "deep_arithmetic": deep_arithmetic,
+    "while_counter": while_counter,
+    "string_building": string_building,
+    "nested_ifs": nested_ifs,
+    "nested_loops": nested_loops,
+    "array_bulk": array_bulk,
+    "large_source": large_source,
+}
+
+# Shortest time a single timing should cover; faster phases are called several times per timing.
+MIN_TIMING = 0.05
+
+# Returns the fastest of `repeat` timings of `function`, per call, and the peak memory it allocated in one more,
+# traced call.
+def measure(function, repeat):
+    start = time.perf_counter()
+    function()
+    first = time.perf_counter() - start
+    calls = max(1, int(MIN_TIMING / first)) if first > 0 else 1000
+    best = first
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        best = min(best, (time.perf_counter() - start) / calls)
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+# Runs one workload's statements with the chosen backend, output discarded and INPUT answered from the workload.
+def interpret(workload, statements, backend):
+    interpreter = Simple.backends[backend]()
+    with open(os.devnull, "w") as devnull:
+        writer = OutputWriter(devnull)
+        answers = iter(workload.inputs)
+        interpreter.print = writer.print
+        interpreter.input = lambda prompt: next(answers)
+        interpreter.interpret(statements)
+        writer.flush()
+
+# Times every phase of every workload (scanning, parsing, the optimizer with type inference, and running the parsed
+# statements) and returns the results as a JSON-compatible dict.
+def run_suite(names, scale=1, seed=1, repeat=3, backend="closure"):
+    results = {}
+    for name in names:
+        workload = WORKLOADS[name](scale, seed)
+        tokens = FastScanner(workload.source).scan_tokens()
+        statements = Parser(tokens).parse()
+        nodes = count_nodes(statements)
+
+        phases = (
+            ("scan", lambda: FastScanner(workload.source).scan_tokens(), len(tokens)),
+            ("parse", lambda: Parser(tokens).parse(), nodes),
+            ("analyze", lambda: Simple.analyze(statements), nodes),
+            ("interpret", lambda: interpret(workload, statements, backend), workload.iterations),
+        )
+        results[name] = {}
+        for phase, function, operations in phases:
+            seconds, peak = measure(function, repeat)
+            results[name][phase] = {
+                "seconds": seconds,
+                "operations": operations,
+                "ops_per_second": operations / seconds if seconds else 0.0,
+                "peak_bytes": peak,
+            }
+    return {
+        "python": platform.python_version(),
+        "backend": backend,
+        "scale": scale,
+        "seed": seed,
+        "results": results,
+    }
+
+# Returns (workload, phase, change) for every phase that got more than `threshold` slower than in the baseline.
+def regressions(current, baseline, threshold):
+    found = []
+    for name, phases in current["results"].items():
+        for phase, result in phases.items():
+            before = baseline.get("results", {}).get(name, {}).get(phase)
+            if before and before["seconds"] > 0:
+                change = result["seconds"] / before["seconds"] - 1
+                if change > threshold:
+                    found.append((name, phase, change))
+    return found
+
+# Prints the results as a table, with the change against the baseline when there is one.
+def report(current, baseline=None, threshold=0.1, file=sys.stdout):
+    print(f"{'workload':<16}  {'phase':<9}  {'seconds':>9}  {'ops/s':>12}  {'peak MB':>8}  {'vs baseline':>11}", file=file)
+    for name, phases in current["results"].items():
+        for phase, result in phases.items():
+            comparison = ""
+            before = (baseline or {}).get("results", {}).get(name, {}).get(phase)
+            if before and before["seconds"] > 0:
+                change = result["seconds"] / before["seconds"] - 1
+                comparison = f"{100 * change:+.1f}%" + (" REGRESSION" if change > threshold else "")
+            print(f"{name:<16}  {phase:<9}  {result['seconds']:>9.4f}  {result['ops_per_second']:>12.0f}  "
+                  f"{result['peak_bytes'] / 1e6:>8.2f}  {comparison:>11}", file=file)
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Time the scanner, parser and interpreter over generated workloads.")
+    arguments.add_argument("workloads", nargs="*", metavar="WORKLOAD",
+                           help=f"workloads to run: {', '.join(WORKLOADS)} (default: all)")
+    arguments.add_argument("--scale", type=int, default=1, help="multiplies the size of every workload")
+    arguments.add_argument("--seed", type=int, default=1, help="seed for the workload generator")
+    arguments.add_argument("--repeat", type=int, default=3, help="timed runs per phase; the fastest is reported")
+    arguments.add_argument("--backend", choices=Simple.backends, default="closure", help="backend for the interpret phase")
+    arguments.add_argument("--json", metavar="FILE", help="write the results to FILE")
+    arguments.add_argument("--baseline", metavar="FILE", help="compare against results saved earlier with --json")
+    arguments.add_argument("--threshold", type=float, default=0.1,
+                           help="slowdown against the baseline reported as a regression (default: 0.1, i.e. 10%%)")
+    args = arguments.parse_args()
+    for name in args.workloads:
+        if name not in WORKLOADS:
+            arguments.error(f"unknown workload '{name}'")
+
+    current = run_suite(args.workloads or list(WORKLOADS), args.scale, args.seed, args.repeat, args.backend)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    report(current, baseline, args.threshold)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(current, file, indent=2)
+
+    if baseline is not None:
+        found = regressions(current, baseline, args.threshold)
+        for name, phase, change in found:
+            print(f"Regression: {name} {phase} is {100 * change:.1f}% slower than the baseline.", file=sys.stderr)
+        if found:
+            sys.exit(1)
@@ -41,6 +41,9 @@ class TokenType(Enum):
     RIGHT_PAREN = ')'
     LEFT_BRACE = '{'
     RIGHT_BRACE = '}'
+    LEFT_BRACKET = '['
+    RIGHT_BRACKET = ']'
+    COMMA = ','
     
 
     #special tokens
@@ -50,7 +53,10 @@ class TokenType(Enum):
 class Token:
     """
     Represents a token in the source code.
+    Tokens use __slots__ instead of a per-instance __dict__, which keeps the token list of a large script small.
     """
+    __slots__ = ('type', 'lexeme', 'literal', 'line')
+
     def __init__(
             self,
             typ: TokenType,
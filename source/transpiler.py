@@ -0,0 +1,233 @@
+import re
+from expressions import *
+from interpreter import Environment, UNDEFINED
+from resolver import Resolver
+from strings import concat
+from arrays import Array, BUILTINS, make_array, index, assign_index
+
+# Every WHILE becomes a Python while loop, and CPython refuses to compile more than 20 statically nested blocks,
+# counting the try statement around the generated code. Programs with loops nested deeper than this are run by the
+# tree walker instead.
+MAX_LOOP_NESTING = 18
+
+class Transpiler:
+    """
+    Translates parsed statements into the source of a Python function, so WHILE, IF and arithmetic run as CPython bytecode.
+    Simple variables become Python locals; the generated function loads them from and stores them back into the
+    environment's slot-indexed value list.
+    """
+    def __init__(self, environment):
+        self.environment = environment
+        self.lines = []
+        self.names = {}
+
+    # Returns the Python source of a function `run(_values, _print, _input)` that executes the statements.
+    def transpile(self, statements):
+        self.slots = Resolver(self.environment).resolve(statements)
+        body = []
+        self.lines = body
+        self.block(statements, 2)
+
+        self.lines = [
+            "def run(_values, _print, _input):",
+        ]
+        for name, python_name in self.names.items():
+            self.emit(f"if _values[{self.slots[name]}] is not _UNDEFINED: {python_name} = _values[{self.slots[name]}]", 1)
+        self.emit("try:", 1)
+        self.lines.extend(body)
+        self.emit("except UnboundLocalError as error:", 1)
+        self.emit("raise RuntimeError(f\"Undefined variable '{_undefined(error, _names)}'.\") from None", 2)
+        self.emit("finally:", 1)
+        self.emit("_export(_values, locals(), _slots)", 2)
+        return "\n".join(self.lines) + "\n"
+
+    # Appends a line of generated code at the given indentation level.
+    def emit(self, line, depth):
+        self.lines.append("    " * depth + line)
+
+    # Emits a block of statements, or `pass` when it is empty.
+    def block(self, statements, depth):
+        if not statements:
+            self.emit("pass", depth)
+        for statement in statements:
+            self.statement(statement, depth)
+
+    # Emits a single statement, handling Print, Assign, While, If and expression statements.
+    def statement(self, statement, depth):
+        if isinstance(statement, Print):
+            self.emit(f"_print({self.expression(statement.expression)})", depth)
+
+        elif isinstance(statement, Assign):
+            self.emit(f"{self.variable(statement.name)} = {self.expression(statement.value)}", depth)
+
+        elif isinstance(statement, While):
+            self.emit(f"while {self.expression(statement.condition)}:", depth)
+            self.block(statement.body, depth + 1)
+
+        elif isinstance(statement, If):
+            self.emit(f"if {self.expression(statement.condition)}:", depth)
+            self.block(statement.then_branch, depth + 1)
+            if statement.else_branch:
+                self.emit("else:", depth)
+                self.block(statement.else_branch, depth + 1)
+
+        elif isinstance(statement, Reset):
+            for name in statement.names:
+                self.emit(f"{self.variable(name)} = _UNDEFINED", depth)
+
+        else:
+            self.emit(self.expression(statement), depth)
+
+    # Returns the Python source for an expression. Every compound expression is parenthesized,
+    # so Python's own precedence and comparison chaining never change its meaning.
+    def expression(self, expr):
+        if isinstance(expr, Literal):
+            return repr(expr.value)
+
+        elif isinstance(expr, Grouping):
+            return self.expression(expr.expression)
+
+        elif isinstance(expr, Unary):
+            return self.unary(expr.operator, self.expression(expr.right))
+
+        elif isinstance(expr, Binary):
+            left = self.expression(expr.left)
+            right = self.expression(expr.right)
+            if isinstance(expr, TypedBinary) and (expr.operator, expr.operands) in TYPED_OPERATORS:
+                return f"({left} {TYPED_OPERATORS[expr.operator, expr.operands]} {right})"
+            return self.binary(expr.operator, left, right, expr.right)
+
+        elif isinstance(expr, Variable):
+            return self.variable(expr.name)
+
+        elif isinstance(expr, Assign):
+            return f"({self.variable(expr.name)} := {self.expression(expr.value)})"
+
+        elif isinstance(expr, Input):
+            return f"_input(str({self.expression(expr.prompt)}))"
+
+        elif isinstance(expr, Index):
+            return f"_index({self.expression(expr.array)}, {self.expression(expr.index)})"
+
+        elif isinstance(expr, AssignIndex):
+            array = self.expression(expr.array)
+            return f"_assign_index({array}, {self.expression(expr.index)}, {self.expression(expr.value)})"
+
+        elif isinstance(expr, ArrayLiteral):
+            return f"_array([{', '.join(self.expression(element) for element in expr.elements)}])"
+
+        elif isinstance(expr, Call):
+            return f"_{expr.name}({', '.join(self.expression(argument) for argument in expr.arguments)})"
+
+        elif isinstance(expr, Temporary):
+            return self.temporary(expr.name, self.expression(expr.expression))
+
+        raise RuntimeError(f"Unknown expression type {type(expr)}")
+
+    # Returns the Python source for a unary operator applied to an operand's source.
+    def unary(self, operator, right):
+        if operator == '-':
+            return f"(-{right})"
+        elif operator == '!':
+            return f"(not {right})"
+        raise RuntimeError(f"Unknown unary operator {operator}")
+
+    # Returns the Python source for a binary operator applied to the operands' sources. `right_expr` is the right
+    # operand's node, which decides whether + needs string handling.
+    def binary(self, operator, left, right, right_expr):
+        if operator == '+' and not is_number_literal(right_expr):
+            return f"_concat({left}, {right})"
+        elif operator in ('+', '-', '*', '<', '<=', '>', '>=', '==', '!='):
+            return f"({left} {operator} {right})"
+        elif operator == '/':
+            return f"_divide({left}, {right})"
+        elif operator == 'AND':
+            return f"(bool({left}) & bool({right}))"
+        elif operator == 'OR':
+            return f"(bool({left}) | bool({right}))"
+        raise RuntimeError(f"Unknown binary operator {operator}")
+
+    # Returns the Python source for a Temporary whose expression has the given source. A value is kept only when it
+    # is not an array, since arrays are mutable and are recomputed instead.
+    def temporary(self, name, source):
+        name = self.variable(name)
+        value = f"(({name} := _t) if type(_t := {source}) is not _Array else _t)"
+        return f"({name} if {name} is not _UNDEFINED else {value})"
+
+    # Returns the Python local used for a Simple variable. Plain ASCII names stay readable in the
+    # generated code; anything else gets a numbered name so it is always a valid Python identifier.
+    def variable(self, name):
+        if name not in self.names:
+            python_name = f"v_{name}"
+            if not (name.isascii() and python_name.isidentifier()):
+                python_name = f"v{len(self.names)}_"
+            self.names[name] = python_name
+        return self.names[name]
+
+# Python operators for the operations type inference specialized that otherwise need a helper or bool() calls.
+TYPED_OPERATORS = {
+    ('+', "number"): '+',
+    ('AND', "boolean"): '&',
+    ('OR', "boolean"): '|',
+}
+
+# Checks if an expression is a number literal. Adding one needs no string handling, so `counter + 1` stays a plain +.
+def is_number_literal(expr):
+    return isinstance(expr, Literal) and type(expr.value) in (int, float)
+
+# Division keeps the tree walker's explicit zero check so the error message stays the same.
+def _divide(left, right):
+    if type(right) is not Array and right == 0:
+        raise RuntimeError("Division by zero.")
+    return left / right
+
+# Copies the generated function's locals back into their environment slots.
+def _export(values, scope, slots):
+    for python_name, value in scope.items():
+        if python_name in slots:
+            values[slots[python_name]] = value
+
+# Recovers the Simple variable name from an UnboundLocalError raised by generated code.
+def _undefined(error, names):
+    match = re.search(r"'(v\w*)'", str(error))
+    return names.get(match.group(1), match.group(1)) if match else "?"
+
+class PythonInterpreter:
+    """
+    Runs Simple programs by transpiling them to Python and compiling the result with compile().
+    """
+    def __init__(self, environment=None):
+        self.environment = environment if environment is not None else Environment()
+        self.print = print
+        self.input = input
+
+    # Transpile, compile and run a list of statements.
+    def interpret(self, statements):
+        self.compile(statements)(self.environment.values, self.print, self.input)
+
+    # Returns the generated Python function for a list of statements.
+    def compile(self, statements):
+        transpiler = Transpiler(self.environment)
+        source = transpiler.transpile(statements)
+        namespace = runtime_namespace(transpiler)
+        exec(compile(source, "<simple>", "exec"), namespace)
+        return namespace["run"]
+
+# Returns the globals that code generated by a transpiler runs with: its variable names and slots and the helpers
+# it calls.
+def runtime_namespace(transpiler):
+    namespace = {
+        "_names": {python_name: name for name, python_name in transpiler.names.items()},
+        "_slots": {python_name: transpiler.slots[name] for name, python_name in transpiler.names.items()},
+        "_UNDEFINED": UNDEFINED,
+        "_concat": concat,
+        "_divide": _divide,
+        "_export": _export,
+        "_undefined": _undefined,
+        "_Array": Array,
+        "_array": make_array,
+        "_index": index,
+        "_assign_index": assign_index,
+    }
+    namespace.update((f"_{name}", function) for name, (function, arity) in BUILTINS.items())
+    return namespace
@@ -0,0 +1,137 @@
+from bytecode import *
+from interpreter import Environment, UNDEFINED
+from strings import concat, TEXT_TYPES
+from arrays import Array, BUILTINS, make_array, index, assign_index
+
+class VM:
+    """
+    A stack-based virtual machine that runs the flat instruction array produced by the bytecode Compiler.
+    LOAD and STORE index the environment's value list directly.
+    """
+    def __init__(self, environment=None):
+        self.environment = environment if environment is not None else Environment()
+        self.print = print
+        self.input = input
+
+    # Compile a list of statements to bytecode and run it.
+    def interpret(self, statements):
+        self.run(Compiler(self.environment).compile(statements))
+
+    # Run a compiled chunk with a single dispatch loop.
+    def run(self, chunk):
+        code = chunk.code.tolist()
+        constants = chunk.constants
+        names = chunk.names
+        slots = self.environment.values
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        write = self.print
+        read = self.input
+        functions = [BUILTINS[name] for name in FUNCTIONS]
+        pc = 0
+        end = len(code)
+
+        while pc < end:
+            opcode = code[pc]
+            argument = code[pc + 1]
+            pc += 2
+
+            if opcode == LOAD:
+                value = slots[argument]
+                if value is UNDEFINED:
+                    raise RuntimeError(f"Undefined variable '{names[argument]}'.")
+                push(value)
+            elif opcode == CONST:
+                push(constants[argument])
+            elif opcode == STORE:
+                slots[argument] = pop()
+            elif opcode == CACHED:
+                value = slots[argument]
+                if value is UNDEFINED:
+                    pc += 2
+                else:
+                    push(value)
+                    pc = code[pc + 1]
+            elif opcode == JUMP_IF_FALSE:
+                if not pop():
+                    pc = argument
+            elif opcode == JUMP:
+                pc = argument
+            elif opcode == ADD:
+                right = pop()
+                left = stack[-1]
+                stack[-1] = concat(left, right) if type(left) in TEXT_TYPES else left + right
+            elif opcode == SUB:
+                right = pop()
+                stack[-1] = stack[-1] - right
+            elif opcode == MUL:
+                right = pop()
+                stack[-1] = stack[-1] * right
+            elif opcode == DIV:
+                right = pop()
+                if type(right) is not Array and right == 0:
+                    raise RuntimeError("Division by zero.")
+                stack[-1] = stack[-1] / right
+            elif opcode == LESS:
+                right = pop()
+                stack[-1] = stack[-1] < right
+            elif opcode == LESS_EQUAL:
+                right = pop()
+                stack[-1] = stack[-1] <= right
+            elif opcode == GREATER:
+                right = pop()
+                stack[-1] = stack[-1] > right
+            elif opcode == GREATER_EQUAL:
+                right = pop()
+                stack[-1] = stack[-1] >= right
+            elif opcode == EQUAL:
+                right = pop()
+                stack[-1] = stack[-1] == right
+            elif opcode == NOT_EQUAL:
+                right = pop()
+                stack[-1] = stack[-1] != right
+            elif opcode == AND:
+                right = pop()
+                stack[-1] = bool(stack[-1]) and bool(right)
+            elif opcode == OR:
+                right = pop()
+                stack[-1] = bool(stack[-1]) or bool(right)
+            elif opcode == NEGATE:
+                stack[-1] = -stack[-1]
+            elif opcode == NOT:
+                stack[-1] = not stack[-1]
+            elif opcode == DUP:
+                push(stack[-1])
+            elif opcode == POP:
+                pop()
+            elif opcode == PRINT:
+                write(pop())
+            elif opcode == INPUT:
+                stack[-1] = read(str(stack[-1]))
+            elif opcode == RESET:
+                slots[argument] = UNDEFINED
+            elif opcode == STORE_CACHED:
+                if type(stack[-1]) is not Array:
+                    slots[argument] = stack[-1]
+            elif opcode == INDEX:
+                position = pop()
+                stack[-1] = index(stack[-1], position)
+            elif opcode == SET_INDEX:
+                value = pop()
+                position = pop()
+                stack[-1] = assign_index(stack[-1], position, value)
+            elif opcode == ARRAY:
+                if argument:
+                    elements = stack[-argument:]
+                    del stack[-argument:]
+                else:
+                    elements = []
+                push(make_array(elements))
+            elif opcode == CALL:
+                function, count = functions[argument]
+                arguments = stack[-count:]
+                del stack[-count:]
+                push(function(*arguments))
+            else:
+                raise RuntimeError(f"Unknown opcode {opcode}")